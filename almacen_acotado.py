@@ -0,0 +1,262 @@
+"""
+Base de conocimiento con capacidad máxima y políticas de desalojo
+"""
+
+import heapq
+import itertools
+from knowledge_base import BaseConocimiento
+from indices_conocimiento import confianza_regla
+from utils import *
+from config import *
+
+
+class ReglasOrdenadas:
+    """
+    Reglas en orden de inserción con eliminación en O(1).
+    
+    Cada regla guarda su id en el motor de coincidencias y su clave en el
+    índice exacto para poder quitarla de ambos; renumerar() los recalcula
+    cuando los índices se reconstruyen.
+    """
+    
+    def __init__(self, reglas=()):
+        self._ids = dict.fromkeys(reglas)
+    
+    def __len__(self):
+        return len(self._ids)
+    
+    def __iter__(self):
+        return iter(self._ids)
+    
+    def __contains__(self, regla):
+        return regla in self._ids
+    
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return list(self._ids)[indice]
+        if indice < 0:
+            indice += len(self._ids)
+        if not 0 <= indice < len(self._ids):
+            raise IndexError("índice de regla fuera de rango")
+        return next(itertools.islice(self._ids, indice, None))
+    
+    def append(self, regla, id_motor=None, clave=None):
+        self._ids[regla] = (id_motor, clave)
+    
+    def quitar(self, regla):
+        """Quita la regla y devuelve su id en el motor y su clave exacta"""
+        return self._ids.pop(regla)
+    
+    def renumerar(self, indice_exacto):
+        for clave, grupo in indice_exacto.items():
+            for regla in grupo:
+                self._ids[regla] = clave
+        for id_motor, regla in enumerate(self._ids):
+            self._ids[regla] = (id_motor, self._ids[regla])
+
+
+class PoliticaDesalojo:
+    """
+    Elige la regla a desalojar: la de menor clave y, entre iguales, la más antigua.
+    
+    Las claves se guardan en un montículo. Cada cambio de clave agrega una
+    entrada nueva y las entradas viejas se descartan al salir, cuando su
+    clave ya no es la de la regla; el montículo se reconstruye cuando las
+    entradas viejas superan a las vigentes.
+    """
+    
+    def __init__(self):
+        self._monticulo = []
+        self._orden = itertools.count()
+        self._vigentes = ()
+    
+    def clave(self, regla):
+        raise NotImplementedError
+    
+    def reiniciar(self, vigentes):
+        """Reconstruye el montículo con las reglas vigentes (en orden de antigüedad)"""
+        self._vigentes = vigentes
+        self._monticulo = [(self.clave(regla), next(self._orden), regla) for regla in vigentes]
+        heapq.heapify(self._monticulo)
+    
+    def registrar(self, regla):
+        """Registra una regla nueva o un cambio en su clave"""
+        if len(self._monticulo) > 2 * len(self._vigentes) + 64:
+            self.reiniciar(self._vigentes)
+        heapq.heappush(self._monticulo, (self.clave(regla), next(self._orden), regla))
+    
+    def usada(self, regla):
+        """obtener_mejor_accion eligió la regla"""
+    
+    def olvidar(self, regla):
+        """La regla salió de la base"""
+    
+    def victima(self):
+        """Regla a desalojar entre las vigentes"""
+        while self._monticulo:
+            clave, _, regla = heapq.heappop(self._monticulo)
+            if regla in self._vigentes and clave == self.clave(regla):
+                return regla
+        return None
+
+
+class DesalojoLFU(PoliticaDesalojo):
+    """Desaloja la regla con menos experiencias (menor contador)"""
+    
+    def clave(self, regla):
+        return regla.contador
+
+
+class DesalojoLRU(PoliticaDesalojo):
+    """Desaloja la regla que hace más tiempo que no se agrega, actualiza ni elige"""
+    
+    def __init__(self):
+        super().__init__()
+        self._reloj = itertools.count(1)
+        self._ultimo_uso = {}
+    
+    def clave(self, regla):
+        # Las reglas cargadas sin uso registrado son las primeras en salir
+        return self._ultimo_uso.get(regla, 0)
+    
+    def registrar(self, regla):
+        self._ultimo_uso[regla] = next(self._reloj)
+        super().registrar(regla)
+    
+    def usada(self, regla):
+        self.registrar(regla)
+    
+    def olvidar(self, regla):
+        self._ultimo_uso.pop(regla, None)
+    
+    def reiniciar(self, vigentes):
+        self._ultimo_uso = {r: uso for r, uso in self._ultimo_uso.items() if r in vigentes}
+        super().reiniciar(vigentes)
+
+
+class DesalojoConfianza(PoliticaDesalojo):
+    """
+    Desaloja la regla con menos evidencia a favor de su resultado y, a igual
+    evidencia, la de menor contador. Una regla de fracaso confiable vale
+    tanto como una de éxito: obtener_mejor_accion la usa para descartar acciones
+    """
+    
+    def clave(self, regla):
+        return (confianza_regla(regla), regla.contador)
+
+
+POLITICAS_DESALOJO = {
+    "lfu": DesalojoLFU,
+    "lru": DesalojoLRU,
+    "confianza": DesalojoConfianza
+}
+
+
+class BaseConocimientoAcotada(BaseConocimiento):
+    """
+    Base de conocimiento en memoria con un máximo de reglas.
+    
+    Al insertar una regla que supera la capacidad se desaloja una según la
+    política elegida, de modo que la memoria y el costo de las búsquedas no
+    crecen con la cantidad de experiencias. Las reglas desalojadas se quitan
+    de los índices sin recorrer la base; los índices se compactan cuando
+    acumulan tantas reglas quitadas como vigentes.
+    """
+    
+    def __init__(self, archivo_conocimiento=None, motor_coincidencias=None, usar_diario=None,
+                 capacidad_maxima=None, politica_desalojo=None):
+        self.capacidad_maxima = capacidad_maxima or CAPACIDAD_MAXIMA_REGLAS
+        if not self.capacidad_maxima or self.capacidad_maxima < 1:
+            raise ValueError(f"Capacidad máxima inválida: {self.capacidad_maxima}")
+        
+        self.politica_desalojo = politica_desalojo or POLITICA_DESALOJO
+        if self.politica_desalojo not in POLITICAS_DESALOJO:
+            raise ValueError(f"Política de desalojo desconocida: {self.politica_desalojo}")
+        
+        self._politica = POLITICAS_DESALOJO[self.politica_desalojo]()
+        self.desalojadas = 0
+        super().__init__(archivo_conocimiento, motor_coincidencias, usar_diario)
+    
+    def _asignar_reglas(self, reglas):
+        # Los índices y la política se rehacen en _reconstruir_indices
+        self._reglas = ReglasOrdenadas(reglas)
+    
+    def _reconstruir_indices(self):
+        self._politica.reiniciar(self._reglas)
+        
+        # Una carga, importación o asignación puede traer más reglas que la capacidad
+        while len(self._reglas) > self.capacidad_maxima:
+            regla = self._politica.victima()
+            self._reglas.quitar(regla)
+            self._contar_desalojo(regla)
+        
+        super()._reconstruir_indices()
+        self._reglas.renumerar(self._indice_exacto)
+    
+    def _indexar_regla(self, regla):
+        clave = self._clave_exacta(regla.estado, regla.accion, regla.resultado)
+        self._indice_exacto.setdefault(clave, []).append(regla)
+        self._registrar_orden(regla)
+        self._reglas.append(regla, self._indice_coincidencias.agregar(regla), clave)
+        self._version += 1
+    
+    def _insertar_regla(self, regla):
+        # _indexar_regla agrega la regla a la secuencia junto con su id en el motor
+        self._indexar_regla(regla)
+        
+        # La regla entra a la política después de elegir la víctima, para que
+        # una regla nueva no se desaloje en su propia inserción
+        while len(self._reglas) > self.capacidad_maxima:
+            self._desalojar(self._politica.victima())
+        self._politica.registrar(regla)
+        return regla
+    
+    def _contiene_regla(self, regla):
+        return regla in self._reglas
+    
+    def _actualizar_regla(self, regla, resultado):
+        super()._actualizar_regla(regla, resultado)
+        self._politica.registrar(regla)
+    
+    def _desalojar(self, regla):
+        """Quita una regla de la base y de los índices"""
+        id_motor, clave = self._reglas.quitar(regla)
+        self._indice_coincidencias.quitar(id_motor)
+        
+        grupo = self._indice_exacto.get(clave, [])
+        if regla in grupo:
+            grupo.remove(regla)
+        if not grupo:
+            self._indice_exacto.pop(clave, None)
+        self._orden_reglas.pop(id(regla), None)
+        
+        self._version += 1
+        self._contar_desalojo(regla)
+        if self._explicaciones is not None:
+            self._explicaciones.quitar(regla)
+        
+        if self._indice_coincidencias.eliminadas > max(len(self._reglas), 1024):
+            super()._reconstruir_indices()
+            self._reglas.renumerar(self._indice_exacto)
+    
+    def _contar_desalojo(self, regla):
+        self._politica.olvidar(regla)
+        self.desalojadas += 1
+        self._contar_regla(regla.resultado, -1)
+        
+        # El diario no registra desalojos: el próximo guardado reescribe la instantánea
+        self._compactar_diario = True
+    
+    def cargar_conocimiento(self):
+        """Carga el conocimiento desde archivo, desalojando lo que exceda la capacidad"""
+        desalojadas = self.desalojadas
+        super().cargar_conocimiento()
+        if self.desalojadas != desalojadas:
+            self._compactar_diario = True
+    
+    def obtener_mejor_accion(self, estado, exploracion=0.0):
+        """Obtiene la mejor acción para un estado dado y registra el uso de la regla elegida"""
+        accion, regla = super().obtener_mejor_accion(estado, exploracion)
+        if regla is not None:
+            self._politica.usada(regla)
+        return accion, regla
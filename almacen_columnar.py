@@ -0,0 +1,375 @@
+"""
+Almacenamiento columnar de la base de conocimiento con NumPy
+"""
+
+import bisect
+import numpy as np
+from knowledge_base import BaseConocimiento, ReglaConocimiento, compartir_estado, internar
+from utils import *
+from config import *
+
+# Máscara de una condición ausente: acepta cualquier valor (y que falte el atributo)
+TODOS = np.uint64(0xFFFFFFFFFFFFFFFF)
+# Valores distintos por atributo que caben en una máscara (el bit 63 queda libre)
+MAX_VALORES_ATRIBUTO = 63
+CAPACIDAD_INICIAL = 1024
+
+
+class VistaRegla(ReglaConocimiento):
+    """
+    Regla que lee y escribe directamente sobre las columnas de la base.
+    Es válida mientras la base no se reorganice (carga, generalización o depuración).
+    """
+    
+    __slots__ = ("_base", "_fila")
+    
+    def __init__(self, base, fila):
+        self._base = base
+        self._fila = fila
+    
+    @property
+    def estado(self):
+        return self._base._estados[self._fila]
+    
+    @property
+    def accion(self):
+        return self._base._vocabulario_acciones[self._base._accion[self._fila]]
+    
+    @property
+    def resultado(self):
+        return self._base._vocabulario_resultados[self._base._resultado[self._fila]]
+    
+    @resultado.setter
+    def resultado(self, valor):
+        self._base._resultado[self._fila] = self._base._codigo_resultado(valor)
+    
+    @property
+    def contador(self):
+        return int(self._base._contador[self._fila])
+    
+    @contador.setter
+    def contador(self, valor):
+        self._base._contador[self._fila] = valor
+    
+    @property
+    def tasa_exito(self):
+        return float(self._base._tasa[self._fila])
+    
+    @tasa_exito.setter
+    def tasa_exito(self, valor):
+        self._base._tasa[self._fila] = valor
+    
+    @property
+    def _actualizacion(self):
+        return self._base._actualizaciones[self._fila]
+    
+    @_actualizacion.setter
+    def _actualizacion(self, valor):
+        self._base._actualizaciones[self._fila] = valor
+    
+    @property
+    def historial(self):
+        return self._base._historiales[self._fila]
+    
+    @historial.setter
+    def historial(self, valor):
+        self._base._historiales[self._fila] = valor
+
+
+class SecuenciaReglas:
+    """Secuencia de solo lectura que crea vistas de las reglas bajo demanda"""
+    
+    def __init__(self, base):
+        self._base = base
+    
+    def __len__(self):
+        return self._base._n
+    
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [VistaRegla(self._base, i) for i in range(*indice.indices(self._base._n))]
+        if indice < 0:
+            indice += self._base._n
+        if not 0 <= indice < self._base._n:
+            raise IndexError("índice de regla fuera de rango")
+        return VistaRegla(self._base, indice)
+    
+    def __iter__(self):
+        for i in range(self._base._n):
+            yield VistaRegla(self._base, i)
+
+
+class BaseConocimientoColumnar(BaseConocimiento):
+    """
+    Base de conocimiento que guarda contador, tasa de éxito, acción, resultado
+    y condiciones en arreglos NumPy paralelos.
+    
+    Cada condición se codifica como una máscara de bits sobre el vocabulario
+    del atributo. Las filas se agrupan por los atributos que condicionan y,
+    en cada grupo, por valor aceptado: una consulta toma la lista de filas
+    más corta entre sus valores y compara las máscaras vectorizadas solo
+    sobre esas filas. Las reglas con rangos o valores que no caben en el
+    vocabulario se verifican con coincide_con_estado.
+    
+    Es ante todo una disposición compacta en memoria: cada operación NumPy
+    tiene un costo fijo, así que con pocos miles de reglas el índice de la
+    base en memoria es más rápido, y el análisis de la mejor acción queda a
+    la par recién con unas cien mil reglas (ver el benchmark).
+    """
+    
+    # Cada búsqueda crea vistas nuevas sobre las filas
+    _explicaciones_incrementales = False
+    
+    def __init__(self, archivo_conocimiento=None, motor_coincidencias=None, usar_diario=None):
+        self._vocabulario_acciones = []
+        self._codigos_acciones = {}
+        self._vocabulario_resultados = []
+        self._codigos_resultados = {}
+        self._codigos_valores = {}
+        self._codigo_resultado("éxito")
+        self._codigo_resultado("fracaso")
+        self._crear_columnas(CAPACIDAD_INICIAL)
+        self._reglas = SecuenciaReglas(self)
+        
+        super().__init__(archivo_conocimiento, motor_coincidencias, usar_diario)
+    
+    # ----- Columnas -----
+    
+    def _crear_columnas(self, capacidad):
+        self._n = 0
+        self._capacidad = capacidad
+        self._contador = np.zeros(capacidad, dtype=np.int64)
+        self._tasa = np.zeros(capacidad, dtype=np.float64)
+        self._accion = np.zeros(capacidad, dtype=np.int16)
+        self._resultado = np.zeros(capacidad, dtype=np.int16)
+        self._verificar = np.zeros(capacidad, dtype=bool)
+        self._condiciones = {}
+        self._estados = []
+        self._actualizaciones = []
+        self._historiales = []
+        # Filas por firma (atributos con condición codificada) y por (firma, atributo, código)
+        self._filas_por_firma = {}
+        self._filas_por_valor = {}
+        self._arreglos_filas = {}
+    
+    def _asegurar_capacidad(self, necesaria):
+        if necesaria <= self._capacidad:
+            return
+        
+        capacidad = max(necesaria, self._capacidad * 2)
+        for nombre in ("_contador", "_tasa", "_accion", "_resultado", "_verificar"):
+            anterior = getattr(self, nombre)
+            nueva = np.zeros(capacidad, dtype=anterior.dtype)
+            nueva[:self._n] = anterior[:self._n]
+            setattr(self, nombre, nueva)
+        
+        for clave, anterior in self._condiciones.items():
+            nueva = np.full(capacidad, TODOS, dtype=np.uint64)
+            nueva[:self._n] = anterior[:self._n]
+            self._condiciones[clave] = nueva
+        
+        self._capacidad = capacidad
+    
+    def _codigo_accion(self, accion):
+        codigo = self._codigos_acciones.get(accion)
+        if codigo is None:
+            codigo = len(self._vocabulario_acciones)
+            self._vocabulario_acciones.append(internar(accion))
+            self._codigos_acciones[accion] = codigo
+        return codigo
+    
+    def _codigo_resultado(self, resultado):
+        codigo = self._codigos_resultados.get(resultado)
+        if codigo is None:
+            codigo = len(self._vocabulario_resultados)
+            self._vocabulario_resultados.append(internar(resultado))
+            self._codigos_resultados[resultado] = codigo
+        return codigo
+    
+    def _mascara_condicion(self, clave, valor):
+        """Máscara de bits de los valores aceptados, o None si no se puede codificar"""
+        if isinstance(valor, tuple):
+            return None
+        
+        codigos = self._codigos_valores.setdefault(clave, {})
+        mascara = 0
+        for v in (valor if isinstance(valor, list) else [valor]):
+            try:
+                codigo = codigos.get(v)
+                if codigo is None:
+                    if len(codigos) >= MAX_VALORES_ATRIBUTO:
+                        return None
+                    codigo = codigos[v] = len(codigos)
+            except TypeError:
+                return None
+            mascara |= 1 << codigo
+        return mascara
+    
+    def _agregar_fila(self, estado, accion, resultado, contador, tasa_exito, actualizacion, historial=None):
+        fila = self._n
+        self._asegurar_capacidad(fila + 1)
+        self._n += 1
+        
+        self._contador[fila] = contador
+        self._tasa[fila] = tasa_exito
+        self._accion[fila] = self._codigo_accion(accion)
+        self._resultado[fila] = self._codigo_resultado(resultado)
+        self._verificar[fila] = False
+        self._estados.append(compartir_estado(estado))
+        self._actualizaciones.append(actualizacion)
+        self._historiales.append(historial)
+        
+        codificadas = {}
+        for clave, valor in estado.items():
+            columna = self._condiciones.get(clave)
+            if columna is None:
+                columna = self._condiciones[clave] = np.full(self._capacidad, TODOS, dtype=np.uint64)
+            
+            mascara = self._mascara_condicion(clave, valor)
+            if mascara is None:
+                columna[fila] = TODOS
+                self._verificar[fila] = True
+            else:
+                columna[fila] = mascara
+                codificadas[clave] = mascara
+        
+        firma = tuple(sorted(codificadas))
+        self._filas_por_firma.setdefault(firma, []).append(fila)
+        for clave, mascara in codificadas.items():
+            while mascara:
+                bit = mascara & -mascara
+                mascara ^= bit
+                self._filas_por_valor.setdefault((firma, clave, bit.bit_length() - 1), []).append(fila)
+        
+        return fila
+    
+    def _asignar_reglas(self, reglas):
+        # Se leen todos los datos antes de reemplazar las columnas, porque
+        # las reglas pueden ser vistas sobre las columnas actuales
+        datos = [(r.estado, r.accion, r.resultado, r.contador, r.tasa_exito, r._actualizacion, r.historial)
+                 for r in reglas]
+        
+        self._crear_columnas(max(CAPACIDAD_INICIAL, len(datos)))
+        for fila in datos:
+            self._agregar_fila(*fila)
+    
+    # ----- Índices -----
+    
+    def _reconstruir_indices(self):
+        self._indice_exacto = {}
+        for fila in range(self._n):
+            clave = self._clave_exacta(self._estados[fila],
+                                       self._vocabulario_acciones[self._accion[fila]],
+                                       self._vocabulario_resultados[self._resultado[fila]])
+            self._indice_exacto.setdefault(clave, []).append(fila)
+        self._version += 1
+    
+    def _buscar_regla_exacta(self, estado, accion, resultado):
+        filas = self._indice_exacto.get(self._clave_exacta(estado, accion, resultado))
+        return VistaRegla(self, filas[0]) if filas else None
+    
+    def _insertar_regla(self, regla):
+        fila = self._agregar_fila(regla.estado, regla.accion, regla.resultado,
+                                  regla.contador, regla.tasa_exito, regla._actualizacion, regla.historial)
+        clave = self._clave_exacta(regla.estado, regla.accion, regla.resultado)
+        self._indice_exacto.setdefault(clave, []).append(fila)
+        self._version += 1
+        return VistaRegla(self, fila)
+    
+    def _actualizar_regla(self, regla, resultado):
+        resultado_anterior = regla.resultado
+        regla.actualizar(resultado)
+        self._version += 1
+        
+        if regla.resultado != resultado_anterior:
+            clave_estado = clave_canonica(regla.estado)
+            clave_anterior = (clave_estado, regla.accion, resultado_anterior)
+            filas = self._indice_exacto.get(clave_anterior, [])
+            if regla._fila in filas:
+                filas.remove(regla._fila)
+            if not filas:
+                self._indice_exacto.pop(clave_anterior, None)
+            
+            filas_nuevas = self._indice_exacto.setdefault((clave_estado, regla.accion, regla.resultado), [])
+            bisect.insort(filas_nuevas, regla._fila)
+    
+    # ----- Consultas vectorizadas -----
+    
+    def _arreglo_filas(self, clave, filas):
+        """Arreglo de una lista de filas; las listas solo crecen, así que basta comparar el largo"""
+        arreglo = self._arreglos_filas.get(clave)
+        if arreglo is None or len(arreglo) != len(filas):
+            arreglo = self._arreglos_filas[clave] = np.array(filas, dtype=np.int64)
+        return arreglo
+    
+    def _filas_coincidentes(self, estado):
+        """Filas (ordenadas) de las reglas que coinciden con el estado"""
+        codigos = {}
+        for clave, valor in estado.items():
+            try:
+                codigo = self._codigos_valores.get(clave, {}).get(valor)
+            except TypeError:
+                codigo = None
+            if codigo is not None:
+                codigos[clave] = codigo
+        
+        partes = []
+        for firma, filas_firma in self._filas_por_firma.items():
+            # Una condición sobre un atributo sin valor conocido en el estado no se cumple
+            if not all(clave in codigos for clave in firma):
+                continue
+            if not firma:
+                partes.append(self._arreglo_filas(firma, filas_firma))
+                continue
+            
+            listas = [(clave, self._filas_por_valor.get((firma, clave, codigos[clave]))) for clave in firma]
+            if any(filas is None for _, filas in listas):
+                continue
+            
+            # Las candidatas son la lista más corta; el resto de las condiciones se comparan sobre ellas
+            clave_menor, filas_menor = min(listas, key=lambda par: len(par[1]))
+            candidatas = self._arreglo_filas((firma, clave_menor, codigos[clave_menor]), filas_menor)
+            for clave in firma:
+                if clave != clave_menor:
+                    bit = np.uint64(1 << codigos[clave])
+                    candidatas = candidatas[(self._condiciones[clave][candidatas] & bit).astype(bool)]
+            partes.append(candidatas)
+        
+        if not partes:
+            return np.empty(0, dtype=np.int64)
+        filas = np.sort(np.concatenate(partes)) if len(partes) > 1 else partes[0]
+        
+        verificar = self._verificar[filas]
+        if verificar.any():
+            conservar = [not v or self._estados_coinciden(f, estado)
+                         for f, v in zip(filas.tolist(), verificar.tolist())]
+            filas = filas[np.array(conservar, dtype=bool)]
+        
+        return filas
+    
+    def _estados_coinciden(self, fila, estado):
+        return VistaRegla(self, fila).coincide_con_estado(estado)
+    
+    def buscar_reglas_coincidentes(self, estado):
+        """Busca reglas que coincidan con el estado dado"""
+        return [VistaRegla(self, fila) for fila in self._filas_coincidentes(estado).tolist()]
+    
+    def instantanea(self):
+        """Las filas se modifican en su lugar: la instantánea copia las reglas"""
+        return self._instantanea_copiada()
+    
+    def _calcular_analisis(self, estado):
+        filas = self._filas_coincidentes(estado)
+        if len(filas) == 0:
+            return False, None, list(ACCIONES_LEON)
+        
+        exito = self._resultado[filas] == self._codigos_resultados["éxito"]
+        if exito.any():
+            candidatas = filas[exito]
+            puntajes = self._tasa[candidatas] * self._contador[candidatas]
+            mejor = int(candidatas[np.argmax(puntajes)])
+            return True, VistaRegla(self, mejor), None
+        
+        acciones_fracaso = set(self._vocabulario_acciones[c] for c in np.unique(self._accion[filas]))
+        acciones_posibles = [a for a in ACCIONES_LEON if a not in acciones_fracaso] or ACCIONES_LEON
+        return True, None, acciones_posibles
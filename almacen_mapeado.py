@@ -0,0 +1,131 @@
+"""
+Base de conocimiento de solo lectura sobre una instantánea binaria mapeada en memoria
+"""
+
+from knowledge_base import BaseConocimiento, InstantaneaConocimiento, ReglaConocimiento, compartir_estado
+from indices_conocimiento import IndiceCoincidencias
+from formato_binario import LectorBinario, es_archivo_binario
+from persistencia import DiarioConocimiento
+
+
+class EstadoMapeado:
+    """Estado de la tabla de la instantánea, indexable como las condiciones de una regla"""
+    
+    __slots__ = ("estado", "indice")
+    
+    coincide_con_estado = ReglaConocimiento.coincide_con_estado
+    
+    def __init__(self, estado, indice):
+        self.estado = estado
+        self.indice = indice
+
+
+class SecuenciaMapeada:
+    """Secuencia de solo lectura que decodifica las reglas bajo demanda"""
+    
+    def __init__(self, base):
+        self._base = base
+    
+    def __len__(self):
+        return self._base._lector.num_reglas
+    
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self._base._regla(i) for i in range(*indice.indices(len(self)))]
+        if indice < 0:
+            indice += len(self)
+        return self._base._regla(indice)
+    
+    def __iter__(self):
+        for campos in self._base._lector:
+            yield ReglaConocimiento.desde_campos(*campos)
+
+
+class BaseConocimientoMapeada(BaseConocimiento):
+    """
+    Base de conocimiento de solo lectura respaldada por una instantánea binaria
+    mapeada en memoria.
+    
+    Abrirla solo lee la cabecera, así que el arranque no depende de la
+    cantidad de reglas, y los procesos que abren el mismo archivo comparten
+    sus páginas. La primera consulta indexa los estados distintos; las reglas
+    se decodifican solo cuando su estado coincide con la consulta, una vez
+    por registro mientras el archivo siga mapeado.
+    """
+    
+    def __init__(self, archivo_conocimiento, motor_coincidencias=None):
+        if not es_archivo_binario(archivo_conocimiento):
+            raise ValueError(f"La base mapeada requiere una instantánea binaria: {archivo_conocimiento}")
+        
+        self._lector = None
+        self._indice_estados = None
+        self._reglas_decodificadas = {}
+        self._reglas = SecuenciaMapeada(self)
+        super().__init__(archivo_conocimiento, motor_coincidencias, usar_diario=False)
+    
+    def _asignar_reglas(self, reglas):
+        # BaseConocimiento.__init__ empieza con una lista vacía
+        if reglas:
+            self._solo_lectura()
+    
+    def cargar_conocimiento(self):
+        """Mapea la instantánea sin decodificar las reglas"""
+        self.cerrar()
+        self._lector = LectorBinario.abrir(self.archivo_conocimiento, preparar_estado=compartir_estado)
+        self._indice_estados = None
+        self._reglas_decodificadas = {}
+        self._generacion = self._lector.metadatos.get("generacion", 0)
+        
+        # Las experiencias del diario no están en la instantánea: mapearla
+        # daría una política desactualizada
+        diario = DiarioConocimiento(self.archivo_conocimiento + ".diario")
+        if diario.leer(self._generacion):
+            self.cerrar()
+            raise ValueError(f"{diario.ruta} tiene experiencias sin compactar en la instantánea; "
+                             f"compacte la base antes de mapearla")
+        
+        self.estadisticas = dict(self.estadisticas, **self._lector.estadisticas)
+        self._version += 1
+        
+        print(f"Conocimiento mapeado: {self._lector.num_reglas} reglas")
+    
+    def cerrar(self):
+        """Libera el mapeo del archivo"""
+        if self._lector is not None:
+            self._lector.cerrar()
+            self._lector = None
+    
+    def _regla(self, indice):
+        # La base no cambia mientras el archivo está mapeado: cada registro se decodifica una vez
+        regla = self._reglas_decodificadas.get(indice)
+        if regla is None:
+            regla = ReglaConocimiento.desde_campos(*self._lector.regla(indice))
+            self._reglas_decodificadas[indice] = regla
+        return regla
+    
+    def buscar_reglas_coincidentes(self, estado):
+        """Busca reglas que coincidan con el estado dado"""
+        if self._indice_estados is None:
+            self._indice_estados = IndiceCoincidencias(
+                EstadoMapeado(self._lector.estado(i), i) for i in range(self._lector.num_estados)
+            )
+        
+        ids = []
+        for estado_mapeado in self._indice_estados.buscar(estado):
+            ids.extend(self._lector.reglas_del_estado(estado_mapeado.indice))
+        ids.sort()
+        
+        return [self._regla(i) for i in ids]
+    
+    def instantanea(self):
+        """La base mapeada no cambia: la instantánea busca directamente en ella"""
+        return InstantaneaConocimiento(self.buscar_reglas_coincidentes, len(self.reglas))
+    
+    def _solo_lectura(self, *args, **kwargs):
+        raise RuntimeError("La base de conocimiento mapeada es de solo lectura")
+    
+    agregar_experiencia = _solo_lectura
+    guardar_conocimiento = _solo_lectura
+    generalizar_conocimiento = _solo_lectura
+    depurar_conocimiento = _solo_lectura
+    limpiar_conocimiento = _solo_lectura
@@ -0,0 +1,274 @@
+"""
+Base de conocimiento particionada por posición del león
+"""
+
+import os
+import json
+import itertools
+from collections import defaultdict
+from datetime import datetime
+from knowledge_base import BaseConocimiento, InstantaneaConocimiento
+from persistencia import escribir_atomico
+from utils import *
+from config import *
+
+# Partición de las reglas sin posición fija (generalizadas a varias posiciones o sin condición de posición)
+COMPARTIDA = "compartida"
+ARCHIVO_MANIFIESTO = "manifiesto.json"
+
+
+def clave_particion(estado):
+    """Partición a la que pertenece una regla o una consulta con ese estado"""
+    posicion = estado.get("posicion")
+    if isinstance(posicion, int) and not isinstance(posicion, bool):
+        return posicion
+    return COMPARTIDA
+
+
+class ParticionConocimiento(BaseConocimiento):
+    """Partición de una base particionada: reglas en memoria con sus propios índices y archivo"""
+    
+    def __init__(self, archivo_conocimiento, motor_coincidencias=None):
+        self.modificada = False
+        super().__init__(archivo_conocimiento, motor_coincidencias, usar_diario=False)
+    
+    def cargar_conocimiento(self):
+        """Carga la partición si ya tiene archivo; las particiones nuevas empiezan vacías"""
+        if os.path.exists(self.archivo_conocimiento):
+            super().cargar_conocimiento()
+        else:
+            self._reconstruir_indices()
+
+
+class ReglasParticionadas:
+    """Secuencia de solo lectura con las reglas de todas las particiones, en orden de partición"""
+    
+    def __init__(self, base):
+        self._base = base
+    
+    def __len__(self):
+        return sum(len(p.reglas) for p in self._base._particiones.values())
+    
+    def __iter__(self):
+        for particion in self._base.particiones():
+            yield from particion.reglas
+    
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return list(self)[indice]
+        if indice < 0:
+            indice += len(self)
+        for particion in self._base.particiones():
+            if 0 <= indice < len(particion.reglas):
+                return particion.reglas[indice]
+            indice -= len(particion.reglas)
+        raise IndexError("índice de regla fuera de rango")
+
+
+class BaseConocimientoParticionada(BaseConocimiento):
+    """
+    Base de conocimiento repartida en una partición por posición más una
+    partición compartida con las reglas que valen para varias posiciones.
+    
+    Una consulta con posición solo busca en la partición de esa posición y
+    en la compartida. Cada partición se guarda en su propio archivo dentro
+    del directorio de la base, y guardar solo reescribe las particiones que
+    cambiaron: reentrenar una posición no reescribe las demás.
+    """
+    
+    def __init__(self, directorio=None, motor_coincidencias=None):
+        self._particiones = {}
+        self._sin_indexar = set()
+        self._reescribir_todas = False
+        self._reglas = ReglasParticionadas(self)
+        super().__init__(directorio or DIRECTORIO_CONOCIMIENTO_PARTICIONADO, motor_coincidencias,
+                         usar_diario=False)
+    
+    def _asignar_reglas(self, reglas):
+        # Solo se marcan las particiones cuyas reglas cambiaron; sus índices
+        # se rehacen en _reconstruir_indices
+        por_particion = defaultdict(list)
+        for regla in reglas:
+            por_particion[clave_particion(regla.estado)].append(regla)
+        
+        for clave in set(self._particiones) | set(por_particion):
+            nuevas = por_particion.get(clave, [])
+            particion = self.particion(clave)
+            actuales = particion.reglas
+            if len(nuevas) != len(actuales) or any(a is not b for a, b in zip(nuevas, actuales)):
+                particion._asignar_reglas(nuevas)
+                particion.modificada = True
+                self._sin_indexar.add(clave)
+    
+    def _ruta_particion(self, clave):
+        nombre = COMPARTIDA if clave == COMPARTIDA else f"posicion_{clave}"
+        return os.path.join(self.archivo_conocimiento, nombre + ".json")
+    
+    def particion(self, clave):
+        """Partición de una posición (o COMPARTIDA), creándola si no existe"""
+        particion = self._particiones.get(clave)
+        if particion is None:
+            particion = ParticionConocimiento(self._ruta_particion(clave), self.motor_coincidencias)
+            # Un solo cerrojo para que las instantáneas lean todas las particiones de forma consistente
+            particion._cerrojo = self._cerrojo
+            self._particiones[clave] = particion
+        return particion
+    
+    def particiones(self):
+        """Particiones en orden: posiciones de menor a mayor y al final la compartida"""
+        claves = sorted(c for c in self._particiones if c != COMPARTIDA)
+        if COMPARTIDA in self._particiones:
+            claves.append(COMPARTIDA)
+        return [self._particiones[c] for c in claves]
+    
+    def _reconstruir_indices(self):
+        for clave in self._sin_indexar:
+            self._particiones[clave]._reconstruir_indices()
+        self._sin_indexar = set()
+        self._version += 1
+    
+    def _buscar_regla_exacta(self, estado, accion, resultado):
+        particion = self._particiones.get(clave_particion(estado))
+        if particion is None:
+            return None
+        return particion._buscar_regla_exacta(estado, accion, resultado)
+    
+    def _insertar_regla(self, regla):
+        particion = self.particion(clave_particion(regla.estado))
+        particion._insertar_regla(regla)
+        particion.modificada = True
+        self._version += 1
+        return regla
+    
+    def _actualizar_regla(self, regla, resultado):
+        particion = self._particiones[clave_particion(regla.estado)]
+        particion._actualizar_regla(regla, resultado)
+        particion.modificada = True
+        self._version += 1
+    
+    def buscar_reglas_coincidentes(self, estado):
+        """Busca reglas que coincidan con el estado dado en su partición y en la compartida"""
+        return self._buscar_en(self._particiones, estado)
+    
+    def _buscar_en(self, particiones, estado):
+        """Busca en las particiones (o instantáneas de particiones) por clave que correspondan al estado"""
+        posicion = estado.get("posicion")
+        try:
+            hash(posicion)
+        except TypeError:
+            # Una consulta con posición no hashable puede coincidir con cualquier partición
+            claves = sorted(c for c in particiones if c != COMPARTIDA) + [COMPARTIDA]
+            return list(itertools.chain.from_iterable(
+                particiones[c].buscar_reglas_coincidentes(estado) for c in claves if c in particiones))
+        
+        # Las reglas de una partición de posición exigen esa posición exacta
+        reglas = []
+        particion = particiones.get(posicion)
+        if particion is not None:
+            reglas.extend(particion.buscar_reglas_coincidentes(estado))
+        if COMPARTIDA in particiones:
+            reglas.extend(particiones[COMPARTIDA].buscar_reglas_coincidentes(estado))
+        return reglas
+    
+    def instantanea(self):
+        """Instantánea formada por una instantánea de cada partición"""
+        instantaneas = {clave: p.instantanea() for clave, p in self._particiones.items()}
+        return InstantaneaConocimiento(lambda estado: self._buscar_en(instantaneas, estado),
+                                       len(self.reglas), self._cerrojo)
+    
+    def cargar_conocimiento(self):
+        """Carga el manifiesto y cada una de las particiones que lista"""
+        self.esperar_guardado()
+        self._particiones = {}
+        self._sin_indexar = set()
+        
+        manifiesto = os.path.join(self.archivo_conocimiento, ARCHIVO_MANIFIESTO)
+        if os.path.exists(manifiesto):
+            try:
+                with open(manifiesto, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                
+                self.estadisticas = data.get("estadisticas", self.estadisticas)
+                self._generacion = data.get("generacion", 0)
+                for clave in data.get("particiones", []):
+                    self.particion(clave)
+            
+            except Exception as e:
+                print(f"Error cargando conocimiento: {e}")
+                self._particiones = {}
+            
+            print(f"Conocimiento cargado: {len(self.reglas)} reglas en "
+                  f"{len(self._particiones)} particiones")
+        else:
+            print("No se encontró archivo de conocimiento. Se iniciará con base vacía.")
+        
+        self._contar_reglas()
+        self._version += 1
+        self._compactar_diario = False
+    
+    def cargar_particion(self, clave):
+        """Vuelve a leer del disco solo la partición de una posición (o COMPARTIDA)"""
+        self.esperar_guardado()
+        self._particiones.pop(clave, None)
+        self._sin_indexar.discard(clave)
+        particion = self.particion(clave)
+        
+        self._contar_reglas()
+        self._version += 1
+        return particion
+    
+    def esperar_guardado(self):
+        error = super().esperar_guardado()
+        if error:
+            # El guardado fallido pudo dejar particiones sin escribir
+            self._reescribir_todas = True
+        return error
+    
+    def _contar_reglas(self):
+        """Recalcula los conteos globales de reglas a partir de las particiones"""
+        for particion in self._particiones.values():
+            particion._contar_reglas()
+        
+        self.estadisticas["total_reglas"] = sum(
+            p.estadisticas["total_reglas"] for p in self._particiones.values())
+        self.estadisticas["reglas_exito"] = sum(
+            p.estadisticas["reglas_exito"] for p in self._particiones.values())
+        self.estadisticas["reglas_fracaso"] = sum(
+            p.estadisticas["reglas_fracaso"] for p in self._particiones.values())
+    
+    def _preparar_guardado(self, copiar):
+        """
+        Prepara la escritura de las particiones modificadas y del manifiesto.
+        Si el guardado anterior falló se reescriben todas
+        """
+        todas = self._reescribir_todas
+        self._reescribir_todas = False
+        escrituras = []
+        for particion in self.particiones():
+            if todas or particion.modificada or not os.path.exists(particion.archivo_conocimiento):
+                particion._contar_reglas()
+                escrituras.append(particion._preparar_guardado(copiar))
+                particion.modificada = False
+        
+        self._generacion += 1
+        self._compactar_diario = False
+        claves = list(self._particiones)
+        data = {
+            "estadisticas": dict(self.estadisticas),
+            "fecha_guardado": datetime.now().isoformat(),
+            "total_reglas": len(self.reglas),
+            "generacion": self._generacion,
+            "particiones": claves
+        }
+        directorio = self.archivo_conocimiento
+        manifiesto = os.path.join(directorio, ARCHIVO_MANIFIESTO)
+        total = len(claves)
+        
+        def escribir():
+            # Las particiones se escriben antes que el manifiesto que las lista
+            for escribir_particion in escrituras:
+                escribir_particion()
+            escribir_atomico(manifiesto, lambda f: json.dump(data, f, indent=2, ensure_ascii=False))
+            print(f"Conocimiento guardado en {directorio}: {len(escrituras)} de {total} "
+                  f"particiones reescritas")
+        return escribir
@@ -0,0 +1,315 @@
+"""
+Almacenamiento de la base de conocimiento en SQLite
+"""
+
+import contextlib
+import json
+import os
+import sqlite3
+from knowledge_base import BaseConocimiento, ReglaConocimiento, compartir_estado
+from config import *
+
+# Atributos del estado con columna propia e índice
+COLUMNAS_INDEXADAS = ("posicion", "distancia", "accion_impala")
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS reglas (
+    id INTEGER PRIMARY KEY,
+    clave TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    posicion TEXT,
+    distancia TEXT,
+    accion_impala TEXT,
+    accion TEXT NOT NULL,
+    resultado TEXT NOT NULL,
+    contador INTEGER NOT NULL,
+    tasa_exito REAL NOT NULL,
+    actualizacion,
+    historial TEXT
+);
+CREATE INDEX IF NOT EXISTS reglas_exacta ON reglas (clave, accion, resultado);
+CREATE INDEX IF NOT EXISTS reglas_posicion ON reglas (posicion);
+CREATE INDEX IF NOT EXISTS reglas_distancia ON reglas (distancia);
+CREATE INDEX IF NOT EXISTS reglas_accion_impala ON reglas (accion_impala);
+CREATE INDEX IF NOT EXISTS reglas_accion ON reglas (accion);
+CREATE INDEX IF NOT EXISTS reglas_resultado ON reglas (resultado);
+CREATE TABLE IF NOT EXISTS metadatos (
+    clave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+"""
+
+CAMPOS_REGLA = "id, estado, accion, resultado, contador, tasa_exito, actualizacion, historial"
+
+
+def codificar_estado(estado, ordenado=False):
+    """Estado como texto JSON; los rangos (tuplas) se guardan como {"rango": [min, max]}"""
+    estado = {clave: {"rango": list(valor)} if isinstance(valor, tuple) else valor
+              for clave, valor in estado.items()}
+    return json.dumps(estado, sort_keys=ordenado, ensure_ascii=False)
+
+
+def decodificar_estado(texto):
+    """Inverso de codificar_estado"""
+    return {clave: tuple(valor["rango"]) if isinstance(valor, dict) else valor
+            for clave, valor in json.loads(texto).items()}
+
+
+class ReglaSQLite(ReglaConocimiento):
+    """Regla leída de la base SQLite junto con el id de su fila"""
+    
+    __slots__ = ("_id",)
+
+
+class SecuenciaSQLite:
+    """Secuencia de solo lectura sobre la tabla de reglas, en orden de inserción"""
+    
+    def __init__(self, base):
+        self._base = base
+    
+    def __len__(self):
+        return self._base._num_reglas
+    
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            inicio, fin, paso = indice.indices(len(self))
+            if paso != 1:
+                return list(self)[indice]
+            return self._base._consultar_reglas("ORDER BY id LIMIT ? OFFSET ?",
+                                                (max(0, fin - inicio), inicio))
+        if indice < 0:
+            indice += len(self)
+        reglas = self._base._consultar_reglas("ORDER BY id LIMIT 1 OFFSET ?", (indice,))
+        if indice < 0 or not reglas:
+            raise IndexError("índice de regla fuera de rango")
+        return reglas[0]
+    
+    def __iter__(self):
+        cursor = self._base._conexion.execute(f"SELECT {CAMPOS_REGLA} FROM reglas ORDER BY id")
+        for fila in cursor:
+            yield self._base._fila_a_regla(fila)
+
+
+class BaseConocimientoSQLite(BaseConocimiento):
+    """
+    Base de conocimiento guardada en una base de datos SQLite.
+    
+    Las reglas no se cargan en memoria: la búsqueda exacta de agregar_experiencia
+    y la búsqueda de reglas coincidentes usan índices sobre el estado, la acción
+    y el resultado. Las modificaciones dentro de transaccion() se confirman
+    juntas, y el modo WAL permite consultar la base mientras se entrena.
+    """
+    
+    # Cada búsqueda crea reglas nuevas a partir de las filas
+    _explicaciones_incrementales = False
+    
+    def __init__(self, archivo_conocimiento=None, motor_coincidencias=None):
+        self._conexion = None
+        self._num_reglas = 0
+        self._profundidad_transaccion = 0
+        self._reglas = SecuenciaSQLite(self)
+        super().__init__(archivo_conocimiento or ARCHIVO_CONOCIMIENTO_SQLITE, motor_coincidencias,
+                         usar_diario=False)
+    
+    # ----- Filas -----
+    
+    def _clave_estado(self, estado):
+        return codificar_estado(estado, ordenado=True)
+    
+    def _valor_indexado(self, estado, columna):
+        """Valor de la columna indexada, o NULL si la condición no es un valor único"""
+        valor = estado.get(columna)
+        if columna not in estado or isinstance(valor, (list, tuple)):
+            return None
+        return json.dumps(valor, ensure_ascii=False)
+    
+    def _fila_de_regla(self, regla):
+        estado = regla.estado
+        return (self._clave_estado(estado), codificar_estado(estado),
+                *(self._valor_indexado(estado, columna) for columna in COLUMNAS_INDEXADAS),
+                regla.accion, regla.resultado, regla.contador, regla.tasa_exito,
+                regla._actualizacion, self._historial_codificado(regla))
+    
+    def _historial_codificado(self, regla):
+        return None if regla.historial is None else regla.historial.codificar()
+    
+    def _fila_a_regla(self, fila):
+        id_regla, estado, accion, resultado, contador, tasa_exito, actualizacion, historial = fila
+        regla = ReglaSQLite.desde_campos(compartir_estado(decodificar_estado(estado)), accion, resultado,
+                                         contador, tasa_exito, actualizacion, historial)
+        regla._id = id_regla
+        return regla
+    
+    def _consultar_reglas(self, condicion="", parametros=()):
+        cursor = self._conexion.execute(f"SELECT {CAMPOS_REGLA} FROM reglas {condicion}", parametros)
+        return [self._fila_a_regla(fila) for fila in cursor]
+    
+    def _ejecutar_insercion(self, filas):
+        return self._conexion.executemany(
+            "INSERT INTO reglas (clave, estado, posicion, distancia, accion_impala, accion, "
+            "resultado, contador, tasa_exito, actualizacion, historial) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            filas
+        )
+    
+    def _asignar_reglas(self, reglas):
+        # BaseConocimiento.__init__ asigna la lista inicial antes de abrir la base
+        if self._conexion is None:
+            return
+        
+        filas = [self._fila_de_regla(r) for r in reglas]
+        with self.transaccion():
+            self._conexion.execute("DELETE FROM reglas")
+            self._ejecutar_insercion(filas)
+        self._num_reglas = len(filas)
+    
+    @contextlib.contextmanager
+    def transaccion(self):
+        """Agrupa las modificaciones en una transacción (las anidadas se unen a la externa)"""
+        self._profundidad_transaccion += 1
+        if self._profundidad_transaccion == 1:
+            self._conexion.execute("BEGIN")
+        
+        try:
+            yield
+        except BaseException:
+            if self._profundidad_transaccion == 1:
+                self._conexion.execute("ROLLBACK")
+                self._num_reglas = self._conexion.execute("SELECT COUNT(*) FROM reglas").fetchone()[0]
+                # Las estadísticas ya contaban las reglas que se deshicieron
+                self._contar_reglas()
+                self._version += 1
+            raise
+        else:
+            if self._profundidad_transaccion == 1:
+                self._conexion.execute("COMMIT")
+        finally:
+            self._profundidad_transaccion -= 1
+    
+    def cerrar(self):
+        """Cierra la conexión con la base de datos"""
+        if self._conexion is not None:
+            self._conexion.close()
+            self._conexion = None
+    
+    # ----- Persistencia -----
+    
+    def cargar_conocimiento(self):
+        """Abre la base de datos y lee las estadísticas guardadas"""
+        if self._conexion is None:
+            directorio = os.path.dirname(self.archivo_conocimiento)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            
+            self._conexion = sqlite3.connect(self.archivo_conocimiento, isolation_level=None)
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+            self._conexion.executescript(ESQUEMA)
+            
+            # Bases creadas antes de guardar el historial de resultados
+            columnas = {fila[1] for fila in self._conexion.execute("PRAGMA table_info(reglas)")}
+            if "historial" not in columnas:
+                self._conexion.execute("ALTER TABLE reglas ADD COLUMN historial TEXT")
+        
+        fila = self._conexion.execute("SELECT valor FROM metadatos WHERE clave = 'estadisticas'").fetchone()
+        if fila:
+            self.estadisticas = json.loads(fila[0])
+        
+        self._num_reglas = self._conexion.execute("SELECT COUNT(*) FROM reglas").fetchone()[0]
+        self._contar_reglas()
+        self._version += 1
+        
+        print(f"Conocimiento cargado: {self._num_reglas} reglas")
+    
+    def guardar_conocimiento(self, en_segundo_plano=False):
+        """
+        Guarda las estadísticas; las reglas ya están en la base de datos, así
+        que no hace falta guardar en segundo plano
+        """
+        self._conexion.execute("INSERT OR REPLACE INTO metadatos (clave, valor) VALUES ('estadisticas', ?)",
+                               (json.dumps(self.estadisticas, ensure_ascii=False),))
+        
+        print(f"Conocimiento guardado: {self._num_reglas} reglas en {self.archivo_conocimiento}")
+    
+    # ----- Índices -----
+    
+    def _reconstruir_indices(self):
+        # Los índices los mantiene SQLite
+        self._version += 1
+    
+    def _buscar_regla_exacta(self, estado, accion, resultado):
+        reglas = self._consultar_reglas(
+            "WHERE clave = ? AND accion = ? AND resultado = ? ORDER BY id LIMIT 1",
+            (self._clave_estado(estado), accion, resultado)
+        )
+        return reglas[0] if reglas else None
+    
+    def _insertar_regla(self, regla):
+        self._ejecutar_insercion([self._fila_de_regla(regla)])
+        self._num_reglas += 1
+        self._version += 1
+        
+        regla_guardada = ReglaSQLite.desde_campos(regla.estado, regla.accion, regla.resultado,
+                                                  regla.contador, regla.tasa_exito, regla._actualizacion,
+                                                  regla.historial)
+        regla_guardada._id = self._conexion.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return regla_guardada
+    
+    def _actualizar_regla(self, regla, resultado):
+        regla.actualizar(resultado)
+        self._conexion.execute(
+            "UPDATE reglas SET resultado = ?, contador = ?, tasa_exito = ?, actualizacion = ?, historial = ? "
+            "WHERE id = ?",
+            (regla.resultado, regla.contador, regla.tasa_exito, regla._actualizacion,
+             self._historial_codificado(regla), regla._id)
+        )
+        self._version += 1
+    
+    # ----- Consultas -----
+    
+    def buscar_reglas_coincidentes(self, estado):
+        """Busca reglas que coincidan con el estado dado"""
+        # Las columnas indexadas descartan las reglas que condicionan otro valor;
+        # las candidatas se verifican con coincide_con_estado
+        condiciones = []
+        parametros = []
+        for columna in COLUMNAS_INDEXADAS:
+            try:
+                valor = json.dumps(estado[columna], ensure_ascii=False) if columna in estado else None
+            except TypeError:
+                valor = None
+            
+            if valor is None:
+                condiciones.append(f"{columna} IS NULL")
+            else:
+                condiciones.append(f"({columna} = ? OR {columna} IS NULL)")
+                parametros.append(valor)
+        
+        candidatas = self._consultar_reglas(f"WHERE {' AND '.join(condiciones)} ORDER BY id", parametros)
+        return [r for r in candidatas if r.coincide_con_estado(estado)]
+    
+    def instantanea(self):
+        """Las filas se actualizan en la base de datos: la instantánea copia las reglas"""
+        return self._instantanea_copiada()
+    
+    def _recuento_reglas(self):
+        """Conteos contando las filas de la tabla: (total, éxito, fracaso)"""
+        exito = self._conexion.execute("SELECT COUNT(*) FROM reglas WHERE resultado = 'éxito'").fetchone()[0]
+        return self._num_reglas, exito, self._num_reglas - exito
+    
+    def mostrar_reglas(self, filtro=None):
+        """Muestra todas las reglas"""
+        print(f"\n=== BASE DE CONOCIMIENTO ({self._num_reglas} reglas) ===")
+        
+        resultados = {"exito": "éxito", "fracaso": "fracaso"}
+        if filtro in resultados:
+            cursor = self._conexion.execute(
+                f"SELECT numero, {CAMPOS_REGLA} FROM (SELECT ROW_NUMBER() OVER (ORDER BY id) AS numero, * "
+                f"FROM reglas) WHERE resultado = ? ORDER BY id", (resultados[filtro],)
+            )
+        else:
+            cursor = self._conexion.execute(
+                f"SELECT ROW_NUMBER() OVER (ORDER BY id), {CAMPOS_REGLA} FROM reglas ORDER BY id"
+            )
+        
+        for fila in cursor:
+            print(f"{fila[0]:3}. {self._fila_a_regla(fila[1:])}")
@@ -0,0 +1,116 @@
+"""
+Acceso perezoso a archivos de conocimiento grandes
+"""
+
+import os
+from knowledge_base import BaseConocimiento, ReglaConocimiento, compartir_estado
+from formato_binario import LectorBinario, es_archivo_binario
+from persistencia import ESQUEMA_SEMILLA, DiarioConocimiento, LectorConocimientoJSON, detectar_esquema
+from paginacion import PaginadorReglas, exportar_reglas_texto, filtrar_reglas
+from config import *
+
+
+class ConocimientoPerezoso:
+    """
+    Vista de solo lectura de un archivo de conocimiento.
+    
+    Al abrirlo solo se leen la cabecera y las estadísticas; las reglas se leen
+    en orden y bajo demanda, de modo que los conteos y la primera página de un
+    listado no dependen del tamaño del archivo. cargar() devuelve la base
+    completa para las operaciones que modifican el conocimiento.
+    """
+    
+    def __init__(self, archivo_conocimiento=None):
+        self.archivo_conocimiento = archivo_conocimiento or ARCHIVO_CONOCIMIENTO
+        self.estadisticas = {}
+        self.total_reglas = 0
+        self._reglas_por_resultado = None
+        self._lector = None
+        self._base = None
+        
+        if not os.path.exists(self.archivo_conocimiento):
+            return
+        
+        if es_archivo_binario(self.archivo_conocimiento):
+            self._lector = LectorBinario.abrir(self.archivo_conocimiento, preparar_estado=compartir_estado)
+            cabecera = dict(self._lector.metadatos, estadisticas=self._lector.estadisticas,
+                            total_reglas=self._lector.num_reglas)
+        else:
+            self._lector = LectorConocimientoJSON(self.archivo_conocimiento)
+            cabecera = self._lector.cabecera
+        
+        # Con experiencias en el diario la cabecera no está al día, y los
+        # archivos semilla no tienen cabecera: en ambos casos se carga la base
+        diario = DiarioConocimiento(self.archivo_conocimiento + ".diario")
+        if detectar_esquema(cabecera) == ESQUEMA_SEMILLA or diario.leer(cabecera.get("generacion", 0)):
+            self._base = BaseConocimiento(self.archivo_conocimiento, usar_diario=True)
+            self.estadisticas = self._base.estadisticas
+            self.total_reglas = len(self._base.reglas)
+            return
+        
+        self.estadisticas = cabecera.get("estadisticas", {})
+        self.total_reglas = cabecera.get("total_reglas", 0)
+        self._reglas_por_resultado = cabecera.get("reglas_por_resultado")
+    
+    def contar_reglas(self, resultado=None):
+        """Cantidad de reglas, opcionalmente solo las de un resultado"""
+        if resultado is None:
+            return self.total_reglas
+        if self._base is not None:
+            return self._base.contar_reglas(resultado)
+        if self._reglas_por_resultado is not None:
+            return self._reglas_por_resultado.get(resultado, 0)
+        
+        # Archivos anteriores sin conteo por resultado
+        clave = "reglas_exito" if resultado == "éxito" else "reglas_fracaso"
+        return self.estadisticas.get(clave, 0)
+    
+    def _iterar_todas(self):
+        if self._base is not None:
+            yield from self._base.reglas
+        elif isinstance(self._lector, LectorBinario):
+            for campos in self._lector:
+                yield ReglaConocimiento.desde_campos(*campos)
+        elif self._lector is not None:
+            for datos in self._lector:
+                yield ReglaConocimiento.from_dict(datos)
+    
+    def iterar_reglas(self, filtro=None, accion=None, posicion=None, ordenar=None):
+        """
+        Itera (número, regla) en el orden del archivo, con el número de la regla
+        en toda la base. Filtros y orden como en BaseConocimiento.iterar_reglas;
+        sin ordenar, las reglas se leen del archivo a medida que se piden
+        """
+        return filtrar_reglas(enumerate(self._iterar_todas(), 1), filtro, accion, posicion, ordenar)
+    
+    def paginar(self, filtro=None, accion=None, posicion=None, ordenar=None, tamaño=None):
+        """Paginador que lee del archivo solo hasta la página mostrada"""
+        return PaginadorReglas(self.iterar_reglas(filtro, accion, posicion, ordenar), tamaño)
+    
+    def pagina(self, numero, tamaño=TAMAÑO_PAGINA_REGLAS, filtro=None):
+        """Reglas de la página indicada (desde 0) como lista de (número, regla)"""
+        return self.paginar(filtro, tamaño=tamaño).pagina(numero)
+    
+    def exportar_a_texto(self, archivo_salida, filtro=None, accion=None, posicion=None, ordenar=None):
+        """Exporta el conocimiento a texto leyendo las reglas del archivo de a bloques, sin cargar la base"""
+        exportar_reglas_texto(archivo_salida, self.estadisticas,
+                              self.iterar_reglas(filtro, accion, posicion, ordenar))
+        print(f"Base de conocimiento exportada a {archivo_salida}")
+    
+    def mostrar_estadisticas(self):
+        """Muestra las estadísticas guardadas en la cabecera"""
+        print("\n=== ESTADÍSTICAS DE CONOCIMIENTO ===")
+        print(f"Total reglas: {self.total_reglas}")
+        print(f"Reglas éxito: {self.contar_reglas('éxito')}")
+        print(f"Reglas fracaso: {self.contar_reglas('fracaso')}")
+        print(f"Consultas totales: {self.estadisticas.get('consultas_totales', 0)}")
+        
+        if self.estadisticas.get('consultas_totales', 0) > 0:
+            tasa_acierto = self.estadisticas.get('aciertos', 0) / self.estadisticas['consultas_totales']
+            print(f"Tasa de acierto: {tasa_acierto:.2%}")
+    
+    def cargar(self):
+        """Carga la base de conocimiento completa"""
+        if self._base is None:
+            self._base = BaseConocimiento(self.archivo_conocimiento)
+        return self._base
@@ -55,6 +55,44 @@ PROBABILIDAD_EXPLORACION = 0.3
 
 # ===== ARCHIVOS =====
 ARCHIVO_CONOCIMIENTO = "data/knowledge.json"
+ARCHIVO_CONOCIMIENTO_SQLITE = "data/knowledge.db"
+DIRECTORIO_CONOCIMIENTO_PARTICIONADO = "data/knowledge_particiones"
+
+# ===== BASE DE CONOCIMIENTO =====
+# Motor para buscar reglas coincidentes: "indice" (hash por firma) o "bitset"
+MOTOR_COINCIDENCIAS = "indice"
+
+# Repetir la generalización hasta que no queden reglas que unir
+GENERALIZAR_HASTA_PUNTO_FIJO = False
+
+# Guardar con diario: cada guardado solo agrega las experiencias nuevas y la
+# instantánea completa se reescribe cada COMPACTAR_DIARIO_CADA registros
+USAR_DIARIO_CONOCIMIENTO = False
+COMPACTAR_DIARIO_CADA = 10000
+
+# Resultados recientes que se guardan por regla para la tasa de éxito
+# reciente (0 desactiva el historial)
+HISTORIAL_RESULTADOS = 16
+
+# Guardados periódicos del entrenamiento desde un hilo aparte, sin detenerlo
+GUARDAR_EN_SEGUNDO_PLANO = False
+
+# Atributos que debe tener el estado de toda regla (validar_conocimiento)
+CAMPOS_ESTADO_OBLIGATORIOS = ["posicion", "distancia", "accion_impala"]
+
+# Capacidad de BaseConocimientoAcotada (None: el entrenamiento usa una base
+# sin límite) y regla a desalojar al superarla: "lfu" (menor contador), "lru"
+# (la que obtener_mejor_accion eligió hace más tiempo) o "confianza" (menor
+# evidencia a favor de su resultado)
+CAPACIDAD_MAXIMA_REGLAS = None
+POLITICA_DESALOJO = "lfu"
+
+# Reglas por página al listar el conocimiento en los menús
+TAMAÑO_PAGINA_REGLAS = 20
+
+# Depuración: después de cada cambio en la base, comparar los conteos de
+# reglas de las estadísticas con un recuento completo
+VERIFICAR_ESTADISTICAS = False
 
 # ===== CONSTANTES MATEMÁTICAS =====
 GRADOS_A_RAD = math.pi / 180
@@ -0,0 +1,325 @@
+"""
+Benchmarks de la base de conocimiento
+Mide el costo de las operaciones principales con bases de distintos tamaños
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+import time
+import json
+import tempfile
+import tracemalloc
+import io
+import contextlib
+from datetime import datetime
+from knowledge_base import ReglaConocimiento, BaseConocimiento
+from indices_conocimiento import IndiceCoincidencias, MotorBitset
+from almacen_columnar import BaseConocimientoColumnar
+from formato_binario import EXTENSION_BINARIA
+from almacen_mapeado import BaseConocimientoMapeada
+from training import Entrenador
+from config import *
+
+DOMINIOS_ESTADO = {
+    "posicion": list(POSICIONES_LEON.keys()),
+    "distancia": ["muy_cerca", "cerca", "media", "lejos"],
+    "accion_impala": ACCIONES_IMPALA[:-1] + [None],
+    "león_escondido": [False, True]
+}
+
+def generar_estado(rng):
+    """Genera un estado abstracto aleatorio como el de Mundo.obtener_estado_para_conocimiento"""
+    return {clave: rng.choice(dominio) for clave, dominio in DOMINIOS_ESTADO.items()}
+
+def generar_reglas_sinteticas(cantidad, semilla=0, proporcion_generalizadas=0.2):
+    """
+    Genera reglas sintéticas: la mayoría con estado exacto y una parte
+    generalizada con listas de valores en uno o dos atributos
+    """
+    rng = random.Random(semilla)
+    reglas = []
+    
+    for _ in range(cantidad):
+        estado = generar_estado(rng)
+        
+        if rng.random() < proporcion_generalizadas:
+            for clave in rng.sample(list(DOMINIOS_ESTADO), rng.randint(1, 2)):
+                estado[clave] = rng.sample(DOMINIOS_ESTADO[clave], 2)
+        
+        resultado = "éxito" if rng.random() < 0.6 else "fracaso"
+        regla = ReglaConocimiento(estado, rng.choice(ACCIONES_LEON), resultado, rng.randint(1, 20))
+        regla.tasa_exito = rng.random()
+        reglas.append(regla)
+    
+    return reglas
+
+def medir(funcion, repeticiones=1):
+    """Devuelve el tiempo promedio en segundos de ejecutar funcion()"""
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones
+
+def benchmark_coincidencias(tamaños=(1000, 10000, 100000), consultas=200, lineal_hasta=100000):
+    """Compara buscar reglas coincidentes con recorrido lineal, índice, bitsets y la base columnar"""
+    print("\n=== BÚSQUEDA DE REGLAS COINCIDENTES ===")
+    print(f"{'Reglas':>10} {'Lineal (µs)':>14} {'Índice (µs)':>14} {'Bitset (µs)':>14} "
+          f"{'Columnar (µs)':>14} {'Coincidencias':>14}")
+    
+    rng = random.Random(1)
+    estados = [generar_estado(rng) for _ in range(consultas)]
+    
+    for tamaño in tamaños:
+        reglas = generar_reglas_sinteticas(tamaño)
+        columnar = crear_base_temporal(BaseConocimientoColumnar)
+        columnar.reglas = reglas
+        buscadores = [IndiceCoincidencias(reglas).buscar, MotorBitset(reglas).buscar,
+                      columnar.buscar_reglas_coincidentes]
+        
+        def lineal():
+            for estado in estados:
+                [r for r in reglas if r.coincide_con_estado(estado)]
+        
+        def consultar(buscar):
+            for estado in estados:
+                buscar(estado)
+        
+        coincidencias = sum(len(buscadores[0](e)) for e in estados) / consultas
+        
+        if tamaño <= lineal_hasta:
+            t_lineal = f"{medir(lineal) / consultas * 1e6:>14.1f}"
+        else:
+            t_lineal = f"{'-':>14}"
+        tiempos = [medir(lambda: consultar(b)) / consultas * 1e6 for b in buscadores]
+        
+        print(f"{tamaño:>10} {t_lineal} {tiempos[0]:>14.1f} {tiempos[1]:>14.1f} "
+              f"{tiempos[2]:>14.1f} {coincidencias:>14.1f}")
+
+def crear_base_temporal(clase=BaseConocimiento):
+    """Crea una base de conocimiento vacía en un directorio temporal"""
+    archivo = os.path.join(tempfile.mkdtemp(), "knowledge.json")
+    return clase(archivo)
+
+def generalizar_por_pares(reglas):
+    """Generalización original: compara cada regla con todas las posteriores"""
+    nuevas_reglas = []
+    procesadas = set()
+    
+    for i, regla1 in enumerate(reglas):
+        if i in procesadas:
+            continue
+        procesadas.add(i)
+        
+        for j in range(i + 1, len(reglas)):
+            if j not in procesadas and regla1.puede_unirse_con(reglas[j]):
+                procesadas.add(j)
+                regla1 = regla1.unir_con(reglas[j])
+                break
+        
+        nuevas_reglas.append(regla1)
+    
+    return nuevas_reglas
+
+def benchmark_generalizacion(tamaños=(1000, 10000, 100000), por_pares_hasta=10000):
+    """Compara la generalización por pares contra la agrupada por firmas"""
+    print("\n=== GENERALIZACIÓN DEL CONOCIMIENTO ===")
+    resultados = []
+    
+    for tamaño in tamaños:
+        reglas = generar_reglas_sinteticas(tamaño)
+        
+        if tamaño <= por_pares_hasta:
+            t_pares = medir(lambda: generalizar_por_pares(reglas))
+        else:
+            t_pares = None
+        
+        base = crear_base_temporal()
+        base.reglas = list(reglas)
+        t_firmas = medir(base.generalizar_conocimiento)
+        
+        resultados.append((tamaño, t_pares, t_firmas))
+    
+    print(f"\n{'Reglas':>10} {'Por pares (s)':>14} {'Por firmas (s)':>15} {'Aceleración':>12}")
+    for tamaño, t_pares, t_firmas in resultados:
+        if t_pares is None:
+            print(f"{tamaño:>10} {'-':>14} {t_firmas:>15.3f} {'-':>12}")
+        else:
+            print(f"{tamaño:>10} {t_pares:>14.3f} {t_firmas:>15.3f} {t_pares / t_firmas:>11.1f}x")
+
+def benchmark_mejor_accion(tamaños=(1000, 10000, 100000), consultas=200):
+    """Compara el análisis de la mejor acción: recorrido lineal, índice en memoria y columnar"""
+    print("\n=== SELECCIÓN DE LA MEJOR ACCIÓN ===")
+    print(f"{'Reglas':>10} {'Lineal (µs)':>14} {'Índice (µs)':>14} {'Columnar (µs)':>14}")
+    
+    rng = random.Random(2)
+    estados = [generar_estado(rng) for _ in range(consultas)]
+    
+    for tamaño in tamaños:
+        reglas = generar_reglas_sinteticas(tamaño)
+        
+        def lineal():
+            for estado in estados:
+                exito = [r for r in reglas if r.coincide_con_estado(estado) and r.resultado == "éxito"]
+                if exito:
+                    max(exito, key=lambda r: r.tasa_exito * r.contador)
+        
+        tiempos = [medir(lineal) / consultas * 1e6]
+        
+        for clase in (BaseConocimiento, BaseConocimientoColumnar):
+            base = crear_base_temporal(clase)
+            base.reglas = list(reglas)
+            
+            def analizar():
+                for estado in estados:
+                    base._calcular_analisis(estado)
+            
+            tiempos.append(medir(analizar) / consultas * 1e6)
+        
+        print(f"{tamaño:>10} {tiempos[0]:>14.1f} {tiempos[1]:>14.1f} {tiempos[2]:>14.1f}")
+
+def benchmark_persistencia(tamaños=(10000, 100000, 1000000)):
+    """Compara guardar y cargar la base en JSON y en la instantánea binaria"""
+    print("\n=== GUARDAR Y CARGAR ===")
+    resultados = []
+    directorio = tempfile.mkdtemp()
+    
+    for tamaño in tamaños:
+        reglas = generar_reglas_sinteticas(tamaño)
+        fila = [tamaño]
+        
+        for extension in ("json", EXTENSION_BINARIA.lstrip(".")):
+            archivo = os.path.join(directorio, f"knowledge.{extension}")
+            base = BaseConocimiento(archivo)
+            base.reglas = reglas
+            
+            fila.append(medir(base.guardar_conocimiento))
+            fila.append(medir(lambda: BaseConocimiento(archivo)))
+            fila.append(os.path.getsize(archivo) / 2 ** 20)
+            os.unlink(archivo)
+        
+        resultados.append(fila)
+    
+    print(f"\n{'Reglas':>10} {'JSON: guardar':>14} {'cargar (s)':>11} {'MB':>8} "
+          f"{'Binario: guardar':>17} {'cargar (s)':>11} {'MB':>8}")
+    for tamaño, g_json, c_json, mb_json, g_bin, c_bin, mb_bin in resultados:
+        print(f"{tamaño:>10} {g_json:>14.2f} {c_json:>11.2f} {mb_json:>8.1f} "
+              f"{g_bin:>17.2f} {c_bin:>11.2f} {mb_bin:>8.1f}")
+
+def benchmark_base_mapeada(tamaños=(10000, 100000, 1000000), consultas=200):
+    """Compara arranque y memoria de una base cargada y una mapeada en memoria"""
+    print("\n=== BASE MAPEADA EN MEMORIA ===")
+    resultados = []
+    directorio = tempfile.mkdtemp()
+    
+    rng = random.Random(3)
+    estados = [generar_estado(rng) for _ in range(consultas)]
+    
+    for tamaño in tamaños:
+        archivo = os.path.join(directorio, f"knowledge{EXTENSION_BINARIA}")
+        base = BaseConocimiento(archivo)
+        base.reglas = generar_reglas_sinteticas(tamaño)
+        base.guardar_conocimiento()
+        del base
+        
+        fila = [tamaño]
+        for clase in (BaseConocimiento, BaseConocimientoMapeada):
+            tracemalloc.start()
+            inicio = time.perf_counter()
+            base = clase(archivo)
+            arranque = time.perf_counter() - inicio
+            
+            for estado in estados:
+                base.buscar_reglas_coincidentes(estado)
+            consulta = (time.perf_counter() - inicio - arranque) / consultas
+            memoria, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            
+            fila += [arranque, consulta * 1e6, memoria / 2 ** 20]
+            del base
+        
+        resultados.append(fila)
+        os.unlink(archivo)
+    
+    print(f"\n{'Reglas':>10} {'Cargada: arranque (s)':>22} {'consulta (µs)':>14} {'MB':>8} "
+          f"{'Mapeada: arranque (s)':>22} {'consulta (µs)':>14} {'MB':>8}")
+    for tamaño, a_carga, c_carga, m_carga, a_mapa, c_mapa, m_mapa in resultados:
+        print(f"{tamaño:>10} {a_carga:>22.3f} {c_carga:>14.1f} {m_carga:>8.1f} "
+              f"{a_mapa:>22.4f} {c_mapa:>14.1f} {m_mapa:>8.1f}")
+
+class ReglaSinCompactar:
+    """Representación anterior de ReglaConocimiento, para comparar memoria"""
+    
+    def __init__(self, estado, accion, resultado, contador=1):
+        self.estado = estado
+        self.accion = accion
+        self.resultado = resultado
+        self.contador = contador
+        self.tasa_exito = 1.0 if resultado == "éxito" else 0.0
+        self.ultima_actualizacion = datetime.now().isoformat()
+    
+    @classmethod
+    def from_dict(cls, data):
+        regla = cls(data["estado"], data["accion"], data["resultado"], data["contador"])
+        regla.tasa_exito = data["tasa_exito"]
+        regla.ultima_actualizacion = data["ultima_actualizacion"]
+        return regla
+
+def bytes_por_regla(clase, datos):
+    """Memoria por regla al cargar datos (lista de diccionarios JSON) con clase.from_dict"""
+    texto = json.dumps(datos)
+    
+    tracemalloc.start()
+    reglas = [clase.from_dict(d) for d in json.loads(texto)]
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return memoria / len(reglas)
+
+def benchmark_memoria(tamaños=(10000, 100000)):
+    """Compara la memoria por regla de la representación anterior y la compacta"""
+    print("\n=== MEMORIA POR REGLA ===")
+    print(f"{'Reglas':>10} {'Anterior (B)':>14} {'Compacta (B)':>14} {'Ahorro':>8}")
+    
+    for tamaño in tamaños:
+        datos = [r.to_dict() for r in generar_reglas_sinteticas(tamaño)]
+        
+        anterior = bytes_por_regla(ReglaSinCompactar, datos)
+        compacta = bytes_por_regla(ReglaConocimiento, datos)
+        
+        print(f"{tamaño:>10} {anterior:>14.0f} {compacta:>14.0f} {1 - compacta / anterior:>8.1%}")
+
+def benchmark_guardado_entrenamiento(reglas_iniciales=50000, incursiones=400, frecuencias=(None, 100, 20)):
+    """Incursiones por segundo según la frecuencia de guardado, con y sin guardado en segundo plano"""
+    print(f"\n=== GUARDADO DURANTE EL ENTRENAMIENTO ({reglas_iniciales} reglas iniciales) ===")
+    reglas = generar_reglas_sinteticas(reglas_iniciales)
+    
+    print(f"\n{'Guardar cada':>13} {'Normal (inc/s)':>15} {'Segundo plano (inc/s)':>22} {'Unidos':>7}")
+    for guardar_cada in frecuencias:
+        fila = []
+        for en_segundo_plano in (False, True):
+            base = crear_base_temporal()
+            base.reglas = [r.copiar() for r in reglas]
+            entrenador = Entrenador(base)
+            
+            with contextlib.redirect_stdout(io.StringIO()):
+                duracion = medir(lambda: entrenador.ciclo_entrenamiento(
+                    incursiones, list(POSICIONES_LEON.keys()), guardar_cada=guardar_cada,
+                    guardar_en_segundo_plano=en_segundo_plano))
+            fila.append(incursiones / duracion)
+        
+        print(f"{str(guardar_cada or '-'):>13} {fila[0]:>15.1f} {fila[1]:>22.1f} "
+              f"{base._guardado.coalescidos:>7}")
+
+if __name__ == "__main__":
+    tamaños = tuple(int(t) for t in sys.argv[1:]) or (1000, 10000, 100000)
+    
+    benchmark_coincidencias(tamaños)
+    benchmark_generalizacion(tamaños)
+    benchmark_mejor_accion(tamaños)
+    benchmark_persistencia(tamaños)
+    benchmark_base_mapeada(tamaños)
+    benchmark_memoria(tamaños)
+    benchmark_guardado_entrenamiento()
@@ -0,0 +1,288 @@
+"""
+Formato binario compacto para instantáneas de la base de conocimiento
+
+Estructura del archivo (little-endian):
+    cabecera   CABECERA con versión, cantidad de reglas y desplazamientos
+    metadatos  JSON con estadísticas, generación y fecha de guardado
+    valores    tabla de valores distintos (claves, valores de condiciones,
+               acciones y resultados) codificados como texto JSON
+    estados    tabla de estados distintos como pares (clave, valor) de índices
+    reglas     registros de tamaño fijo REGISTRO, uno por regla (REGISTRO_V2
+               sin historial en la versión 2)
+    por estado tabla con los índices de las reglas de cada estado
+"""
+
+import json
+import mmap
+import struct
+from utils import clave_canonica
+from persistencia import escribir_atomico, normalizar_conocimiento
+
+MAGICO = b"KBIN"
+VERSION_FORMATO = 3
+VERSIONES_LEGIBLES = (2, 3)
+EXTENSION_BINARIA = ".kbin"
+
+# mágico, versión, reservado, reglas, metadatos, valores, estados, registros, reglas por estado
+CABECERA = struct.Struct("<4sHHQQQQQQ")
+# estado, acción, resultado, fecha como texto (o SIN_VALOR), historial (o SIN_VALOR),
+# contador, tasa, fecha en µs
+REGISTRO = struct.Struct("<IIIIIqdq")
+REGISTRO_V2 = struct.Struct("<IIIIqdq")
+ENTERO = struct.Struct("<I")
+PAR_ENTEROS = struct.Struct("<II")
+SIN_VALOR = 0xFFFFFFFF
+
+
+def es_archivo_binario(ruta):
+    """Indica si la ruta corresponde a una instantánea binaria"""
+    return str(ruta).endswith(EXTENSION_BINARIA)
+
+
+class TablaValores:
+    """Asigna un índice a cada valor distinto durante la escritura"""
+    
+    def __init__(self):
+        self.textos = []
+        self._indices = {}
+    
+    def indice(self, valor):
+        clave = (type(valor).__name__, clave_canonica(valor))
+        indice = self._indices.get(clave)
+        if indice is None:
+            indice = self._indices[clave] = len(self.textos)
+            self.textos.append(json.dumps(valor, ensure_ascii=False).encode("utf-8"))
+        return indice
+
+
+def _tabla_desplazamientos(partes):
+    """Cantidad, desplazamientos de cada parte y partes concatenadas"""
+    desplazamientos = [0]
+    for parte in partes:
+        desplazamientos.append(desplazamientos[-1] + len(parte))
+    return (ENTERO.pack(len(partes)) +
+            struct.pack(f"<{len(desplazamientos)}I", *desplazamientos) +
+            b"".join(partes))
+
+
+def _alinear(datos, multiplo=8):
+    datos += b"\0" * (-len(datos) % multiplo)
+    return datos
+
+
+def codificar_instantanea(reglas, estadisticas, **metadatos):
+    """Codifica reglas y estadísticas en el formato binario"""
+    valores = TablaValores()
+    estados = []
+    indices_estados = {}
+    reglas_por_estado = []
+    registros = bytearray()
+    
+    for id_regla, regla in enumerate(reglas):
+        estado = regla.estado
+        clave_estado = clave_canonica(estado)
+        indice_estado = indices_estados.get(clave_estado)
+        if indice_estado is None:
+            indice_estado = indices_estados[clave_estado] = len(estados)
+            pares = []
+            for clave, valor in estado.items():
+                pares += [valores.indice(clave), valores.indice(valor)]
+            estados.append(struct.pack(f"<{len(pares)}I", *pares))
+            reglas_por_estado.append([])
+        reglas_por_estado[indice_estado].append(id_regla)
+        
+        actualizacion = regla._actualizacion
+        if isinstance(actualizacion, int):
+            fecha_texto = SIN_VALOR
+        else:
+            fecha_texto, actualizacion = valores.indice(actualizacion), 0
+        
+        # Los historiales se guardan codificados y se repiten mucho entre reglas
+        historial = regla.historial
+        indice_historial = SIN_VALOR if historial is None else valores.indice(historial.codificar())
+        
+        registros += REGISTRO.pack(indice_estado, valores.indice(regla.accion),
+                                   valores.indice(regla.resultado), fecha_texto, indice_historial,
+                                   regla.contador, regla.tasa_exito, actualizacion)
+    
+    metadatos["estadisticas"] = estadisticas
+    bloque_metadatos = _alinear(json.dumps(metadatos, ensure_ascii=False).encode("utf-8"))
+    bloque_valores = _alinear(_tabla_desplazamientos(valores.textos))
+    bloque_estados = _alinear(_tabla_desplazamientos(estados))
+    bloque_por_estado = _tabla_desplazamientos([struct.pack(f"<{len(ids)}I", *ids)
+                                                for ids in reglas_por_estado])
+    
+    inicio_metadatos = CABECERA.size
+    inicio_valores = inicio_metadatos + len(bloque_metadatos)
+    inicio_estados = inicio_valores + len(bloque_valores)
+    inicio_registros = inicio_estados + len(bloque_estados)
+    inicio_por_estado = inicio_registros + len(registros)
+    
+    cabecera = CABECERA.pack(MAGICO, VERSION_FORMATO, 0, len(registros) // REGISTRO.size,
+                             inicio_metadatos, inicio_valores, inicio_estados, inicio_registros,
+                             inicio_por_estado)
+    return b"".join([cabecera, bloque_metadatos, bloque_valores, bloque_estados,
+                     bytes(registros), bloque_por_estado])
+
+
+def guardar_binario(ruta, reglas, estadisticas, **metadatos):
+    """Guarda una instantánea binaria de forma atómica"""
+    datos = codificar_instantanea(reglas, estadisticas, **metadatos)
+    escribir_atomico(ruta, lambda f: f.write(datos), modo='wb')
+
+
+class LectorBinario:
+    """
+    Lector de instantáneas binarias.
+    
+    Sobre un archivo mapeado en memoria solo se decodifican los registros,
+    estados y valores que se consultan; los ya decodificados se memorizan.
+    preparar_estado se aplica una vez a cada estado decodificado.
+    """
+    
+    def __init__(self, datos, preparar_estado=None):
+        self.datos = memoryview(datos)
+        self.preparar_estado = preparar_estado
+        if len(self.datos) < CABECERA.size:
+            raise ValueError("No es una instantánea binaria de conocimiento")
+        (magico, version, _, self.num_reglas, inicio_metadatos, inicio_valores,
+         inicio_estados, self._inicio_registros, inicio_por_estado) = CABECERA.unpack_from(self.datos)
+        
+        if magico != MAGICO:
+            raise ValueError("No es una instantánea binaria de conocimiento")
+        if version not in VERSIONES_LEGIBLES:
+            raise ValueError(f"Versión de formato binario no soportada: {version}")
+        self._registro = REGISTRO if version == VERSION_FORMATO else REGISTRO_V2
+        
+        metadatos = bytes(self.datos[inicio_metadatos:inicio_valores]).rstrip(b"\0")
+        self.metadatos = json.loads(metadatos.decode("utf-8"))
+        self.estadisticas = self.metadatos.pop("estadisticas")
+        
+        self._valores = self._leer_tabla(inicio_valores)
+        self._estados = self._leer_tabla(inicio_estados)
+        self._por_estado = self._leer_tabla(inicio_por_estado)
+        self.num_estados, = ENTERO.unpack_from(self.datos, inicio_estados)
+        self._valores_decodificados = {}
+        self._estados_decodificados = {}
+        self._reglas_por_estado = {}
+    
+    @classmethod
+    def abrir(cls, ruta, preparar_estado=None):
+        """Abre una instantánea mapeándola en memoria (solo lectura)"""
+        with open(ruta, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), preparar_estado)
+    
+    def cerrar(self):
+        """Libera el mapeo; el lector deja de ser utilizable"""
+        objeto = self.datos.obj
+        self.datos.release()
+        if isinstance(objeto, mmap.mmap):
+            objeto.close()
+    
+    def _leer_tabla(self, inicio):
+        """(inicio de los desplazamientos, inicio de los datos) de una tabla de partes"""
+        cantidad, = ENTERO.unpack_from(self.datos, inicio)
+        return inicio + ENTERO.size, inicio + ENTERO.size * (cantidad + 2)
+    
+    def _parte(self, tabla, indice):
+        """Bytes de la parte indice de una tabla, sin leer el resto de la tabla"""
+        desplazamientos, base = tabla
+        inicio, fin = PAR_ENTEROS.unpack_from(self.datos, desplazamientos + indice * ENTERO.size)
+        return self.datos[base + inicio:base + fin]
+    
+    def valor(self, indice):
+        valor = self._valores_decodificados.get(indice, self)
+        if valor is self:
+            texto = bytes(self._parte(self._valores, indice))
+            valor = self._valores_decodificados[indice] = json.loads(texto.decode("utf-8"))
+        return valor
+    
+    def estado(self, indice):
+        estado = self._estados_decodificados.get(indice)
+        if estado is None:
+            parte = self._parte(self._estados, indice)
+            pares = struct.unpack(f"<{len(parte) // ENTERO.size}I", parte)
+            estado = {self.valor(pares[i]): self.valor(pares[i + 1]) for i in range(0, len(pares), 2)}
+            if self.preparar_estado:
+                estado = self.preparar_estado(estado)
+            self._estados_decodificados[indice] = estado
+        return estado
+    
+    def reglas_del_estado(self, indice):
+        """Índices (ascendentes) de las reglas cuyo estado es el estado indice"""
+        reglas = self._reglas_por_estado.get(indice)
+        if reglas is None:
+            parte = self._parte(self._por_estado, indice)
+            reglas = self._reglas_por_estado[indice] = struct.unpack(f"<{len(parte) // ENTERO.size}I", parte)
+        return reglas
+    
+    def _decodificar(self, campos):
+        if self._registro is REGISTRO_V2:
+            estado, accion, resultado, fecha_texto, contador, tasa_exito, actualizacion = campos
+            historial = SIN_VALOR
+        else:
+            estado, accion, resultado, fecha_texto, historial, contador, tasa_exito, actualizacion = campos
+        
+        if fecha_texto != SIN_VALOR:
+            actualizacion = self.valor(fecha_texto)
+        return (self.estado(estado), self.valor(accion), self.valor(resultado),
+                contador, tasa_exito, actualizacion,
+                None if historial == SIN_VALOR else self.valor(historial))
+    
+    def regla(self, indice):
+        """
+        Campos (estado, accion, resultado, contador, tasa_exito, actualizacion,
+        historial codificado o None) de una regla
+        """
+        if not 0 <= indice < self.num_reglas:
+            raise IndexError("índice de regla fuera de rango")
+        registro = self._registro
+        return self._decodificar(registro.unpack_from(self.datos, self._inicio_registros + indice * registro.size))
+    
+    def __iter__(self):
+        registro = self._registro
+        fin = self._inicio_registros + self.num_reglas * registro.size
+        for campos in registro.iter_unpack(self.datos[self._inicio_registros:fin]):
+            yield self._decodificar(campos)
+
+
+def _contar_por_resultado(reglas):
+    """Conteo exacto por resultado que guardar_conocimiento escribe en la cabecera"""
+    exito = sum(1 for regla in reglas if regla.resultado == "éxito")
+    return {"éxito": exito, "fracaso": len(reglas) - exito}
+
+
+def json_a_binario(ruta_json, ruta_binaria):
+    """Convierte un archivo de conocimiento JSON (instantánea o semilla) al formato binario"""
+    from knowledge_base import ReglaConocimiento
+    
+    with open(ruta_json, 'r', encoding='utf-8') as f:
+        data = normalizar_conocimiento(json.load(f))
+    
+    reglas = [ReglaConocimiento.from_dict(r) for r in data.get("reglas", [])]
+    metadatos = {clave: data[clave] for clave in ("generacion", "fecha_guardado") if clave in data}
+    guardar_binario(ruta_binaria, reglas, data.get("estadisticas", {}),
+                    reglas_por_resultado=_contar_por_resultado(reglas), **metadatos)
+    return len(reglas)
+
+
+def binario_a_json(ruta_binaria, ruta_json):
+    """Convierte una instantánea binaria al formato JSON de guardar_conocimiento"""
+    from knowledge_base import ReglaConocimiento
+    
+    with open(ruta_binaria, 'rb') as f:
+        lector = LectorBinario(f.read())
+    
+    reglas = [ReglaConocimiento.desde_campos(*campos) for campos in lector]
+    # Misma disposición que guardar_conocimiento: la cabecera antes de las reglas
+    data = {
+        "estadisticas": lector.estadisticas,
+        "fecha_guardado": lector.metadatos.get("fecha_guardado"),
+        "total_reglas": len(reglas),
+        "generacion": lector.metadatos.get("generacion", 0),
+        "reglas_por_resultado": _contar_por_resultado(reglas),
+        "reglas": [regla.to_dict() for regla in reglas]
+    }
+    
+    escribir_atomico(ruta_json, lambda f: json.dump(data, f, indent=2, ensure_ascii=False))
+    return len(reglas)
@@ -0,0 +1,526 @@
+"""
+Índices para búsqueda rápida de reglas de conocimiento
+"""
+
+import itertools
+from collections import deque
+from utils import clave_canonica
+
+
+class IndiceCoincidencias:
+    """
+    Índice compilado que responde qué reglas coinciden con un estado.
+    
+    Las reglas se agrupan por firma (atributos que condicionan). Dentro de
+    cada firma, cada regla se registra bajo todas las combinaciones de
+    valores que acepta (las listas se expanden), de modo que una consulta
+    es una búsqueda por hash por firma. Las reglas con rangos o valores no
+    hashables se verifican con coincide_con_estado.
+    """
+    
+    def __init__(self, reglas=()):
+        self.reglas = []
+        self.eliminadas = 0
+        self._por_firma = {}
+        self._sin_indice = []
+        
+        for regla in reglas:
+            self.agregar(regla)
+    
+    def __len__(self):
+        return len(self.reglas) - self.eliminadas
+    
+    def _valores_aceptados(self, valor):
+        """Valores exactos que acepta una condición, o None si no es indexable"""
+        if isinstance(valor, tuple):
+            return None
+        
+        valores = valor if isinstance(valor, list) else [valor]
+        try:
+            for v in valores:
+                hash(v)
+        except TypeError:
+            return None
+        
+        return valores
+    
+    def agregar(self, regla):
+        """Agrega una regla al final del índice y devuelve su id"""
+        id_regla = len(self.reglas)
+        self.reglas.append(regla)
+        
+        firma = tuple(sorted(regla.estado))
+        valores_por_clave = []
+        for clave in firma:
+            valores = self._valores_aceptados(regla.estado[clave])
+            if valores is None:
+                self._sin_indice.append(id_regla)
+                return id_regla
+            valores_por_clave.append(valores)
+        
+        tabla = self._por_firma.setdefault(firma, {})
+        for combinacion in itertools.product(*valores_por_clave):
+            ids = tabla.setdefault(combinacion, [])
+            if not ids or ids[-1] != id_regla:
+                ids.append(id_regla)
+        return id_regla
+    
+    def quitar(self, id_regla):
+        """
+        Quita la regla con ese id. Sus entradas quedan en las tablas y se
+        descartan al buscar hasta que el índice se reconstruye
+        """
+        if self.reglas[id_regla] is not None:
+            self.reglas[id_regla] = None
+            self.eliminadas += 1
+    
+    def buscar(self, estado):
+        """Devuelve las reglas que coinciden con el estado, en orden de inserción"""
+        return self._buscar(estado, self.reglas, len(self.reglas))
+    
+    def congelar(self):
+        """Vista de solo lectura del índice actual, que no ve los cambios posteriores"""
+        return VistaCongelada(self, list(self.reglas), len(self.reglas))
+    
+    def _buscar(self, estado, reglas, limite):
+        """Búsqueda entre los ids menores que limite, tomando las reglas de la lista dada"""
+        ids = set()
+        
+        # Las tablas pueden crecer mientras una vista congelada busca desde otro hilo
+        try:
+            for firma, tabla in list(self._por_firma.items()):
+                if not all(clave in estado for clave in firma):
+                    continue
+                
+                encontrados = tabla.get(tuple(estado[clave] for clave in firma))
+                if encontrados:
+                    ids.update(encontrados)
+        except TypeError:
+            return [r for r in reglas[:limite] if r is not None and r.coincide_con_estado(estado)]
+        
+        for id_regla in self._sin_indice:
+            if id_regla >= limite:
+                break
+            regla = reglas[id_regla]
+            if regla is not None and regla.coincide_con_estado(estado):
+                ids.add(id_regla)
+        
+        if reglas is not self.reglas:
+            ids = [i for i in ids if i < limite]
+        elif not self.eliminadas:
+            return [reglas[i] for i in sorted(ids)]
+        return [reglas[i] for i in sorted(ids) if reglas[i] is not None]
+
+
+class MotorBitset:
+    """
+    Motor de coincidencias basado en bitsets sobre atributos discretos.
+    
+    Cada par (atributo, valor) guarda un entero cuyos bits son los ids de
+    las reglas que aceptan ese valor; las condiciones de lista activan su
+    bit en cada valor listado. Una consulta es un AND por atributo. Las
+    reglas con rangos o valores no hashables se verifican aparte.
+    """
+    
+    def __init__(self, reglas=()):
+        self.reglas = []
+        self.eliminadas = 0
+        self._todas = 0
+        self._con_condicion = {}
+        self._por_valor = {}
+        self._sin_indice = 0
+        self._ids_sin_indice = set()
+        
+        self.agregar_varias(reglas)
+    
+    def __len__(self):
+        return len(self.reglas) - self.eliminadas
+    
+    def _bits(self, ids):
+        """Construye un bitset a partir de una lista de ids"""
+        mapa = bytearray(ids[-1] // 8 + 1)
+        for id_regla in ids:
+            mapa[id_regla >> 3] |= 1 << (id_regla & 7)
+        return int.from_bytes(mapa, "little")
+    
+    def agregar(self, regla):
+        """Agrega una regla al final del motor y devuelve su id"""
+        self.agregar_varias([regla])
+        return len(self.reglas) - 1
+    
+    def quitar(self, id_regla):
+        """Quita la regla con ese id; su bit deja de estar entre las candidatas"""
+        if self.reglas[id_regla] is not None:
+            self.reglas[id_regla] = None
+            self._todas &= ~(1 << id_regla)
+            self.eliminadas += 1
+    
+    def agregar_varias(self, reglas):
+        """Agrega reglas al final del motor construyendo cada bitset una sola vez"""
+        primer_id = len(self.reglas)
+        ids_con_condicion = {}
+        ids_por_valor = {}
+        
+        for id_regla, regla in enumerate(reglas, primer_id):
+            self.reglas.append(regla)
+            
+            for clave, valor in regla.estado.items():
+                ids_con_condicion.setdefault(clave, []).append(id_regla)
+                
+                if isinstance(valor, tuple):
+                    self._ids_sin_indice.add(id_regla)
+                    continue
+                
+                ids_clave = ids_por_valor.setdefault(clave, {})
+                for v in (valor if isinstance(valor, list) else [valor]):
+                    try:
+                        ids_valor = ids_clave.setdefault(v, [])
+                    except TypeError:
+                        self._ids_sin_indice.add(id_regla)
+                        continue
+                    if not ids_valor or ids_valor[-1] != id_regla:
+                        ids_valor.append(id_regla)
+        
+        nuevas = len(self.reglas) - primer_id
+        if not nuevas:
+            return
+        
+        self._todas |= ((1 << nuevas) - 1) << primer_id
+        for clave, ids in ids_con_condicion.items():
+            self._con_condicion[clave] = self._con_condicion.get(clave, 0) | self._bits(ids)
+        for clave, ids_clave in ids_por_valor.items():
+            bits_clave = self._por_valor.setdefault(clave, {})
+            for v, ids in ids_clave.items():
+                bits_clave[v] = bits_clave.get(v, 0) | self._bits(ids)
+        
+        sin_indice = sorted(i for i in self._ids_sin_indice if i >= primer_id)
+        if sin_indice:
+            self._sin_indice |= self._bits(sin_indice)
+    
+    def _ids(self, bits):
+        """Ids de los bits activos, en orden ascendente"""
+        binario = bin(bits)[:1:-1]
+        ids = []
+        i = binario.find("1")
+        while i != -1:
+            ids.append(i)
+            i = binario.find("1", i + 1)
+        return ids
+    
+    def buscar(self, estado):
+        """Devuelve las reglas que coinciden con el estado, en orden de inserción"""
+        return self._buscar(estado, self.reglas, self._todas)
+    
+    def congelar(self):
+        """Vista de solo lectura del motor actual, que no ve los cambios posteriores"""
+        return VistaCongelada(self, list(self.reglas), self._todas)
+    
+    def _buscar(self, estado, reglas, todas):
+        """Búsqueda entre los bits de todas, tomando las reglas de la lista dada"""
+        candidatas = todas
+        
+        # Los bitsets pueden crecer mientras una vista congelada busca desde otro hilo
+        for clave, con_condicion in list(self._con_condicion.items()):
+            aceptan = todas & ~con_condicion
+            if clave in estado:
+                try:
+                    aceptan |= self._por_valor.get(clave, {}).get(estado[clave], 0)
+                except TypeError:
+                    pass
+            
+            candidatas &= aceptan | self._sin_indice
+            if not candidatas:
+                return []
+        
+        coincidentes = []
+        for id_regla in self._ids(candidatas):
+            regla = reglas[id_regla]
+            if id_regla in self._ids_sin_indice and not regla.coincide_con_estado(estado):
+                continue
+            coincidentes.append(regla)
+        
+        return coincidentes
+
+
+class VistaCongelada:
+    """
+    Motor de coincidencias de solo lectura tal como estaba al congelarlo.
+    
+    Comparte las tablas con el motor, que solo crecen, y guarda su propia
+    lista de reglas y el límite de ids que existían: las reglas agregadas
+    o quitadas después no cambian sus resultados.
+    """
+    
+    def __init__(self, motor, reglas, limite):
+        self.reglas = reglas
+        self._motor = motor
+        self._limite = limite
+    
+    def __len__(self):
+        return sum(1 for r in self.reglas if r is not None)
+    
+    def buscar(self, estado):
+        """Devuelve las reglas que coincidían con el estado al congelar el motor"""
+        return self._motor._buscar(estado, self.reglas, self._limite)
+
+
+
+class CacheDecisiones:
+    """
+    Memoriza por estado el análisis de obtener_mejor_accion.
+    
+    Cada entrada pertenece a una versión de la base de conocimiento; al
+    consultar con otra versión la caché se vacía.
+    """
+    
+    def __init__(self):
+        self.version = None
+        self._entradas = {}
+        self.aciertos = 0
+        self.fallos = 0
+    
+    def __len__(self):
+        return len(self._entradas)
+    
+    def obtener(self, clave, version):
+        """Devuelve la entrada guardada para la clave o None"""
+        if version != self.version:
+            self._entradas = {}
+            self.version = version
+        
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            self.fallos += 1
+        else:
+            self.aciertos += 1
+        return entrada
+    
+    def guardar(self, clave, entrada):
+        """Guarda una entrada para la versión actual"""
+        self._entradas[clave] = entrada
+    
+    def estadisticas(self):
+        """Resumen de uso de la caché"""
+        consultas = self.aciertos + self.fallos
+        return {
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "entradas": len(self._entradas),
+            "tasa_aciertos": self.aciertos / consultas if consultas else 0.0
+        }
+
+
+def confianza_regla(regla):
+    """Peso de la evidencia a favor del resultado de una regla: su confianza en explicaciones y listados"""
+    tasa = regla.tasa_exito if regla.resultado == "éxito" else 1.0 - regla.tasa_exito
+    return tasa * regla.contador
+
+
+def _valores_posicion(estado):
+    """Posiciones que acepta un estado: el valor, o cada elemento si es una lista"""
+    posicion = estado.get("posicion")
+    valores = posicion if isinstance(posicion, list) else [posicion]
+    for valor in valores:
+        try:
+            hash(valor)
+        except TypeError:
+            continue
+        yield valor
+
+
+class ExplicacionEstado:
+    """Reglas de éxito, de fracaso y de la misma posición para un estado, de mayor a menor confianza"""
+    
+    __slots__ = ("estado", "exito", "fracaso", "misma_posicion", "ordenada")
+    
+    def __init__(self, estado, coincidentes, misma_posicion):
+        self.estado = dict(estado)
+        self.exito = [r for r in coincidentes if r.resultado == "éxito"]
+        self.fracaso = [r for r in coincidentes if r.resultado != "éxito"]
+        self.misma_posicion = list(misma_posicion)
+        self.ordenada = False
+    
+    def ordenar(self):
+        if not self.ordenada:
+            for reglas in (self.exito, self.fracaso, self.misma_posicion):
+                reglas.sort(key=confianza_regla, reverse=True)
+            self.ordenada = True
+
+
+class IndiceExplicaciones:
+    """
+    Responde con una sola búsqueda qué reglas explican un estado: las que
+    coinciden, separadas en éxito y fracaso, y las de la misma posición.
+    
+    Las reglas se agrupan por posición y cada explicación calculada se
+    guarda por estado. Las experiencias nuevas se agregan a las
+    explicaciones guardadas que las afectan en lugar de descartarlas; el
+    orden se recalcula al consultar solo las explicaciones que cambiaron.
+    Cualquier otro cambio en la base (versión distinta) reconstruye el índice.
+    """
+    
+    def __init__(self, reglas, version):
+        self.version = version
+        self._explicaciones = {}
+        self._por_posicion = {}
+        for regla in reglas:
+            self._agregar_posicion(regla)
+    
+    def _agregar_posicion(self, regla):
+        if "posicion" in regla.estado:
+            for valor in _valores_posicion(regla.estado):
+                self._por_posicion.setdefault(valor, []).append(regla)
+    
+    def explicar(self, estado, buscar):
+        """
+        Explicación del estado, calculándola con buscar(estado) si no está guardada
+        Returns: (reglas_exito, reglas_fracaso, reglas_misma_posicion)
+        """
+        try:
+            clave = clave_canonica(estado)
+            explicacion = self._explicaciones.get(clave)
+        except TypeError:
+            clave = None
+            explicacion = None
+        
+        if explicacion is None:
+            misma_posicion = []
+            for valor in _valores_posicion(estado):
+                misma_posicion.extend(self._por_posicion.get(valor, ()))
+            explicacion = ExplicacionEstado(estado, buscar(estado), misma_posicion)
+            if clave is not None:
+                self._explicaciones[clave] = explicacion
+        
+        explicacion.ordenar()
+        return list(explicacion.exito), list(explicacion.fracaso), list(explicacion.misma_posicion)
+    
+    def registrar(self, regla, nueva, resultado_anterior=None):
+        """
+        Registra una experiencia aplicada a regla: nueva si se insertó, o una
+        actualización que pudo cambiar su resultado desde resultado_anterior
+        """
+        posiciones = set(_valores_posicion(regla.estado)) if "posicion" in regla.estado else set()
+        if nueva:
+            self._agregar_posicion(regla)
+        
+        for explicacion in self._explicaciones.values():
+            misma_posicion = any(v in posiciones for v in _valores_posicion(explicacion.estado))
+            if regla.coincide_con_estado(explicacion.estado):
+                exito, fracaso = explicacion.exito, explicacion.fracaso
+                if nueva:
+                    (exito if regla.resultado == "éxito" else fracaso).append(regla)
+                elif regla.resultado != resultado_anterior:
+                    origen, destino = (fracaso, exito) if regla.resultado == "éxito" else (exito, fracaso)
+                    origen.remove(regla)
+                    destino.append(regla)
+            elif not misma_posicion:
+                continue
+            
+            if nueva and misma_posicion:
+                explicacion.misma_posicion.append(regla)
+            # El contador o la tasa cambiaron: se reordena al consultar
+            explicacion.ordenada = False
+    
+    def quitar(self, regla):
+        """Quita una regla que salió de la base"""
+        for valor in _valores_posicion(regla.estado) if "posicion" in regla.estado else ():
+            grupo = self._por_posicion.get(valor, [])
+            if regla in grupo:
+                grupo.remove(regla)
+        for explicacion in self._explicaciones.values():
+            for reglas in (explicacion.exito, explicacion.fracaso, explicacion.misma_posicion):
+                if regla in reglas:
+                    reglas.remove(regla)
+
+
+
+class IndiceGeneralizacion:
+    """
+    Agrupa reglas por firma (acción, resultado, atributo, resto del estado).
+    
+    Dos reglas pueden unirse solo si comparten una firma y difieren en el
+    valor del atributo de esa firma, así que basta buscar dentro de los
+    grupos de cada regla en lugar de compararla con todas las demás. Las
+    reglas ya unidas se descartan y las reglas combinadas pueden agregarse
+    para seguir generalizando sobre ellas.
+    """
+    
+    def __init__(self, reglas):
+        self.reglas = list(reglas)
+        self.unidas = set()
+        self.orden = list(range(len(self.reglas)))
+        self._grupos = {}
+        self._firmas = []
+        
+        claves = set()
+        for regla in self.reglas:
+            claves.update(regla.estado)
+        self._claves = sorted(claves)
+        
+        for i, regla in enumerate(self.reglas):
+            self._registrar(i, regla)
+    
+    def _registrar(self, i, regla):
+        firmas = self._firmas_de(regla)
+        self._firmas.append(firmas)
+        for firma, valor in firmas:
+            self._grupos.setdefault(firma, {}).setdefault(valor, deque()).append(i)
+    
+    def _firmas_de(self, regla):
+        """Firmas de una regla junto con su valor en el atributo libre"""
+        # Un atributo ausente equivale a None, igual que en puede_unirse_con
+        valores = {clave: clave_canonica(valor) for clave, valor in regla.estado.items()
+                   if valor is not None}
+        
+        firmas = []
+        for clave in self._claves:
+            valor = valores.pop(clave, None)
+            firmas.append(((regla.accion, regla.resultado, clave, frozenset(valores.items())), valor))
+            if valor is not None:
+                valores[clave] = valor
+        return firmas
+    
+    def primera_pareja(self, i):
+        """Índice de la primera regla no unida que puede unirse con la regla i, o None"""
+        mejor = None
+        
+        for firma, valor in self._firmas[i]:
+            for valor_grupo, indices in self._grupos[firma].items():
+                if valor_grupo == valor:
+                    continue
+                
+                while indices and indices[0] in self.unidas:
+                    indices.popleft()
+                
+                if indices and (mejor is None or indices[0] < mejor):
+                    mejor = indices[0]
+        
+        return mejor
+    
+    def unir(self, i, j):
+        """Descarta las reglas i y j y devuelve su combinación (o None)"""
+        regla_combinada = self.reglas[i].unir_con(self.reglas[j])
+        if regla_combinada:
+            self.unidas.add(i)
+            self.unidas.add(j)
+        return regla_combinada
+    
+    def agregar(self, regla, orden):
+        """Agrega una regla combinada; orden es la posición que ocupará en la lista final"""
+        i = len(self.reglas)
+        self.reglas.append(regla)
+        self.orden.append(orden)
+        self._registrar(i, regla)
+        return i
+    
+    def vigentes(self):
+        """Reglas no unidas, en el orden de la lista original"""
+        indices = [i for i in range(len(self.reglas)) if i not in self.unidas]
+        indices.sort(key=lambda i: self.orden[i])
+        return [self.reglas[i] for i in indices]
+
+
+MOTORES_COINCIDENCIAS = {
+    "indice": IndiceCoincidencias,
+    "bitset": MotorBitset
+}
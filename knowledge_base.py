@@ -2,27 +2,207 @@
 Base de conocimiento y sistema de generalización
 """
 
+import bisect
+import contextlib
 import json
 import os
-import copy
+import sys
+import threading
+import weakref
 from collections import defaultdict
-from datetime import datetime
+from datetime import datetime, timedelta
 from utils import *
 from config import *
+from indices_conocimiento import MOTORES_COINCIDENCIAS, CacheDecisiones, IndiceExplicaciones, IndiceGeneralizacion
+from persistencia import DiarioConocimiento, GuardadoSegundoPlano, escribir_atomico, normalizar_conocimiento
+from formato_binario import LectorBinario, es_archivo_binario, guardar_binario
+from paginacion import PaginadorReglas, escribir_por_bloques, exportar_reglas_texto, filtrar_reglas
+
+# Las fechas de actualización se guardan como microsegundos desde EPOCA (hora local)
+EPOCA = datetime(1970, 1, 1)
+UN_MICROSEGUNDO = timedelta(microseconds=1)
+
+
+class EstadoCompartido(dict):
+    """Diccionario de condiciones compartido entre reglas con el mismo estado"""
+    __slots__ = ("__weakref__",)
+
+
+_estados_compartidos = weakref.WeakValueDictionary()
+
+def compartir_estado(estado):
+    """
+    Devuelve un diccionario compartido igual a estado.
+    Las reglas con condiciones idénticas usan el mismo objeto, por lo que
+    no debe modificarse en su lugar: para cambiarlo se asigna uno nuevo.
+    """
+    if isinstance(estado, EstadoCompartido):
+        return estado
+    
+    try:
+        clave = clave_canonica(estado)
+        compartido = _estados_compartidos.get(clave)
+    except TypeError:
+        return estado
+    
+    if compartido is None:
+        compartido = EstadoCompartido(
+            (internar(c), internar(v)) for c, v in estado.items()
+        )
+        _estados_compartidos[clave] = compartido
+    return compartido
+
+def internar(valor):
+    """Interna cadenas para que las reglas compartan una sola copia"""
+    return sys.intern(valor) if isinstance(valor, str) else valor
+
+def marca_de_tiempo(fecha=None):
+    """Microsegundos desde EPOCA para una fecha local (por defecto, ahora)"""
+    return ((fecha or datetime.now()) - EPOCA) // UN_MICROSEGUNDO
+
+
+class HistorialResultados:
+    """
+    Últimos resultados de una regla en un búfer circular de tamaño fijo:
+    un byte por resultado (1 éxito, 0 fracaso) y el más antiguo se descarta
+    al llenarse. Se guarda como texto de unos y ceros, del más antiguo al
+    más reciente.
+    """
+    
+    __slots__ = ("_datos", "_inicio", "_cantidad")
+    
+    def __init__(self, capacidad=None):
+        self._datos = bytearray(HISTORIAL_RESULTADOS if capacidad is None else capacidad)
+        self._inicio = 0
+        self._cantidad = 0
+    
+    @property
+    def capacidad(self):
+        return len(self._datos)
+    
+    def __len__(self):
+        return self._cantidad
+    
+    def __iter__(self):
+        """Resultados (True si fue éxito) del más antiguo al más reciente"""
+        capacidad = len(self._datos)
+        for i in range(self._cantidad):
+            yield self._datos[(self._inicio + i) % capacidad] == 1
+    
+    def agregar(self, exito):
+        capacidad = len(self._datos)
+        if not capacidad:
+            return
+        
+        if self._cantidad < capacidad:
+            self._datos[(self._inicio + self._cantidad) % capacidad] = exito
+            self._cantidad += 1
+        else:
+            self._datos[self._inicio] = exito
+            self._inicio = (self._inicio + 1) % capacidad
+    
+    def tasa_exito(self, ventana=None):
+        """Tasa de éxito de los últimos ventana resultados (todos por defecto), o None sin resultados"""
+        cantidad = self._cantidad if ventana is None else min(ventana, self._cantidad)
+        if cantidad <= 0:
+            return None
+        
+        capacidad = len(self._datos)
+        fin = self._inicio + self._cantidad
+        exitos = sum(self._datos[i % capacidad] for i in range(fin - cantidad, fin))
+        return exitos / cantidad
+    
+    def codificar(self):
+        return "".join("1" if exito else "0" for exito in self)
+    
+    def copiar(self):
+        historial = HistorialResultados.__new__(HistorialResultados)
+        historial._datos = bytearray(self._datos)
+        historial._inicio = self._inicio
+        historial._cantidad = self._cantidad
+        return historial
+    
+    @classmethod
+    def desde_resultados(cls, resultados, capacidad=None):
+        """Historial con los resultados dados (del más antiguo al más reciente), o None si la capacidad es 0"""
+        historial = cls(capacidad)
+        if not historial.capacidad:
+            return None
+        for exito in resultados:
+            historial.agregar(exito)
+        return historial
+    
+    @classmethod
+    def decodificar(cls, valor):
+        """
+        Historial a partir de lo guardado: texto de codificar(), lista de
+        entradas {"resultado": ...} del conocimiento semilla o None
+        """
+        if valor is None or isinstance(valor, HistorialResultados):
+            return valor
+        if isinstance(valor, str):
+            return cls.desde_resultados(c == "1" for c in valor)
+        return cls.desde_resultados(entrada.get("resultado") == "éxito" for entrada in valor)
+    
+    @classmethod
+    def combinar(cls, primero, segundo):
+        """Resultados de primero seguidos de los de segundo (None si ninguno tiene historial)"""
+        if primero is None and segundo is None:
+            return None
+        return cls.desde_resultados([*(primero or ()), *(segundo or ())])
+
 
 class ReglaConocimiento:
     """Clase que representa una regla de conocimiento"""
     
+    __slots__ = ("estado", "accion", "resultado", "contador", "tasa_exito", "_actualizacion", "historial")
+    
     def __init__(self, estado, accion, resultado, contador=1):
-        self.estado = estado
-        self.accion = accion
-        self.resultado = resultado
+        self.estado = compartir_estado(estado)
+        self.accion = internar(accion)
+        self.resultado = internar(resultado)
         self.contador = contador
         self.tasa_exito = 1.0 if resultado == "éxito" else 0.0
-        self.ultima_actualizacion = datetime.now().isoformat()
+        self._actualizacion = marca_de_tiempo()
+        self.historial = None
+    
+    @property
+    def ultima_actualizacion(self):
+        """Fecha de la última actualización en formato ISO"""
+        if isinstance(self._actualizacion, int):
+            return (EPOCA + self._actualizacion * UN_MICROSEGUNDO).isoformat()
+        return self._actualizacion
+    
+    @ultima_actualizacion.setter
+    def ultima_actualizacion(self, valor):
+        if isinstance(valor, str):
+            try:
+                fecha = datetime.fromisoformat(valor)
+            except ValueError:
+                fecha = None
+            
+            # Las fechas con zona horaria o ilegibles se conservan como texto
+            if fecha is None or fecha.tzinfo is not None:
+                self._actualizacion = valor
+                return
+            valor = fecha
+        
+        if isinstance(valor, datetime):
+            valor = marca_de_tiempo(valor)
+        self._actualizacion = valor
     
     def actualizar(self, nuevo_resultado):
         """Actualiza la regla con un nuevo resultado"""
+        # El historial se crea con la segunda observación, para no ocupar
+        # memoria en las reglas vistas una sola vez; el resultado de esa única
+        # observación es la tasa. Las reglas anteriores al historial empiezan vacías
+        if self.historial is None and HISTORIAL_RESULTADOS:
+            self.historial = HistorialResultados.desde_resultados(
+                [self.tasa_exito == 1.0] if self.contador == 1 else []
+            )
+        if self.historial is not None:
+            self.historial.agregar(nuevo_resultado == "éxito")
+        
         self.contador += 1
         
         if nuevo_resultado == "éxito":
@@ -30,13 +210,16 @@ class ReglaConocimiento:
         else:
             self.tasa_exito = (self.tasa_exito * (self.contador - 1)) / self.contador
         
+        self.derivar_resultado()
+        self._actualizacion = marca_de_tiempo()
+    
+    def derivar_resultado(self):
+        """Cambia el resultado cuando la tasa de éxito lo contradice con suficientes observaciones"""
         if self.contador >= 3:
             if self.tasa_exito > 0.7 and self.resultado == "fracaso":
                 self.resultado = "éxito"
             elif self.tasa_exito < 0.3 and self.resultado == "éxito":
                 self.resultado = "fracaso"
-        
-        self.ultima_actualizacion = datetime.now().isoformat()
     
     def coincide_con_estado(self, estado):
         """Verifica si la regla coincide con un estado dado"""
@@ -80,14 +263,17 @@ class ReglaConocimiento:
         if not self.puede_unirse_con(otra_regla):
             return None
         
-        nueva_regla = copy.deepcopy(self)
+        nueva_regla = self.copiar()
+        estado = dict(self.estado)
         
         for clave in set(self.estado.keys()) | set(otra_regla.estado.keys()):
             valor1 = self.estado.get(clave)
             valor2 = otra_regla.estado.get(clave)
             
             if valor1 != valor2:
-                if isinstance(valor1, list):
+                if isinstance(valor1, list) and isinstance(valor2, list):
+                    nuevos_valores = valor1 + [v for v in valor2 if v not in valor1]
+                elif isinstance(valor1, list):
                     nuevos_valores = valor1.copy()
                     if valor2 not in nuevos_valores:
                         nuevos_valores.append(valor2)
@@ -98,17 +284,46 @@ class ReglaConocimiento:
                 else:
                     nuevos_valores = [valor1, valor2]
                 
-                nueva_regla.estado[clave] = nuevos_valores
+                estado[clave] = nuevos_valores
         
+        nueva_regla.estado = compartir_estado(estado)
         nueva_regla.contador = self.contador + otra_regla.contador
         nueva_regla.tasa_exito = (self.tasa_exito * self.contador + 
                                  otra_regla.tasa_exito * otra_regla.contador) / nueva_regla.contador
+        nueva_regla.historial = HistorialResultados.combinar(self.historial, otra_regla.historial)
         
         return nueva_regla
     
+    def acumular(self, otra_regla):
+        """Regla con las observaciones de esta y de otra con el mismo estado, acción y resultado"""
+        contador = self.contador + otra_regla.contador
+        tasa_exito = self.tasa_exito
+        if contador:
+            tasa_exito = (self.tasa_exito * self.contador + otra_regla.tasa_exito * otra_regla.contador) / contador
+        
+        if isinstance(self._actualizacion, int) and isinstance(otra_regla._actualizacion, int):
+            actualizacion = max(self._actualizacion, otra_regla._actualizacion)
+        else:
+            actualizacion = max(self, otra_regla, key=lambda r: r.ultima_actualizacion)._actualizacion
+        
+        return ReglaConocimiento.desde_campos(self.estado, self.accion, self.resultado,
+                                              contador, tasa_exito, actualizacion,
+                                              HistorialResultados.combinar(self.historial, otra_regla.historial))
+    
+    def tasa_reciente(self, ventana=None):
+        """Tasa de éxito de los últimos ventana resultados; sin historial, la tasa total"""
+        tasa = self.historial.tasa_exito(ventana) if self.historial is not None else None
+        return self.tasa_exito if tasa is None else tasa
+    
+    def copiar(self):
+        """Copia independiente de la regla (el estado compartido no se duplica)"""
+        return ReglaConocimiento.desde_campos(self.estado, self.accion, self.resultado, self.contador,
+                                              self.tasa_exito, self._actualizacion,
+                                              None if self.historial is None else self.historial.copiar())
+    
     def to_dict(self):
         """Convierte la regla a diccionario para serialización"""
-        return {
+        data = {
             "estado": self.estado,
             "accion": self.accion,
             "resultado": self.resultado,
@@ -116,12 +331,31 @@ class ReglaConocimiento:
             "tasa_exito": self.tasa_exito,
             "ultima_actualizacion": self.ultima_actualizacion
         }
+        if self.historial is not None:
+            data["historial"] = self.historial.codificar()
+        return data
+    
+    @classmethod
+    def desde_campos(cls, estado, accion, resultado, contador, tasa_exito, actualizacion, historial=None):
+        """
+        Crea una regla a partir de sus campos ya decodificados. historial puede
+        ser un HistorialResultados o lo guardado por to_dict
+        """
+        regla = cls.__new__(cls)
+        regla.estado = compartir_estado(estado)
+        regla.accion = internar(accion)
+        regla.resultado = internar(resultado)
+        regla.contador = contador
+        regla.tasa_exito = tasa_exito
+        regla._actualizacion = actualizacion
+        regla.historial = HistorialResultados.decodificar(historial)
+        return regla
     
     @classmethod
     def from_dict(cls, data):
         """Crea una regla desde diccionario"""
-        regla = cls(data["estado"], data["accion"], data["resultado"], data["contador"])
-        regla.tasa_exito = data["tasa_exito"]
+        regla = cls.desde_campos(data["estado"], data["accion"], data["resultado"], data["contador"],
+                                 data["tasa_exito"], 0, data.get("historial"))
         regla.ultima_actualizacion = data["ultima_actualizacion"]
         return regla
     
@@ -138,12 +372,37 @@ class ReglaConocimiento:
         return f"SI {' AND '.join(condiciones)} ENTONCES {self.accion} → {self.resultado} ({self.tasa_exito:.2%}, n={self.contador})"
 
 
+def _claves_delta(reglas):
+    """Clave de cada regla para emparejarla entre checkpoints: estado, acción y número de aparición"""
+    clave_estado = claves_de_estados()
+    apariciones = defaultdict(int)
+    for regla in reglas:
+        clave = (clave_estado(regla.estado), regla.accion)
+        yield clave + (apariciones[clave],)
+        apariciones[clave] += 1
+
+
+def _resumen_delta(reglas):
+    """Resumen de un checkpoint para comprobar que un delta se aplica sobre el correcto"""
+    return {"total_reglas": len(reglas), "contadores": sum(r.contador for r in reglas)}
+
+
 class BaseConocimiento:
     """Clase principal de base de conocimiento"""
     
-    def __init__(self, archivo_conocimiento=None):
+    # Las experiencias se agregan a las explicaciones guardadas; los almacenes
+    # que devuelven reglas nuevas en cada búsqueda reconstruyen el índice
+    _explicaciones_incrementales = True
+    
+    def __init__(self, archivo_conocimiento=None, motor_coincidencias=None, usar_diario=None):
         self.archivo_conocimiento = archivo_conocimiento or ARCHIVO_CONOCIMIENTO
-        self.reglas = []
+        
+        motor_coincidencias = motor_coincidencias or MOTOR_COINCIDENCIAS
+        if motor_coincidencias not in MOTORES_COINCIDENCIAS:
+            raise ValueError(f"Motor de coincidencias desconocido: {motor_coincidencias}")
+        self.motor_coincidencias = motor_coincidencias
+        
+        self._asignar_reglas([])
         self.estadisticas = {
             "total_reglas": 0,
             "reglas_exito": 0,
@@ -152,51 +411,521 @@ class BaseConocimiento:
             "aciertos": 0
         }
         
+        # Índice exacto: (clave del estado, acción, resultado) -> reglas en orden de la lista
+        self._indice_exacto = {}
+        self._indice_coincidencias = MOTORES_COINCIDENCIAS[self.motor_coincidencias]()
+        
+        # La versión aumenta con cada cambio en las reglas e invalida la caché de decisiones
+        self._version = 0
+        self.cache_decisiones = CacheDecisiones()
+        self._explicaciones = None
+        
+        # Con diario, guardar solo agrega las experiencias nuevas a un archivo
+        # aparte; la instantánea completa se reescribe al compactar
+        if usar_diario is None:
+            usar_diario = USAR_DIARIO_CONOCIMIENTO
+        self.diario = DiarioConocimiento(self.archivo_conocimiento + ".diario") if usar_diario else None
+        self._generacion = 0
+        self._experiencias_pendientes = []
+        self._compactar_diario = False
+        self._guardado = GuardadoSegundoPlano()
+        
+        # Instantáneas vivas: antes de modificar una regla se les deja una copia
+        self._instantaneas = weakref.WeakSet()
+        self._cerrojo = threading.RLock()
+        
         self.cargar_conocimiento()
     
+    @property
+    def reglas(self):
+        return self._reglas
+    
+    @reglas.setter
+    def reglas(self, reglas):
+        # Reemplazar las reglas desde afuera rehace los índices y los conteos;
+        # las operaciones de la base usan _asignar_reglas y cuentan por su cuenta
+        self._asignar_reglas(reglas)
+        self._reconstruir_indices()
+        self._contar_reglas()
+    
+    def _asignar_reglas(self, reglas):
+        """Reemplaza las reglas sin rehacer los índices ni los conteos"""
+        self._reglas = reglas
+    
+    def _clave_exacta(self, estado, accion, resultado):
+        """Clave hashable para la búsqueda exacta de una regla"""
+        return (clave_canonica(estado), accion, resultado)
+    
+    def _reconstruir_indices(self):
+        """Reconstruye los índices a partir de la lista de reglas"""
+        self._indice_exacto = {}
+        self._orden_reglas = {}
+        clave_estado = claves_de_estados()
+        for orden, regla in enumerate(self.reglas):
+            clave = (clave_estado(regla.estado), regla.accion, regla.resultado)
+            self._indice_exacto.setdefault(clave, []).append(regla)
+            self._orden_reglas[id(regla)] = orden
+        self._siguiente_orden = len(self._orden_reglas)
+        
+        self._indice_coincidencias = MOTORES_COINCIDENCIAS[self.motor_coincidencias](self.reglas)
+        self._version += 1
+    
+    def _indexar_regla(self, regla):
+        """Agrega una regla (al final de la lista) a los índices"""
+        clave = self._clave_exacta(regla.estado, regla.accion, regla.resultado)
+        self._indice_exacto.setdefault(clave, []).append(regla)
+        self._registrar_orden(regla)
+        self._indice_coincidencias.agregar(regla)
+        self._version += 1
+    
+    def _registrar_orden(self, regla):
+        """Anota la posición de una regla nueva; los grupos del índice exacto se ordenan por ella"""
+        self._orden_reglas[id(regla)] = self._siguiente_orden
+        self._siguiente_orden += 1
+    
+    def _buscar_regla_exacta(self, estado, accion, resultado):
+        """Primera regla con exactamente ese estado, acción y resultado, o None"""
+        grupo = self._indice_exacto.get(self._clave_exacta(estado, accion, resultado))
+        return grupo[0] if grupo else None
+    
+    def _insertar_regla(self, regla):
+        """Agrega una regla nueva al final de la base y devuelve la regla guardada"""
+        self.reglas.append(regla)
+        self._indexar_regla(regla)
+        return regla
+    
+    def _contiene_regla(self, regla):
+        """Si una regla recién insertada sigue en la base"""
+        return True
+    
+    def _reindexar_resultado(self, regla, resultado_anterior):
+        """Mueve una regla cuyo resultado cambió a su nueva entrada del índice"""
+        clave_estado = clave_canonica(regla.estado)
+        
+        clave_anterior = (clave_estado, regla.accion, resultado_anterior)
+        grupo = self._indice_exacto.get(clave_anterior, [])
+        if regla in grupo:
+            grupo.remove(regla)
+        if not grupo:
+            self._indice_exacto.pop(clave_anterior, None)
+        
+        grupo_nuevo = self._indice_exacto.setdefault((clave_estado, regla.accion, regla.resultado), [])
+        # Conserva el orden de la lista para que la primera coincidencia no cambie
+        posiciones = [self._orden_reglas[id(r)] for r in grupo_nuevo]
+        grupo_nuevo.insert(bisect.bisect(posiciones, self._orden_reglas[id(regla)]), regla)
+    
+    def _actualizar_regla(self, regla, resultado):
+        """Actualiza una regla de la base manteniendo los índices"""
+        resultado_anterior = regla.resultado
+        if self._instantaneas:
+            # El cerrojo impide que una instantánea lea la regla a medio modificar
+            with self._cerrojo:
+                for instantanea in self._instantaneas:
+                    instantanea._conservar(regla)
+                regla.actualizar(resultado)
+        else:
+            regla.actualizar(resultado)
+        self._version += 1
+        
+        if regla.resultado != resultado_anterior:
+            self._reindexar_resultado(regla, resultado_anterior)
+    
+    def transaccion(self):
+        """
+        Agrupa varias modificaciones. En memoria no hace nada; los almacenes
+        persistentes confirman juntas las modificaciones del bloque.
+        """
+        return contextlib.nullcontext()
+    
+    def _contar_regla(self, resultado, cambio):
+        """Suma cambio (1 o -1) al total de reglas y al conteo de su resultado"""
+        self.estadisticas["reglas_exito" if resultado == "éxito" else "reglas_fracaso"] += cambio
+        self.estadisticas["total_reglas"] += cambio
+    
+    def _contar_cambio_resultado(self, resultado_anterior, resultado):
+        """Mueve una regla que cambió de resultado al conteo del nuevo"""
+        if resultado != resultado_anterior:
+            self._contar_regla(resultado_anterior, -1)
+            self._contar_regla(resultado, 1)
+    
+    def _recuento_reglas(self):
+        """Conteos recorriendo todas las reglas: (total, éxito, fracaso)"""
+        total = exito = 0
+        for regla in self.reglas:
+            total += 1
+            exito += regla.resultado == "éxito"
+        return total, exito, total - exito
+    
+    def _contar_reglas(self):
+        """Recalcula los conteos de reglas de las estadísticas con un recuento completo"""
+        total, exito, fracaso = self._recuento_reglas()
+        self.estadisticas.update({"total_reglas": total, "reglas_exito": exito, "reglas_fracaso": fracaso})
+    
+    def contar_reglas(self, resultado=None):
+        """Cantidad de reglas, opcionalmente solo las de un resultado, sin recorrer la base"""
+        if resultado is None:
+            return self.estadisticas["total_reglas"]
+        return self.estadisticas["reglas_exito" if resultado == "éxito" else "reglas_fracaso"]
+    
+    def verificar_estadisticas(self):
+        """Compara los conteos de reglas de las estadísticas con un recuento completo"""
+        recuento = dict(zip(("total_reglas", "reglas_exito", "reglas_fracaso"), self._recuento_reglas()))
+        diferencias = {clave: (self.estadisticas.get(clave), valor) for clave, valor in recuento.items()
+                       if self.estadisticas.get(clave) != valor}
+        if diferencias:
+            raise RuntimeError(f"Estadísticas desincronizadas (guardado, recuento): {diferencias}")
+    
+    def _comprobar_estadisticas(self):
+        """Con VERIFICAR_ESTADISTICAS, verifica los conteos después de un cambio"""
+        if VERIFICAR_ESTADISTICAS:
+            self.verificar_estadisticas()
+    
     def cargar_conocimiento(self):
         """Carga el conocimiento desde archivo"""
+        self.esperar_guardado()
         if os.path.exists(self.archivo_conocimiento):
             try:
-                with open(self.archivo_conocimiento, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                if es_archivo_binario(self.archivo_conocimiento):
+                    data = self._leer_instantanea_binaria()
+                else:
+                    with open(self.archivo_conocimiento, 'r', encoding='utf-8') as f:
+                        data = normalizar_conocimiento(json.load(f))
+                    data["reglas"] = [ReglaConocimiento.from_dict(r) for r in data.get("reglas", [])]
                 
-                self.reglas = [ReglaConocimiento.from_dict(r) for r in data.get("reglas", [])]
+                self._asignar_reglas(data["reglas"])
                 self.estadisticas = data.get("estadisticas", self.estadisticas)
+                self._generacion = data.get("generacion", 0)
                 
                 print(f"Conocimiento cargado: {len(self.reglas)} reglas")
                 
             except Exception as e:
                 print(f"Error cargando conocimiento: {e}")
-                self.reglas = []
+                self._asignar_reglas([])
+            
+            self._reconstruir_indices()
+            if self.diario:
+                self._reproducir_diario()
         else:
             print("No se encontró archivo de conocimiento. Se iniciará con base vacía.")
+            self._reconstruir_indices()
+        
+        # La carga ya recorre todas las reglas: los conteos de archivos anteriores se corrigen aquí
+        self._contar_reglas()
+        self._experiencias_pendientes = []
+        self._compactar_diario = bool(self.diario and self.diario.interrumpido)
     
-    def guardar_conocimiento(self):
-        """Guarda el conocimiento en archivo"""
-        data = {
-            "reglas": [r.to_dict() for r in self.reglas],
-            "estadisticas": self.estadisticas,
-            "fecha_guardado": datetime.now().isoformat(),
-            "total_reglas": len(self.reglas)
+    def _leer_instantanea_binaria(self):
+        """Lee una instantánea binaria con el mismo esquema que el archivo JSON"""
+        with open(self.archivo_conocimiento, 'rb') as f:
+            lector = LectorBinario(f.read(), preparar_estado=compartir_estado)
+        
+        reglas = [ReglaConocimiento.desde_campos(*campos) for campos in lector]
+        
+        data = dict(lector.metadatos)
+        data["reglas"] = reglas
+        data["estadisticas"] = lector.estadisticas
+        return data
+    
+    def _reproducir_diario(self):
+        """Aplica sobre las reglas cargadas las experiencias guardadas en el diario"""
+        registros = self.diario.leer(self._generacion)
+        
+        for registro in registros:
+            if "estadisticas" in registro:
+                self.estadisticas = registro["estadisticas"]
+                continue
+            
+            regla = self._aplicar_experiencia(registro["estado"], registro["accion"], registro["resultado"])
+            regla._actualizacion = registro["actualizacion"]
+        
+        if registros:
+            print(f"Diario aplicado: {self.diario.registros} registros")
+    
+    def importar_conocimiento(self, archivo):
+        """Agrega las reglas de otro archivo de conocimiento JSON (de cualquier esquema)"""
+        with open(archivo, 'r', encoding='utf-8') as f:
+            data = normalizar_conocimiento(json.load(f))
+        reglas = [ReglaConocimiento.from_dict(r) for r in data.get("reglas", [])]
+        
+        nuevas = self.importar_reglas(reglas)
+        print(f"Importadas {len(reglas)} reglas de {archivo}: {nuevas} nuevas, "
+              f"{len(reglas) - nuevas} sumadas a reglas existentes")
+        return nuevas
+    
+    def importar_reglas(self, reglas, derivar_resultado=False):
+        """
+        Agrega reglas en bloque y devuelve cuántas son nuevas. Una regla con el
+        mismo estado, acción y resultado que otra ya presente se acumula en ella;
+        los índices se reconstruyen una sola vez al final
+        derivar_resultado: al terminar, ajustar el resultado de las reglas
+        acumuladas a su tasa de éxito combinada, como en actualizar
+        """
+        resultado = list(self.reglas)
+        posiciones = {}
+        clave_estado = claves_de_estados()
+        
+        def clave_exacta(regla):
+            return (clave_estado(regla.estado), regla.accion, regla.resultado)
+        
+        for posicion, regla in enumerate(resultado):
+            posiciones.setdefault(clave_exacta(regla), posicion)
+        
+        nuevas = 0
+        acumuladas = set()
+        for regla in reglas:
+            clave = clave_exacta(regla)
+            posicion = posiciones.get(clave)
+            if posicion is None:
+                posiciones[clave] = len(resultado)
+                resultado.append(regla)
+                self._contar_regla(regla.resultado, 1)
+                nuevas += 1
+            else:
+                resultado[posicion] = resultado[posicion].acumular(regla)
+                acumuladas.add(posicion)
+        
+        # Con las claves fijas durante la acumulación, el orden de las fuentes no cambia el resultado
+        if derivar_resultado:
+            for posicion in acumuladas:
+                resultado_anterior = resultado[posicion].resultado
+                resultado[posicion].derivar_resultado()
+                self._contar_cambio_resultado(resultado_anterior, resultado[posicion].resultado)
+        
+        self._asignar_reglas(resultado)
+        self._reconstruir_indices()
+        self._compactar_diario = True
+        self._comprobar_estadisticas()
+        return nuevas
+    
+    def combinar_bases(self, bases):
+        """
+        Combina en esta base las reglas de otras bases de conocimiento (por
+        ejemplo, entrenadas en procesos o máquinas distintas) y devuelve cuántas
+        reglas son nuevas. Las reglas con el mismo estado, acción y resultado
+        suman sus contadores, su tasa de éxito se pondera por contador y su
+        resultado se vuelve a derivar. Las consultas y aciertos se suman y los
+        conteos de reglas se actualizan con cada regla nueva o que cambia de
+        resultado. bases puede ser un generador, para cargar las bases de a una
+        """
+        estadisticas = self.estadisticas
+        
+        def reglas_de(bases):
+            for base in bases:
+                for clave in ("consultas_totales", "aciertos"):
+                    estadisticas[clave] = estadisticas.get(clave, 0) + base.estadisticas.get(clave, 0)
+                # Copias: las reglas de la base combinada no se comparten con las originales
+                for regla in base.reglas:
+                    yield regla.copiar()
+        
+        return self.importar_reglas(reglas_de(bases), derivar_resultado=True)
+    
+    def calcular_delta(self, anterior):
+        """
+        Calcula los cambios que llevan de las reglas de anterior (otra base o un
+        checkpoint cargado) a las de esta base. Las reglas se emparejan por
+        estado, acción y número de aparición, así que una regla que cambió de
+        resultado cuenta como actualizada. Las reglas quitadas y actualizadas se
+        indican por su posición en anterior y las agregadas por su posición en
+        esta base; el orden completo solo se incluye si las reglas conservadas
+        cambiaron de orden entre sí
+        """
+        reglas_anteriores = list(anterior.reglas)
+        reglas = list(self.reglas)
+        
+        posiciones = dict(zip(_claves_delta(reglas_anteriores), range(len(reglas_anteriores))))
+        agregadas = []
+        actualizadas = []
+        conservadas = []
+        for posicion, (clave, regla) in enumerate(zip(_claves_delta(reglas), reglas)):
+            previa = posiciones.pop(clave, None)
+            if previa is None:
+                agregadas.append([posicion, regla.to_dict()])
+                continue
+            
+            conservadas.append(previa)
+            datos_previos = reglas_anteriores[previa].to_dict()
+            cambios = {campo: valor for campo, valor in regla.to_dict().items()
+                       if campo != "estado" and datos_previos.get(campo) != valor}
+            if "historial" in datos_previos and "historial" not in cambios and regla.historial is None:
+                cambios["historial"] = None
+            if cambios:
+                actualizadas.append([previa, cambios])
+        
+        delta = {
+            "base": _resumen_delta(reglas_anteriores),
+            "total_reglas": len(reglas),
+            "estadisticas": dict(self.estadisticas),
+            "eliminadas": sorted(posiciones.values()),
+            "actualizadas": actualizadas,
+            "agregadas": agregadas
         }
+        if any(a > b for a, b in zip(conservadas, conservadas[1:])):
+            delta["orden"] = conservadas
+        return delta
+    
+    def aplicar_delta(self, delta):
+        """
+        Aplica un delta de calcular_delta sobre esta base, que debe tener las
+        mismas reglas que el checkpoint anterior del delta; el resultado es
+        igual al checkpoint nuevo. Los índices se reconstruyen una sola vez
+        """
+        reglas = list(self.reglas)
+        if _resumen_delta(reglas) != delta["base"]:
+            raise ValueError("El delta no corresponde a esta base de conocimiento: "
+                             f"se esperaban {delta['base']['total_reglas']} reglas "
+                             f"y hay {len(reglas)}")
         
-        os.makedirs(os.path.dirname(self.archivo_conocimiento), exist_ok=True)
+        # Las reglas actualizadas se reemplazan por copias: las instantáneas conservan las anteriores
+        for posicion, cambios in delta["actualizadas"]:
+            datos = reglas[posicion].to_dict()
+            datos.update(cambios)
+            if datos.get("historial") is None:
+                datos.pop("historial", None)
+            reglas[posicion] = ReglaConocimiento.from_dict(datos)
         
-        with open(self.archivo_conocimiento, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        eliminadas = set(delta["eliminadas"])
+        orden = delta.get("orden")
+        if orden is None:
+            orden = (posicion for posicion in range(len(reglas)) if posicion not in eliminadas)
+        conservadas = iter([reglas[posicion] for posicion in orden])
         
-        print(f"Conocimiento guardado: {len(self.reglas)} reglas en {self.archivo_conocimiento}")
+        agregadas = {posicion: datos for posicion, datos in delta["agregadas"]}
+        self._asignar_reglas([ReglaConocimiento.from_dict(agregadas[posicion]) if posicion in agregadas
+                              else next(conservadas) for posicion in range(delta["total_reglas"])])
+        self.estadisticas = dict(delta["estadisticas"])
+        self._reconstruir_indices()
+        self._compactar_diario = True
+        self._comprobar_estadisticas()
     
-    def buscar_reglas_coincidentes(self, estado):
-        """Busca reglas que coincidan con el estado dado"""
-        coincidentes = []
+    def exportar_delta(self, archivo_anterior, archivo_delta):
+        """Guarda en archivo_delta los cambios desde el checkpoint archivo_anterior y devuelve el delta"""
+        anterior = BaseConocimiento(archivo_anterior, usar_diario=True)
+        delta = self.calcular_delta(anterior)
+        escribir_atomico(archivo_delta, lambda f: json.dump(delta, f, ensure_ascii=False,
+                                                            separators=(",", ":")))
         
-        for regla in self.reglas:
-            if regla.coincide_con_estado(estado):
-                coincidentes.append(regla)
+        print(f"Delta guardado en {archivo_delta}: {len(delta['agregadas'])} reglas agregadas, "
+              f"{len(delta['eliminadas'])} eliminadas, {len(delta['actualizadas'])} actualizadas "
+              f"({os.path.getsize(archivo_delta)} bytes)")
+        return delta
+    
+    def importar_delta(self, archivo_delta):
+        """Aplica sobre esta base el delta guardado en archivo_delta"""
+        with open(archivo_delta, 'r', encoding='utf-8') as f:
+            delta = json.load(f)
+        self.aplicar_delta(delta)
         
-        return coincidentes
+        print(f"Delta aplicado desde {archivo_delta}: {len(delta['agregadas'])} reglas agregadas, "
+              f"{len(delta['eliminadas'])} eliminadas, {len(delta['actualizadas'])} actualizadas")
+        return delta
+    
+    def guardar_conocimiento(self, en_segundo_plano=False):
+        """
+        Guarda el conocimiento en archivo. en_segundo_plano: copia el estado
+        actual y lo escribe desde otro hilo; si ya hay un guardado en curso no
+        hace nada y los cambios se incluyen en el siguiente guardado
+        """
+        if en_segundo_plano and self._guardado.en_curso():
+            self._guardado.coalescidos += 1
+            return
+        
+        self.esperar_guardado()
+        
+        escribir = self._preparar_guardado(copiar=en_segundo_plano)
+        if en_segundo_plano:
+            self._guardado.iniciar(escribir)
+        else:
+            escribir()
+    
+    def esperar_guardado(self):
+        """
+        Espera a que termine el guardado en segundo plano, si hay uno en curso,
+        y devuelve su error si falló
+        """
+        error = self._guardado.esperar()
+        if error:
+            # El guardado fallido pudo perder experiencias del diario
+            self._compactar_diario = True
+        return error
+    
+    def _preparar_guardado(self, copiar):
+        """
+        Toma lo que hay que guardar y devuelve la función que lo escribe.
+        Con copiar, la función no depende de cambios posteriores en la base
+        """
+        estadisticas = dict(self.estadisticas)
+        
+        if (self.diario and not self._compactar_diario and
+                os.path.exists(self.archivo_conocimiento) and os.path.exists(self.diario.ruta) and
+                self.diario.registros + len(self._experiencias_pendientes) < COMPACTAR_DIARIO_CADA):
+            registros = self._experiencias_pendientes + [{"estadisticas": estadisticas}]
+            self._experiencias_pendientes = []
+            
+            def escribir():
+                self.diario.agregar(registros)
+                print(f"Conocimiento guardado: {len(registros) - 1} experiencias "
+                      f"agregadas a {self.diario.ruta}")
+            return escribir
+        
+        self._generacion += 1
+        generacion = self._generacion
+        archivo = self.archivo_conocimiento
+        fecha_guardado = datetime.now().isoformat()
+        self._experiencias_pendientes = []
+        self._compactar_diario = False
+        
+        # Conteo exacto por resultado para mostrar resúmenes sin leer las reglas
+        reglas_por_resultado = {"éxito": estadisticas["reglas_exito"],
+                                "fracaso": estadisticas["reglas_fracaso"]}
+        
+        if es_archivo_binario(archivo):
+            # Los estados no se modifican nunca, así que copiar las reglas basta
+            reglas = [r.copiar() for r in self.reglas] if copiar else self.reglas
+            
+            def escribir_instantanea():
+                guardar_binario(archivo, reglas, estadisticas, fecha_guardado=fecha_guardado,
+                                generacion=generacion, reglas_por_resultado=reglas_por_resultado)
+        else:
+            # La cabecera va antes de las reglas para poder leerla sin recorrerlas
+            reglas = [r.to_dict() for r in self.reglas]
+            data = {
+                "estadisticas": estadisticas,
+                "fecha_guardado": fecha_guardado,
+                "total_reglas": len(reglas),
+                "generacion": generacion,
+                "reglas_por_resultado": reglas_por_resultado,
+                "reglas": reglas
+            }
+            
+            def escribir_instantanea():
+                escribir_atomico(archivo, lambda f: json.dump(data, f, indent=2, ensure_ascii=False))
+        
+        def escribir():
+            escribir_instantanea()
+            if self.diario:
+                self.diario.reiniciar(generacion)
+            print(f"Conocimiento guardado: {len(reglas)} reglas en {archivo}")
+        return escribir
+    
+    def buscar_reglas_coincidentes(self, estado):
+        """Busca reglas que coincidan con el estado dado"""
+        return self._indice_coincidencias.buscar(estado)
+    
+    def instantanea(self):
+        """
+        Vista inmutable de las reglas actuales para evaluar la política sin
+        modificar la base ni sus estadísticas. No copia las reglas: la base
+        copia solo las que modifica mientras la instantánea existe
+        """
+        instantanea = InstantaneaConocimiento(self._indice_coincidencias.congelar().buscar,
+                                              len(self.reglas), self._cerrojo)
+        self._instantaneas.add(instantanea)
+        return instantanea
+    
+    def _instantanea_copiada(self):
+        """Instantánea sobre una copia de las reglas, para almacenes que las modifican en su lugar"""
+        motor = MOTORES_COINCIDENCIAS[self.motor_coincidencias]([r.copiar() for r in self.reglas])
+        return InstantaneaConocimiento(motor.buscar, len(motor.reglas))
     
     def obtener_mejor_accion(self, estado, exploracion=0.0):
         """
@@ -205,89 +934,156 @@ class BaseConocimiento:
         """
         self.estadisticas["consultas_totales"] += 1
         
-        reglas_coincidentes = self.buscar_reglas_coincidentes(estado)
+        hay_coincidencias, mejor_regla, acciones_posibles = self._analizar_estado(estado)
         
-        if not reglas_coincidentes or random.random() < exploracion:
+        if not hay_coincidencias or random.random() < exploracion:
             return random.choice(ACCIONES_LEON), None
         
+        if mejor_regla:
+            self.estadisticas["aciertos"] += 1
+            return mejor_regla.accion, mejor_regla
+        else:
+            return random.choice(acciones_posibles), None
+    
+    def _analizar_estado(self, estado):
+        """
+        Parte determinista de obtener_mejor_accion, memorizada por estado
+        Returns: (hay_coincidencias, mejor_regla, acciones_posibles)
+        """
+        try:
+            clave = clave_canonica(estado)
+            analisis = self.cache_decisiones.obtener(clave, self._version)
+        except TypeError:
+            clave = None
+            analisis = None
+        
+        if analisis is not None:
+            return analisis
+        
+        analisis = self._calcular_analisis(estado)
+        if clave is not None:
+            self.cache_decisiones.guardar(clave, analisis)
+        return analisis
+    
+    def _calcular_analisis(self, estado):
+        """Calcula (hay_coincidencias, mejor_regla, acciones_posibles) sin caché"""
+        reglas_coincidentes = self.buscar_reglas_coincidentes(estado)
         reglas_exito = [r for r in reglas_coincidentes if r.resultado == "éxito"]
         
+        mejor_regla = None
+        acciones_posibles = None
         if reglas_exito:
             mejor_regla = max(reglas_exito, key=lambda r: r.tasa_exito * r.contador)
-            self.estadisticas["aciertos"] += 1
-            return mejor_regla.accion, mejor_regla
         else:
             acciones_fracaso = set(r.accion for r in reglas_coincidentes)
-            acciones_posibles = [a for a in ACCIONES_LEON if a not in acciones_fracaso]
-            
-            if acciones_posibles:
-                return random.choice(acciones_posibles), None
-            else:
-                return random.choice(ACCIONES_LEON), None
+            acciones_posibles = [a for a in ACCIONES_LEON if a not in acciones_fracaso] or ACCIONES_LEON
+        
+        return bool(reglas_coincidentes), mejor_regla, acciones_posibles
+    
+    def explicar_estado(self, estado):
+        """
+        Reglas que explican un estado, de mayor a menor confianza, en una sola
+        búsqueda del índice de explicaciones
+        Returns: (reglas_exito, reglas_fracaso, reglas_misma_posicion)
+        """
+        if self._explicaciones is None or self._explicaciones.version != self._version:
+            self._explicaciones = IndiceExplicaciones(self.reglas, self._version)
+        return self._explicaciones.explicar(estado, self.buscar_reglas_coincidentes)
     
     def agregar_experiencia(self, estado, accion, resultado):
         """Agrega una nueva experiencia al conocimiento"""
+        regla = self._aplicar_experiencia(estado, accion, resultado)
         
-        regla_existente = None
-        for regla in self.reglas:
-            if (regla.estado == estado and 
-                regla.accion == accion and 
-                regla.resultado == resultado):
-                regla_existente = regla
-                break
+        if self.diario:
+            self._experiencias_pendientes.append({
+                "estado": estado,
+                "accion": accion,
+                "resultado": resultado,
+                "actualizacion": regla._actualizacion
+            })
+        self._comprobar_estadisticas()
+    
+    def _aplicar_experiencia(self, estado, accion, resultado):
+        """Actualiza o inserta la regla de una experiencia y la devuelve"""
+        explicaciones = self._explicaciones
+        if explicaciones is not None and (explicaciones.version != self._version or
+                                          not self._explicaciones_incrementales):
+            explicaciones = None
+        
+        regla_existente = self._buscar_regla_exacta(estado, accion, resultado)
         
         if regla_existente:
-            regla_existente.actualizar(resultado)
-        else:
-            nueva_regla = ReglaConocimiento(estado, accion, resultado)
-            self.reglas.append(nueva_regla)
-            
-            if resultado == "éxito":
-                self.estadisticas["reglas_exito"] += 1
-            else:
-                self.estadisticas["reglas_fracaso"] += 1
-            
-            self.estadisticas["total_reglas"] = len(self.reglas)
+            resultado_anterior = regla_existente.resultado
+            self._actualizar_regla(regla_existente, resultado)
+            self._contar_cambio_resultado(resultado_anterior, regla_existente.resultado)
+            if explicaciones is not None:
+                explicaciones.registrar(regla_existente, False, resultado_anterior)
+                explicaciones.version = self._version
+            return regla_existente
+        
+        regla = self._insertar_regla(ReglaConocimiento(estado, accion, resultado))
+        if explicaciones is not None:
+            # Una base acotada puede desalojar la regla en la misma inserción
+            if self._contiene_regla(regla):
+                explicaciones.registrar(regla, True)
+            explicaciones.version = self._version
+        
+        self._contar_regla(resultado, 1)
+        return regla
     
-    def generalizar_conocimiento(self):
-        """Generaliza el conocimiento combinando reglas similares"""
+    def generalizar_conocimiento(self, hasta_punto_fijo=None):
+        """
+        Generaliza el conocimiento combinando reglas similares
+        hasta_punto_fijo: repetir la combinación sobre las reglas recién creadas
+        hasta que ya no sea posible unir ninguna
+        """
+        if hasta_punto_fijo is None:
+            hasta_punto_fijo = GENERALIZAR_HASTA_PUNTO_FIJO
+        
         print("Iniciando generalización del conocimiento...")
         
-        nuevas_reglas = []
-        procesadas = set()
         cambios = 0
+        rondas = 0
         
-        for i, regla1 in enumerate(self.reglas):
-            if i in procesadas:
-                continue
-            
-            mejor_combinacion = None
-            mejor_indice = -1
+        # Cada regla se une con la primera regla posterior compatible, buscándola
+        # solo entre las reglas que comparten firma en lugar de recorrer todas
+        indice = IndiceGeneralizacion(self.reglas)
+        pendientes = range(len(self.reglas))
+        
+        while pendientes:
+            rondas += 1
+            combinadas = []
             
-            for j, regla2 in enumerate(self.reglas[i+1:], i+1):
-                if j in procesadas:
+            for i in pendientes:
+                if i in indice.unidas:
                     continue
                 
-                if regla1.puede_unirse_con(regla2):
-                    regla_combinada = regla1.unir_con(regla2)
-                    if regla_combinada:
-                        mejor_combinacion = regla_combinada
-                        mejor_indice = j
-                        break
+                mejor_indice = indice.primera_pareja(i)
+                if mejor_indice is None:
+                    continue
+                
+                mejor_combinacion = indice.unir(i, mejor_indice)
+                if mejor_combinacion:
+                    orden = min(indice.orden[i], indice.orden[mejor_indice])
+                    combinadas.append((mejor_combinacion, orden))
+                    # Dos reglas del mismo resultado se reemplazan por una
+                    self._contar_regla(mejor_combinacion.resultado, -1)
+                    cambios += 1
             
-            if mejor_combinacion:
-                nuevas_reglas.append(mejor_combinacion)
-                procesadas.add(i)
-                procesadas.add(mejor_indice)
-                cambios += 1
-            else:
-                nuevas_reglas.append(regla1)
-                procesadas.add(i)
+            # Las reglas combinadas participan hasta la ronda siguiente; en cada
+            # ronda solo ellas pueden dar lugar a nuevas uniones
+            pendientes = [indice.agregar(regla, orden) for regla, orden in combinadas]
+            
+            if not hasta_punto_fijo:
+                break
         
-        self.reglas = nuevas_reglas
-        self.estadisticas["total_reglas"] = len(self.reglas)
+        # Los índices se reconstruyen en depurar_conocimiento, justo después
+        self._asignar_reglas(indice.vigentes())
         
-        print(f"Generalización completada. Reglas: {len(self.reglas)} (-{cambios})")
+        if hasta_punto_fijo:
+            print(f"Generalización completada en {rondas} rondas. Reglas: {len(self.reglas)} (-{cambios})")
+        else:
+            print(f"Generalización completada. Reglas: {len(self.reglas)} (-{cambios})")
         
         self.depurar_conocimiento()
         
@@ -303,23 +1099,32 @@ class BaseConocimiento:
                 (regla.contador >= 1 and regla.tasa_exito >= umbral_tasa)):
                 reglas_filtradas.append(regla)
             else:
+                self._contar_regla(regla.resultado, -1)
                 eliminadas += 1
         
-        self.reglas = reglas_filtradas
+        self._asignar_reglas(reglas_filtradas)
+        self._reconstruir_indices()
+        self._compactar_diario = True
+        self._comprobar_estadisticas()
         print(f"Depuración: eliminadas {eliminadas} reglas poco confiables")
     
+    def iterar_reglas(self, filtro=None, accion=None, posicion=None, ordenar=None):
+        """
+        Itera (número, regla), con el número de la regla en toda la base.
+        filtro: "exito" o "fracaso"; accion, posicion y ordenar ("confianza"
+        o "contador") como en paginacion.filtrar_reglas
+        """
+        return filtrar_reglas(enumerate(self.reglas, 1), filtro, accion, posicion, ordenar)
+    
+    def paginar(self, filtro=None, accion=None, posicion=None, ordenar=None, tamaño=None):
+        """Paginador de las reglas que cumplen los filtros, para recorrerlas hacia adelante y atrás"""
+        return PaginadorReglas(self.iterar_reglas(filtro, accion, posicion, ordenar), tamaño)
+    
     def mostrar_reglas(self, filtro=None):
         """Muestra todas las reglas"""
         print(f"\n=== BASE DE CONOCIMIENTO ({len(self.reglas)} reglas) ===")
-        
-        for i, regla in enumerate(self.reglas, 1):
-            if filtro:
-                if filtro == "exito" and regla.resultado != "éxito":
-                    continue
-                if filtro == "fracaso" and regla.resultado != "fracaso":
-                    continue
-            
-            print(f"{i:3}. {regla}")
+        escribir_por_bloques(sys.stdout, (f"{numero:3}. {regla}\n"
+                                          for numero, regla in self.iterar_reglas(filtro)))
     
     def mostrar_estadisticas(self):
         """Muestra estadísticas del conocimiento"""
@@ -332,37 +1137,142 @@ class BaseConocimiento:
         if self.estadisticas['consultas_totales'] > 0:
             tasa_acierto = self.estadisticas['aciertos'] / self.estadisticas['consultas_totales']
             print(f"Tasa de acierto: {tasa_acierto:.2%}")
+        
+        cache = self.cache_decisiones.estadisticas()
+        if cache["aciertos"] + cache["fallos"] > 0:
+            print(f"Caché de decisiones: {cache['aciertos']} aciertos, {cache['fallos']} fallos "
+                  f"({cache['tasa_aciertos']:.2%})")
+    
+    def exportar_a_texto(self, archivo_salida, filtro=None, accion=None, posicion=None, ordenar=None):
+        """Exporta la base de conocimiento (o las reglas que cumplen los filtros) a archivo de texto"""
+        exportar_reglas_texto(archivo_salida, self.estadisticas,
+                              self.iterar_reglas(filtro, accion, posicion, ordenar))
+        print(f"Base de conocimiento exportada a {archivo_salida}")
     
-    def exportar_a_texto(self, archivo_salida):
-        """Exporta la base de conocimiento a archivo de texto"""
-        with open(archivo_salida, 'w', encoding='utf-8') as f:
-            f.write(f"BASE DE CONOCIMIENTO - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("=" * 60 + "\n\n")
+    def validar_conocimiento(self):
+        """
+        Revisa la estructura de las reglas y las contradicciones entre reglas
+        con el mismo estado (distinta acción o resultado) en una sola pasada.
+        Devuelve un reporte que se puede exportar con exportar_validacion;
+        las reglas se identifican por su número (desde 1) en la base
+        """
+        problemas = []
+        grupos = {}
+        clave_estado = claves_de_estados()
+        
+        for numero, regla in enumerate(self.reglas, 1):
+            estado = regla.estado
+            if not isinstance(estado, dict):
+                problemas.append({"regla": numero, "tipo": "estado_invalido",
+                                  "detalle": f"El estado no es un diccionario: {estado!r}"})
+                continue
             
-            f.write("ESTADÍSTICAS:\n")
-            for clave, valor in self.estadisticas.items():
-                f.write(f"  {clave}: {valor}\n")
+            faltantes = [k for k in CAMPOS_ESTADO_OBLIGATORIOS if k not in estado]
+            if faltantes:
+                problemas.append({"regla": numero, "tipo": "campos_faltantes",
+                                  "detalle": f"Faltan campos obligatorios: {', '.join(faltantes)}"})
+            if regla.accion not in ACCIONES_LEON:
+                problemas.append({"regla": numero, "tipo": "accion_invalida",
+                                  "detalle": f"Acción inválida: {regla.accion}"})
+            if regla.resultado not in ("éxito", "fracaso"):
+                problemas.append({"regla": numero, "tipo": "resultado_invalido",
+                                  "detalle": f"Resultado inválido: {regla.resultado}"})
+            if not isinstance(regla.contador, int) or regla.contador < 1:
+                problemas.append({"regla": numero, "tipo": "contador_invalido",
+                                  "detalle": f"Contador inválido: {regla.contador}"})
+            if not isinstance(regla.tasa_exito, (int, float)) or not 0.0 <= regla.tasa_exito <= 1.0:
+                problemas.append({"regla": numero, "tipo": "tasa_invalida",
+                                  "detalle": f"Tasa de éxito fuera de [0, 1]: {regla.tasa_exito}"})
             
-            f.write("\n\nREGLAS:\n")
-            f.write("=" * 60 + "\n")
+            try:
+                clave = clave_estado(estado)
+            except TypeError:
+                problemas.append({"regla": numero, "tipo": "estado_invalido",
+                                  "detalle": "El estado tiene valores no comparables"})
+                continue
             
-            for i, regla in enumerate(self.reglas, 1):
-                f.write(f"\nRegla #{i}:\n")
-                f.write(f"  Condiciones:\n")
-                for clave, valor in regla.estado.items():
-                    f.write(f"    - {clave}: {valor}\n")
-                f.write(f"  Acción: {regla.accion}\n")
-                f.write(f"  Resultado: {regla.resultado}\n")
-                f.write(f"  Confianza: {regla.tasa_exito:.2%} (n={regla.contador})\n")
-                f.write(f"  Última actualización: {regla.ultima_actualizacion}\n")
+            grupo = grupos.get(clave)
+            if grupo is None:
+                grupo = grupos[clave] = {"estado": estado, "reglas": [], "variantes": defaultdict(int)}
+            grupo["reglas"].append(numero)
+            grupo["variantes"][(regla.accion, regla.resultado)] += 1
         
-        print(f"Base de conocimiento exportada a {archivo_salida}")
+        contradicciones = []
+        pares_contradictorios = 0
+        for grupo in grupos.values():
+            variantes = grupo["variantes"]
+            if len(variantes) < 2:
+                continue
+            
+            # Pares de reglas del grupo que no comparten acción y resultado
+            total = len(grupo["reglas"])
+            pares = total * (total - 1) // 2 - sum(n * (n - 1) // 2 for n in variantes.values())
+            pares_contradictorios += pares
+            contradicciones.append({
+                "estado": grupo["estado"],
+                "reglas": grupo["reglas"],
+                "variantes": [{"accion": accion, "resultado": resultado, "reglas": n}
+                              for (accion, resultado), n in variantes.items()],
+                "pares": pares
+            })
+        
+        reglas_con_problemas = len({p["regla"] for p in problemas})
+        return {
+            "fecha": datetime.now().isoformat(),
+            "archivo": self.archivo_conocimiento,
+            "total_reglas": len(self.reglas),
+            "reglas_validas": len(self.reglas) - reglas_con_problemas,
+            "reglas_con_problemas": reglas_con_problemas,
+            "estados_distintos": len(grupos),
+            "estados_contradictorios": len(contradicciones),
+            "pares_contradictorios": pares_contradictorios,
+            "problemas": problemas,
+            "contradicciones": contradicciones
+        }
+    
+    def mostrar_validacion(self, reporte=None, limite=5):
+        """Muestra el resumen de un reporte de validar_conocimiento"""
+        if reporte is None:
+            reporte = self.validar_conocimiento()
+        
+        print(f"Reglas revisadas: {reporte['total_reglas']}")
+        problemas = reporte["problemas"]
+        if problemas:
+            print(f"Se encontraron {len(problemas)} problemas en {reporte['reglas_con_problemas']} reglas:")
+            for problema in problemas[:limite]:
+                print(f"  - Regla {problema['regla']}: {problema['detalle']}")
+            if len(problemas) > limite:
+                print(f"  ... y {len(problemas) - limite} más")
+        else:
+            print("Todas las reglas tienen estructura válida.")
+        
+        print(f"\nEstados distintos: {reporte['estados_distintos']}")
+        print(f"Estados con reglas contradictorias: {reporte['estados_contradictorios']}")
+        print(f"Reglas contradictorias encontradas: {reporte['pares_contradictorios']} pares")
+        for contradiccion in reporte["contradicciones"][:limite]:
+            variantes = ", ".join(f"{v['accion']} → {v['resultado']} (x{v['reglas']})"
+                                  for v in contradiccion["variantes"])
+            print(f"  - Reglas {contradiccion['reglas']}: {variantes}")
+        if len(reporte["contradicciones"]) > limite:
+            print(f"  ... y {len(reporte['contradicciones']) - limite} estados más")
+        
+        return reporte
+    
+    def exportar_validacion(self, archivo_salida, reporte=None):
+        """Exporta un reporte de validar_conocimiento a un archivo JSON"""
+        if reporte is None:
+            reporte = self.validar_conocimiento()
+        escribir_atomico(archivo_salida, lambda f: json.dump(reporte, f, indent=2, ensure_ascii=False))
+        print(f"Reporte de validación exportado a {archivo_salida}")
+        return reporte
     
     def limpiar_conocimiento(self):
         """Limpia toda la base de conocimiento"""
         confirmacion = input("¿Está seguro de limpiar toda la base de conocimiento? (s/n): ")
         if confirmacion.lower() == 's':
-            self.reglas = []
+            self._asignar_reglas([])
+            self._reconstruir_indices()
+            self._compactar_diario = True
             self.estadisticas = {
                 "total_reglas": 0,
                 "reglas_exito": 0,
@@ -371,4 +1281,71 @@ class BaseConocimiento:
                 "aciertos": 0
             }
             print("Base de conocimiento limpiada.")
-            self.guardar_conocimiento()
\ No newline at end of file
+            self.guardar_conocimiento()
+
+
+class InstantaneaConocimiento:
+    """
+    Vista inmutable de una base de conocimiento en el momento de tomarla.
+    
+    Comparte las reglas con la base. Antes de modificar por primera vez una
+    regla, la base deja aquí una copia de cómo estaba y las búsquedas usan
+    esa copia; las reglas agregadas después no se ven. Las consultas llevan
+    sus propias estadísticas y caché, así que evaluar con la instantánea no
+    altera las de la base, incluso desde otro hilo mientras la base entrena.
+    """
+    
+    def __init__(self, buscar, total_reglas, cerrojo=None):
+        self._buscar = buscar
+        self._cerrojo = cerrojo or threading.RLock()
+        self._anteriores = {}
+        self._version = 0
+        self.total_reglas = total_reglas
+        self.estadisticas = {"consultas_totales": 0, "aciertos": 0}
+        self.cache_decisiones = CacheDecisiones()
+    
+    def _conservar(self, regla):
+        """La base va a modificar la regla: guarda cómo estaba la primera vez"""
+        if regla not in self._anteriores:
+            self._anteriores[regla] = regla.copiar()
+    
+    def buscar_reglas_coincidentes(self, estado):
+        """Reglas que coincidían con el estado al tomar la instantánea"""
+        with self._cerrojo:
+            anteriores = self._anteriores
+            return [anteriores.get(r, r) for r in self._buscar(estado)]
+    
+    # Mismas decisiones que la base; la versión no cambia, así que la caché no se vacía
+    _analizar_estado = BaseConocimiento._analizar_estado
+    _calcular_analisis = BaseConocimiento._calcular_analisis
+    
+    def obtener_mejor_accion(self, estado, exploracion=0.0):
+        """Como BaseConocimiento.obtener_mejor_accion, contando en las estadísticas de la instantánea"""
+        self.estadisticas["consultas_totales"] += 1
+        
+        with self._cerrojo:
+            hay_coincidencias, mejor_regla, acciones_posibles = self._analizar_estado(estado)
+        
+        if not hay_coincidencias or random.random() < exploracion:
+            return random.choice(ACCIONES_LEON), None
+        
+        if mejor_regla:
+            self.estadisticas["aciertos"] += 1
+            return mejor_regla.accion, mejor_regla
+        else:
+            return random.choice(acciones_posibles), None
+
+
+def combinar_archivos(archivos, archivo_destino):
+    """
+    Combina varios archivos de conocimiento en archivo_destino (sumándoles
+    sus propias reglas, si ya existe) y devuelve la base combinada. Los
+    archivos se cargan de a uno, con las experiencias de su diario
+    """
+    destino = BaseConocimiento(archivo_destino)
+    nuevas = destino.combinar_bases(BaseConocimiento(archivo, usar_diario=True) for archivo in archivos)
+    
+    print(f"Combinados {len(archivos)} archivos en {archivo_destino}: "
+          f"{len(destino.reglas)} reglas ({nuevas} nuevas)")
+    destino.guardar_conocimiento()
+    return destino
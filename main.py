@@ -11,7 +11,11 @@ from datetime import datetime
 # Importar módulos del proyecto
 from config import *
 from simulation import Mundo
-from knowledge_base import BaseConocimiento
+from knowledge_base import BaseConocimiento, combinar_archivos
+from almacen_acotado import BaseConocimientoAcotada
+from almacen_particionado import BaseConocimientoParticionada
+from carga_perezosa import ConocimientoPerezoso
+from paginacion import navegar_paginas
 from training import Entrenador, entrenar_especializacion_posicion, entrenar_excluyendo_posicion
 from step_by_step import modo_paso_a_paso_interactivo
 from visualization import Visualizador
@@ -34,6 +38,13 @@ def mostrar_banner():
     """
     print(banner)
 
+def crear_base_entrenamiento(archivo_kb=None):
+    """Base de conocimiento para entrenar: acotada si CAPACIDAD_MAXIMA_REGLAS está configurada"""
+    if CAPACIDAD_MAXIMA_REGLAS:
+        print(f"Capacidad máxima: {CAPACIDAD_MAXIMA_REGLAS} reglas (desalojo {POLITICA_DESALOJO})")
+        return BaseConocimientoAcotada(archivo_kb or None)
+    return BaseConocimiento(archivo_kb) if archivo_kb else BaseConocimiento()
+
 def modo_entrenamiento():
     """Menú del modo de entrenamiento"""
     while True:
@@ -79,7 +90,7 @@ def modo_entrenamiento():
                     secuencia_impala = sec_input.split()
                 
                 archivo_kb = input("\nArchivo de conocimiento (Enter para cargar/default): ").strip()
-                base = BaseConocimiento(archivo_kb) if archivo_kb else BaseConocimiento()
+                base = crear_base_entrenamiento(archivo_kb)
                 
                 entrenador = Entrenador(base)
                 
@@ -119,7 +130,12 @@ def modo_entrenamiento():
                 posicion = int(input("Posición a especializar (1-8): "))
                 num_incursiones = int(input("Número de incursiones (ej: 2000): ") or "2000")
                 
-                base, entrenador = entrenar_especializacion_posicion(posicion, num_incursiones)
+                # La base particionada solo reescribe la posición entrenada (y las reglas compartidas)
+                base = None
+                if input("¿Usar base particionada por posición? (s/n): ").strip().lower() == 's':
+                    base = BaseConocimientoParticionada()
+                
+                base, entrenador = entrenar_especializacion_posicion(posicion, num_incursiones, base)
                 
                 input("\nPresione Enter para continuar...")
                 
@@ -150,7 +166,7 @@ def modo_entrenamiento():
                 archivo_kb = ARCHIVO_CONOCIMIENTO
             
             if os.path.exists(archivo_kb):
-                base = BaseConocimiento(archivo_kb)
+                base = crear_base_entrenamiento(archivo_kb)
                 entrenador = Entrenador(base)
                 
                 try:
@@ -183,7 +199,7 @@ def modo_entrenamiento():
             if os.path.exists(archivo_kb):
                 base = BaseConocimiento(archivo_kb)
                 base.mostrar_estadisticas()
-                base.mostrar_reglas()
+                navegar_paginas(base.paginar())
             else:
                 print("Archivo no encontrado")
             
@@ -265,8 +281,26 @@ def modo_visualizacion():
             print("Opción inválida")
             time.sleep(1)
 
+def pedir_filtros_reglas():
+    """Pide acción, posición y orden opcionales para listar reglas"""
+    accion = input("Acción (Enter: todas): ").strip() or None
+    
+    posicion = input("Posición del león (Enter: todas): ").strip()
+    posicion = int(posicion) if posicion.isdigit() else None
+    
+    orden = input("Ordenar por (c: confianza, n: contador, Enter: orden de la base): ").strip().lower()
+    ordenar = {"c": "confianza", "n": "contador"}.get(orden)
+    return {"accion": accion, "posicion": posicion, "ordenar": ordenar}
+
+def mostrar_reglas_paginadas(conocimiento, filtro=None, **filtros):
+    """Muestra las reglas por páginas a medida que se leen del archivo, con página siguiente y anterior"""
+    print(f"\n=== BASE DE CONOCIMIENTO ({conocimiento.total_reglas} reglas) ===")
+    navegar_paginas(conocimiento.paginar(filtro, **filtros))
+
 def modo_gestion_conocimiento():
     """Menú de gestión de conocimiento"""
+    archivo_actual = ARCHIVO_CONOCIMIENTO
+    
     while True:
         limpiar_pantalla()
         mostrar_banner()
@@ -275,43 +309,49 @@ def modo_gestion_conocimiento():
         print("GESTIÓN DE CONOCIMIENTO")
         print("="*60)
         
-        base = BaseConocimiento()
+        # Solo se lee la cabecera; la base completa se carga al modificarla
+        conocimiento = ConocimientoPerezoso(archivo_actual)
         
-        print(f"\nBase de conocimiento actual: {len(base.reglas)} reglas")
-        print(f"Archivo: {base.archivo_conocimiento}")
+        print(f"\nBase de conocimiento actual: {conocimiento.total_reglas} reglas")
+        print(f"Archivo: {conocimiento.archivo_conocimiento}")
         
         print("\nOpciones:")
-        print("  1. Mostrar todas las reglas")
+        print("  1. Mostrar reglas (por acción o posición, ordenadas)")
         print("  2. Mostrar reglas de éxito")
         print("  3. Mostrar reglas de fracaso")
         print("  4. Exportar conocimiento a texto")
         print("  5. Generalizar conocimiento")
         print("  6. Limpiar conocimiento")
         print("  7. Cargar desde archivo diferente")
-        print("  8. Volver al menú principal")
+        print("  8. Importar reglas de otro archivo (ej: conocimiento semilla)")
+        print("  9. Combinar bases de conocimiento de otros entrenamientos")
+        print("  10. Exportar delta de cambios desde un checkpoint anterior")
+        print("  11. Aplicar delta de cambios")
+        print("  12. Volver al menú principal")
         
         opcion = input("\nSeleccione opción: ").strip()
         
         if opcion == "1":
-            base.mostrar_reglas()
-            base.mostrar_estadisticas()
+            mostrar_reglas_paginadas(conocimiento, **pedir_filtros_reglas())
+            conocimiento.mostrar_estadisticas()
             input("\nPresione Enter para continuar...")
         
         elif opcion == "2":
-            base.mostrar_reglas("exito")
+            mostrar_reglas_paginadas(conocimiento, "exito")
             input("\nPresione Enter para continuar...")
         
         elif opcion == "3":
-            base.mostrar_reglas("fracaso")
+            mostrar_reglas_paginadas(conocimiento, "fracaso")
             input("\nPresione Enter para continuar...")
         
         elif opcion == "4":
             archivo = input("Archivo de salida (ej: conocimiento.txt): ").strip()
             if archivo:
-                base.exportar_a_texto(archivo)
+                conocimiento.exportar_a_texto(archivo)
             input("\nPresione Enter para continuar...")
         
         elif opcion == "5":
+            base = conocimiento.cargar()
             print("Generalizando conocimiento...")
             cambios = base.generalizar_conocimiento()
             print(f"Realizadas {cambios} generalizaciones")
@@ -319,19 +359,62 @@ def modo_gestion_conocimiento():
             input("\nPresione Enter para continuar...")
         
         elif opcion == "6":
-            base.limpiar_conocimiento()
+            conocimiento.cargar().limpiar_conocimiento()
             input("\nPresione Enter para continuar...")
         
         elif opcion == "7":
             archivo = input("Nuevo archivo de conocimiento: ").strip()
             if archivo and os.path.exists(archivo):
-                base = BaseConocimiento(archivo)
-                print(f"Conocimiento cargado: {len(base.reglas)} reglas")
+                archivo_actual = archivo
+                conocimiento = ConocimientoPerezoso(archivo)
+                print(f"Conocimiento cargado: {conocimiento.total_reglas} reglas")
             else:
                 print("Archivo no encontrado")
             input("\nPresione Enter para continuar...")
         
         elif opcion == "8":
+            archivo = input("Archivo a importar: ").strip()
+            if archivo and os.path.exists(archivo):
+                base = conocimiento.cargar()
+                base.importar_conocimiento(archivo)
+                base.guardar_conocimiento()
+            else:
+                print("Archivo no encontrado")
+            input("\nPresione Enter para continuar...")
+        
+        elif opcion == "9":
+            archivos = input("Archivos a combinar (separados por espacios): ").split()
+            faltantes = [a for a in archivos if not os.path.exists(a)]
+            if archivos and not faltantes:
+                combinar_archivos(archivos, archivo_actual)
+            else:
+                print(f"Archivos no encontrados: {' '.join(faltantes) or '(ninguno indicado)'}")
+            input("\nPresione Enter para continuar...")
+        
+        elif opcion == "10":
+            anterior = input("Checkpoint anterior: ").strip()
+            if anterior and os.path.exists(anterior):
+                archivo = input("Archivo de delta (ej: data/delta.json): ").strip()
+                if archivo:
+                    conocimiento.cargar().exportar_delta(anterior, archivo)
+            else:
+                print("Archivo no encontrado")
+            input("\nPresione Enter para continuar...")
+        
+        elif opcion == "11":
+            archivo = input("Archivo de delta: ").strip()
+            if archivo and os.path.exists(archivo):
+                base = conocimiento.cargar()
+                try:
+                    base.importar_delta(archivo)
+                    base.guardar_conocimiento()
+                except ValueError as e:
+                    print(f"Error: {e}")
+            else:
+                print("Archivo no encontrado")
+            input("\nPresione Enter para continuar...")
+        
+        elif opcion == "12":
             print("Volviendo al menú principal...")
             break
         
@@ -435,39 +518,12 @@ def modo_pruebas():
             
             base = BaseConocimiento()
             
-            print("Validando estructura de reglas...")
-            
-            problemas = []
+            print("Validando estructura y consistencia de las reglas...")
+            reporte = base.mostrar_validacion()
             
-            for i, regla in enumerate(base.reglas):
-                if not all(k in regla.estado for k in ["posicion", "distancia", "accion_impala"]):
-                    problemas.append(f"Regla {i}: Faltan campos obligatorios")
-                
-                if regla.accion not in ACCIONES_LEON:
-                    problemas.append(f"Regla {i}: Acción inválida: {regla.accion}")
-                
-                if regla.resultado not in ["éxito", "fracaso"]:
-                    problemas.append(f"Regla {i}: Resultado inválido: {regla.resultado}")
-            
-            if problemas:
-                print(f"Se encontraron {len(problemas)} problemas:")
-                for p in problemas[:5]:
-                    print(f"  - {p}")
-                if len(problemas) > 5:
-                    print(f"  ... y {len(problemas) - 5} más")
-            else:
-                print("Todas las reglas tienen estructura válida.")
-            
-            print("\nVerificando consistencia...")
-            
-            contradicciones = 0
-            for i, r1 in enumerate(base.reglas):
-                for j, r2 in enumerate(base.reglas[i+1:], i+1):
-                    if r1.estado == r2.estado:
-                        if r1.accion != r2.accion or r1.resultado != r2.resultado:
-                            contradicciones += 1
-            
-            print(f"Reglas contradictorias encontradas: {contradicciones}")
+            archivo = input("\nArchivo para exportar el reporte (Enter para omitir): ").strip()
+            if archivo:
+                base.exportar_validacion(archivo, reporte)
             
             input("\nPresione Enter para continuar...")
         
@@ -538,11 +594,11 @@ def main():
             print(f"  Archivo de conocimiento: {ARCHIVO_CONOCIMIENTO}")
             
             try:
-                base = BaseConocimiento()
+                conocimiento = ConocimientoPerezoso()
                 print(f"\nConocimiento actual:")
-                print(f"  Reglas totales: {len(base.reglas)}")
-                print(f"  Reglas de éxito: {sum(1 for r in base.reglas if r.resultado == 'éxito')}")
-                print(f"  Reglas de fracaso: {sum(1 for r in base.reglas if r.resultado == 'fracaso')}")
+                print(f"  Reglas totales: {conocimiento.total_reglas}")
+                print(f"  Reglas de éxito: {conocimiento.contar_reglas('éxito')}")
+                print(f"  Reglas de fracaso: {conocimiento.contar_reglas('fracaso')}")
             except:
                 print("\nNo se pudo cargar la base de conocimiento")
             
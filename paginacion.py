@@ -0,0 +1,171 @@
+"""
+Listados de reglas por páginas, con filtros, orden y exportación a texto por bloques
+"""
+
+import itertools
+from datetime import datetime
+from indices_conocimiento import confianza_regla
+from config import *
+
+RESULTADOS_FILTRO = {"exito": "éxito", "éxito": "éxito", "fracaso": "fracaso"}
+
+# Claves de orden, de mayor a menor. La confianza es la misma de las explicaciones
+ORDENES_REGLAS = {
+    "confianza": lambda regla: (confianza_regla(regla), regla.contador),
+    "contador": lambda regla: (regla.contador, regla.tasa_exito)
+}
+
+# Reglas cuyo texto se junta en una sola escritura al exportar
+REGLAS_POR_BLOQUE = 1000
+
+
+def acepta_posicion(regla, posicion):
+    """Verifica si la condición de posición de la regla acepta la posición dada"""
+    valor = regla.estado.get("posicion")
+    return valor == posicion or (isinstance(valor, list) and posicion in valor)
+
+
+def filtrar_reglas(reglas_numeradas, filtro=None, accion=None, posicion=None, ordenar=None):
+    """
+    Filtra pares (número, regla). filtro: resultado "exito" o "fracaso";
+    posicion: reglas cuya condición acepta esa posición; ordenar: "confianza"
+    o "contador", de mayor a menor. Sin orden el filtrado es perezoso; para
+    ordenar hay que recorrer todas las reglas
+    """
+    if ordenar is not None and ordenar not in ORDENES_REGLAS:
+        raise ValueError(f"Orden de reglas desconocido: {ordenar}")
+    
+    resultado = RESULTADOS_FILTRO.get(filtro)
+    filtradas = (
+        (numero, regla) for numero, regla in reglas_numeradas
+        if (resultado is None or regla.resultado == resultado) and
+        (accion is None or regla.accion == accion) and
+        (posicion is None or acepta_posicion(regla, posicion))
+    )
+    if ordenar is None:
+        return filtradas
+    
+    # sorted es estable: a igual clave se conserva el orden de la base
+    clave = ORDENES_REGLAS[ordenar]
+    return iter(sorted(filtradas, key=lambda elemento: clave(elemento[1]), reverse=True))
+
+
+class PaginadorReglas:
+    """
+    Páginas de un listado de (número, regla) que se lee bajo demanda.
+    
+    Solo se leen las reglas hasta la página pedida (y una más, para saber si
+    hay página siguiente); las ya leídas se guardan para volver a páginas
+    anteriores sin releer el listado. El texto de cada regla se forma solo
+    al mostrar su página.
+    """
+    
+    def __init__(self, reglas_numeradas, tamaño=None):
+        self.tamaño = tamaño or TAMAÑO_PAGINA_REGLAS
+        self.actual = 0
+        self._pendientes = iter(reglas_numeradas)
+        self._leidas = []
+        self._agotado = False
+    
+    def _leer_hasta(self, cantidad):
+        faltan = cantidad - len(self._leidas)
+        if faltan > 0 and not self._agotado:
+            self._leidas.extend(itertools.islice(self._pendientes, faltan))
+            self._agotado = len(self._leidas) < cantidad
+    
+    def pagina(self, numero):
+        """Reglas de la página indicada (desde 0) como lista de (número, regla)"""
+        if numero < 0:
+            return []
+        inicio = numero * self.tamaño
+        self._leer_hasta(inicio + self.tamaño + 1)
+        return self._leidas[inicio:inicio + self.tamaño]
+    
+    def hay_siguiente(self):
+        fin = (self.actual + 1) * self.tamaño
+        self._leer_hasta(fin + 1)
+        return len(self._leidas) > fin
+    
+    def hay_anterior(self):
+        return self.actual > 0
+    
+    def siguiente(self):
+        """Avanza a la página siguiente, si la hay, y la devuelve"""
+        if self.hay_siguiente():
+            self.actual += 1
+        return self.pagina(self.actual)
+    
+    def anterior(self):
+        """Vuelve a la página anterior, si la hay, y la devuelve"""
+        if self.hay_anterior():
+            self.actual -= 1
+        return self.pagina(self.actual)
+
+
+def texto_pagina(reglas_numeradas):
+    """Líneas de un listado de reglas, como en mostrar_reglas"""
+    return "\n".join(f"{numero:3}. {regla}" for numero, regla in reglas_numeradas)
+
+
+def navegar_paginas(paginador):
+    """Muestra un listado de a una página, con navegación a la página siguiente y a la anterior"""
+    while True:
+        reglas = paginador.pagina(paginador.actual)
+        if not reglas:
+            print("No hay reglas que mostrar.")
+            return
+        print(texto_pagina(reglas))
+        
+        siguiente = paginador.hay_siguiente()
+        anterior = paginador.hay_anterior()
+        if not siguiente and not anterior:
+            return
+        
+        opciones = (["Enter: siguiente"] if siguiente else []) + (["a: anterior"] if anterior else [])
+        comando = input(f"-- Página {paginador.actual + 1}. {', '.join(opciones)}, "
+                        f"q: terminar -- ").strip().lower()
+        if comando == "q":
+            return
+        if comando == "a" and anterior:
+            paginador.anterior()
+        elif comando == "" and siguiente:
+            paginador.siguiente()
+        elif comando == "":
+            return
+
+
+def texto_regla(numero, regla):
+    """Texto de una regla en el formato de exportar_a_texto"""
+    condiciones = "".join(f"    - {clave}: {valor}\n" for clave, valor in regla.estado.items())
+    return (f"\nRegla #{numero}:\n"
+            f"  Condiciones:\n"
+            f"{condiciones}"
+            f"  Acción: {regla.accion}\n"
+            f"  Resultado: {regla.resultado}\n"
+            f"  Confianza: {regla.tasa_exito:.2%} (n={regla.contador})\n"
+            f"  Última actualización: {regla.ultima_actualizacion}\n")
+
+
+def escribir_por_bloques(f, textos, tamaño_bloque=REGLAS_POR_BLOQUE):
+    """Escribe los textos juntando cada bloque en una sola escritura"""
+    textos = iter(textos)
+    while True:
+        bloque = "".join(itertools.islice(textos, tamaño_bloque))
+        if not bloque:
+            break
+        f.write(bloque)
+
+
+def exportar_reglas_texto(archivo_salida, estadisticas, reglas_numeradas):
+    """Exporta estadísticas y reglas a un archivo de texto, leyendo las reglas de a bloques"""
+    with open(archivo_salida, 'w', encoding='utf-8') as f:
+        encabezado = [
+            f"BASE DE CONOCIMIENTO - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n",
+            "=" * 60 + "\n\n",
+            "ESTADÍSTICAS:\n"
+        ]
+        encabezado.extend(f"  {clave}: {valor}\n" for clave, valor in estadisticas.items())
+        encabezado.extend(["\n\nREGLAS:\n", "=" * 60 + "\n"])
+        f.write("".join(encabezado))
+        
+        escribir_por_bloques(f, itertools.starmap(texto_regla, reglas_numeradas))
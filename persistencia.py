@@ -0,0 +1,318 @@
+"""
+Persistencia de la base de conocimiento: escritura atómica y diario de cambios
+"""
+
+import json
+import os
+import threading
+
+
+def escribir_atomico(ruta, escribir, modo='w', encoding='utf-8'):
+    """
+    Escribe un archivo a través de un temporal que luego reemplaza al original.
+    escribir recibe el archivo abierto; si falla, el archivo original no cambia.
+    """
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    
+    temporal = f"{ruta}.tmp"
+    try:
+        with open(temporal, modo, encoding=None if 'b' in modo else encoding) as f:
+            escribir(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.unlink(temporal)
+        raise
+
+
+# Esquemas de los archivos de conocimiento JSON
+ESQUEMA_INSTANTANEA = "instantanea"  # guardar_conocimiento: reglas en la raíz
+ESQUEMA_SEMILLA = "semilla"          # cabecera "sistema" y reglas en conocimiento.reglas
+VERSIONES_SEMILLA = ("1",)           # versiones mayores soportadas de sistema.version
+
+
+def detectar_esquema(data):
+    """Esquema de los datos leídos de un archivo de conocimiento JSON"""
+    if isinstance(data.get("conocimiento"), dict):
+        return ESQUEMA_SEMILLA
+    return ESQUEMA_INSTANTANEA
+
+
+def normalizar_conocimiento(data):
+    """
+    Convierte los datos de cualquier esquema al de guardar_conocimiento.
+    Los identificadores y el historial de cada regla se conservan en su
+    diccionario; from_dict ignora lo que no usa
+    """
+    if detectar_esquema(data) == ESQUEMA_INSTANTANEA:
+        return data
+    
+    version = str(data.get("sistema", {}).get("version", "1.0"))
+    if version.split(".")[0] not in VERSIONES_SEMILLA:
+        raise ValueError(f"Versión de conocimiento semilla no soportada: {version}")
+    
+    conocimiento = data["conocimiento"]
+    metadatos = conocimiento.get("metadatos", {})
+    return {
+        "estadisticas": conocimiento.get("estadisticas", {}),
+        "fecha_guardado": metadatos.get("fecha_guardado"),
+        "total_reglas": len(conocimiento.get("reglas", [])),
+        "generacion": 0,
+        "reglas": conocimiento.get("reglas", [])
+    }
+
+
+class DiarioConocimiento:
+    """
+    Diario de solo agregado con las experiencias posteriores a la última instantánea.
+    
+    Cada línea es un registro JSON compacto. La primera indica la generación
+    de la instantánea a la que pertenece el diario: si no coincide con la de
+    la instantánea (por ejemplo, tras una caída durante la compactación), el
+    diario se ignora. Una última línea incompleta se descarta al leer.
+    """
+    
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.registros = 0
+        self.interrumpido = False
+    
+    def leer(self, generacion):
+        """Devuelve los registros del diario si pertenecen a la generación dada"""
+        self.registros = 0
+        self.interrumpido = False
+        if not os.path.exists(self.ruta):
+            return []
+        
+        registros = []
+        with open(self.ruta, 'r', encoding='utf-8') as f:
+            for numero, linea in enumerate(f):
+                try:
+                    registro = json.loads(linea)
+                except ValueError:
+                    # Escritura interrumpida: lo anterior sigue siendo válido,
+                    # pero hay que compactar antes de volver a agregar
+                    self.interrumpido = True
+                    break
+                
+                if numero == 0:
+                    if registro.get("generacion") != generacion:
+                        return []
+                    continue
+                registros.append(registro)
+        
+        self.registros = len(registros)
+        return registros
+    
+    def agregar(self, registros):
+        """Agrega registros al final del diario y los lleva a disco"""
+        if not registros:
+            return
+        
+        with open(self.ruta, 'a', encoding='utf-8') as f:
+            for registro in registros:
+                f.write(json.dumps(registro, ensure_ascii=False, separators=(',', ':')) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        
+        self.registros += len(registros)
+    
+    def reiniciar(self, generacion):
+        """Vacía el diario para una nueva instantánea"""
+        escribir_atomico(self.ruta, lambda f: f.write(json.dumps({"generacion": generacion}) + "\n"))
+        self.registros = 0
+
+
+class GuardadoSegundoPlano:
+    """
+    Ejecuta escrituras de a una en un hilo aparte.
+    
+    Mientras hay una escritura en curso las nuevas solicitudes no se ejecutan,
+    solo se cuentan: quien guarda vuelve a intentarlo más tarde con el estado
+    más reciente, de modo que las solicitudes superpuestas se unen en una.
+    """
+    
+    def __init__(self):
+        self._hilo = None
+        self.completados = 0
+        self.coalescidos = 0
+        self.error = None
+    
+    def en_curso(self):
+        """Indica si hay una escritura sin terminar"""
+        return self._hilo is not None and self._hilo.is_alive()
+    
+    def iniciar(self, escribir):
+        """Lanza escribir() en segundo plano; False si ya había una escritura en curso"""
+        if self.en_curso():
+            self.coalescidos += 1
+            return False
+        
+        self.error = None
+        self._hilo = threading.Thread(target=self._ejecutar, args=(escribir,), daemon=True)
+        self._hilo.start()
+        return True
+    
+    def _ejecutar(self, escribir):
+        try:
+            escribir()
+            self.completados += 1
+        except Exception as e:
+            self.error = e
+            print(f"\nError al guardar en segundo plano: {e}")
+    
+    def esperar(self):
+        """
+        Espera a que termine la escritura en curso y devuelve su error, si lo
+        hubo. El error se devuelve una sola vez
+        """
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+        error, self.error = self.error, None
+        return error
+
+
+class FlujoJSON:
+    """Decodifica valores JSON consecutivos de un archivo leyéndolo por bloques"""
+    
+    _decodificador = json.JSONDecoder()
+    
+    def __init__(self, archivo, tamaño_bloque):
+        self.archivo = archivo
+        self.tamaño_bloque = tamaño_bloque
+        self.texto = ""
+        self.pos = 0
+        self.agotado = False
+    
+    def _leer_mas(self):
+        bloque = self.archivo.read(self.tamaño_bloque)
+        if not bloque:
+            self.agotado = True
+            return False
+        self.texto = self.texto[self.pos:] + bloque
+        self.pos = 0
+        return True
+    
+    def caracter(self):
+        """Siguiente carácter que no es espacio, sin consumirlo ('' al final del archivo)"""
+        while True:
+            while self.pos < len(self.texto) and self.texto[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.texto):
+                return self.texto[self.pos]
+            if not self._leer_mas():
+                return ""
+    
+    def consumir(self, caracter):
+        """Consume el carácter esperado o lanza ValueError"""
+        if self.caracter() != caracter:
+            raise ValueError(f"JSON inesperado en {self.archivo.name}: se esperaba '{caracter}'")
+        self.pos += 1
+    
+    def valor(self):
+        """Decodifica el siguiente valor completo"""
+        self.caracter()
+        while True:
+            try:
+                valor, fin = self._decodificador.raw_decode(self.texto, self.pos)
+            except json.JSONDecodeError:
+                if not self._leer_mas():
+                    raise
+                continue
+            
+            # Un número al final del bloque puede continuar en el siguiente
+            if fin == len(self.texto) and not self.agotado and self._leer_mas():
+                continue
+            
+            self.pos = fin
+            return valor
+
+
+class LectorConocimientoJSON:
+    """
+    Lee un archivo de conocimiento JSON sin cargarlo completo.
+    
+    La cabecera (estadísticas, total de reglas, fecha y generación) se lee al
+    abrir. guardar_conocimiento la escribe antes de las reglas; en archivos
+    anteriores, con las reglas primero, se busca al final del archivo. Las
+    reglas se decodifican de una en una al iterar.
+    """
+    
+    TAMAÑO_COLA = 1 << 16
+    
+    def __init__(self, ruta, tamaño_bloque=1 << 16):
+        self.ruta = ruta
+        self.tamaño_bloque = tamaño_bloque
+        self.cabecera = self._leer_cabecera()
+    
+    def _claves(self, flujo):
+        """Recorre las claves del objeto principal; quien itera debe consumir cada valor"""
+        flujo.consumir("{")
+        while flujo.caracter() not in ("}", ""):
+            clave = flujo.valor()
+            flujo.consumir(":")
+            yield clave
+            if flujo.caracter() == ",":
+                flujo.pos += 1
+    
+    def _reglas(self, flujo):
+        """Recorre los elementos de la lista de reglas"""
+        flujo.consumir("[")
+        while flujo.caracter() not in ("]", ""):
+            yield flujo.valor()
+            if flujo.caracter() == ",":
+                flujo.pos += 1
+        flujo.consumir("]")
+    
+    def _leer_cabecera(self):
+        cabecera = {}
+        with open(self.ruta, 'r', encoding='utf-8') as f:
+            flujo = FlujoJSON(f, self.tamaño_bloque)
+            for clave in self._claves(flujo):
+                if clave != "reglas":
+                    cabecera[clave] = flujo.valor()
+                    continue
+                
+                if "total_reglas" in cabecera:
+                    break
+                
+                cola = self._leer_cola()
+                if cola is not None:
+                    cabecera.update(cola)
+                    break
+                
+                # Sin cabecera reconocible: se cuentan las reglas recorriéndolas
+                cabecera["total_reglas"] = sum(1 for _ in self._reglas(flujo))
+        return cabecera
+    
+    def _leer_cola(self):
+        """Claves posteriores a la lista de reglas en archivos con las reglas primero"""
+        with open(self.ruta, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - self.TAMAÑO_COLA))
+            cola = f.read().decode('utf-8', errors='ignore')
+        
+        inicio = cola.rfind('"estadisticas"')
+        if inicio == -1:
+            return None
+        
+        try:
+            datos = json.loads("{" + cola[inicio:])
+        except ValueError:
+            return None
+        return datos if "total_reglas" in datos else None
+    
+    def __iter__(self):
+        """Diccionarios de las reglas en el orden del archivo"""
+        with open(self.ruta, 'r', encoding='utf-8') as f:
+            flujo = FlujoJSON(f, self.tamaño_bloque)
+            for clave in self._claves(flujo):
+                if clave == "reglas":
+                    yield from self._reglas(flujo)
+                    return
+                flujo.valor()
\ No newline at end of file
@@ -6,6 +6,7 @@ import time
 import sys
 from simulation import Mundo
 from knowledge_base import BaseConocimiento
+from paginacion import navegar_paginas
 from utils import *
 from config import *
 
@@ -163,11 +164,12 @@ class CaceríaPasoAPaso:
                         print(f"  Confianza: {regla['tasa_exito']:.2%} (n={regla['contador']})")
                         
                         print(f"\nReglas similares en base de conocimiento:")
-                        estado = accion['estado']
-                        similares = self.base.buscar_reglas_coincidentes(estado)
+                        reglas_exito, reglas_fracaso, _ = self.base.explicar_estado(accion['estado'])
+                        aplicada = (regla['estado'], regla['accion'], regla['resultado'])
+                        similares = [r for r in reglas_exito + reglas_fracaso
+                                     if (r.estado, r.accion, r.resultado) != aplicada]
                         for r in similares[:3]:
-                            if r.to_dict() != regla:
-                                print(f"  - {r}")
+                            print(f"  - {r}")
                     else:
                         print(f"\nNo se aplicó ninguna regla específica.")
                         print(f"El león eligió una acción exploratoria.")
@@ -187,13 +189,11 @@ class CaceríaPasoAPaso:
         print(f"\n=== CONOCIMIENTO RELEVANTE PARA ESTADO ACTUAL ===")
         print(f"Estado: {estado}")
         
-        reglas_coincidentes = self.base.buscar_reglas_coincidentes(estado)
+        # Reglas coincidentes y de la misma posición, ordenadas por confianza
+        reglas_exito, reglas_fracaso, reglas_posicion = self.base.explicar_estado(estado)
         
-        if reglas_coincidentes:
-            print(f"\nSe encontraron {len(reglas_coincidentes)} reglas coincidentes:")
-            
-            reglas_exito = [r for r in reglas_coincidentes if r.resultado == "éxito"]
-            reglas_fracaso = [r for r in reglas_coincidentes if r.resultado == "fracaso"]
+        if reglas_exito or reglas_fracaso:
+            print(f"\nSe encontraron {len(reglas_exito) + len(reglas_fracaso)} reglas coincidentes:")
             
             if reglas_exito:
                 print(f"\nReglas de ÉXITO ({len(reglas_exito)}):")
@@ -213,15 +213,6 @@ class CaceríaPasoAPaso:
             print(f"El león debe explorar o usar conocimiento general.")
             
             print(f"\nReglas similares (misma posición):")
-            estado_similar = estado.copy()
-            reglas_posicion = []
-            for regla in self.base.reglas:
-                if "posicion" in regla.estado:
-                    if regla.estado["posicion"] == estado["posicion"] or \
-                       (isinstance(regla.estado["posicion"], list) and 
-                        estado["posicion"] in regla.estado["posicion"]):
-                        reglas_posicion.append(regla)
-            
             if reglas_posicion:
                 for regla in reglas_posicion[:5]:
                     print(f"  - {regla}")
@@ -371,8 +362,8 @@ def modo_paso_a_paso_interactivo():
             print(f"Base de conocimiento cargada: {len(base.reglas)} reglas")
         
         elif opcion == "3":
-            print("\nBase de conocimiento completa:")
-            base.mostrar_reglas()
+            print(f"\nBase de conocimiento completa ({len(base.reglas)} reglas):")
+            navegar_paginas(base.paginar())
             base.mostrar_estadisticas()
         
         elif opcion == "4":
@@ -0,0 +1,165 @@
+"""
+Pruebas unitarias para la base de conocimiento acotada
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unittest
+import tempfile
+import shutil
+import random
+from knowledge_base import BaseConocimiento
+from almacen_acotado import BaseConocimientoAcotada
+
+DOMINIOS = {
+    "posicion": list(range(1, 9)),
+    "distancia": ["muy_cerca", "cerca", "media", "lejos"],
+    "accion_impala": ["ver_izquierda", "ver_derecha", "ver_frente", "beber", None],
+    "león_escondido": [False, True]
+}
+
+def estado_aleatorio(rng):
+    return {clave: rng.choice(dominio) for clave, dominio in DOMINIOS.items()}
+
+class TestBaseConocimientoAcotada(unittest.TestCase):
+    
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.archivo = os.path.join(self.directorio, "knowledge.json")
+    
+    def tearDown(self):
+        shutil.rmtree(self.directorio)
+    
+    def crear(self, capacidad, politica):
+        return BaseConocimientoAcotada(self.archivo, usar_diario=False,
+                                       capacidad_maxima=capacidad, politica_desalojo=politica)
+    
+    def test_capacidad_nunca_se_supera(self):
+        base = self.crear(50, "lfu")
+        rng = random.Random(3)
+        
+        for _ in range(2000):
+            base.agregar_experiencia(estado_aleatorio(rng), rng.choice(["avanzar", "atacar"]),
+                                     rng.choice(["éxito", "fracaso"]))
+            self.assertLessEqual(len(base.reglas), 50)
+        
+        self.assertEqual(base.estadisticas["total_reglas"], len(base.reglas))
+        self.assertEqual(base.estadisticas["reglas_exito"],
+                         sum(1 for r in base.reglas if r.resultado == "éxito"))
+        self.assertEqual(base.estadisticas["reglas_fracaso"],
+                         sum(1 for r in base.reglas if r.resultado == "fracaso"))
+        self.assertGreater(base.desalojadas, 0)
+    
+    def test_lfu_desaloja_menor_contador(self):
+        base = self.crear(2, "lfu")
+        frecuente = {"posicion": 1}
+        base.agregar_experiencia(frecuente, "avanzar", "éxito")
+        base.agregar_experiencia(frecuente, "avanzar", "éxito")
+        base.agregar_experiencia({"posicion": 2}, "avanzar", "éxito")
+        base.agregar_experiencia({"posicion": 3}, "avanzar", "éxito")
+        
+        self.assertEqual([r.estado for r in base.reglas], [{"posicion": 1}, {"posicion": 3}])
+    
+    def test_lru_conserva_reglas_usadas(self):
+        base = self.crear(2, "lru")
+        base.agregar_experiencia({"posicion": 1}, "avanzar", "éxito")
+        base.agregar_experiencia({"posicion": 2}, "avanzar", "éxito")
+        
+        accion, regla = base.obtener_mejor_accion({"posicion": 1})
+        self.assertEqual(accion, "avanzar")
+        base.agregar_experiencia({"posicion": 3}, "avanzar", "éxito")
+        
+        self.assertEqual([r.estado for r in base.reglas], [{"posicion": 1}, {"posicion": 3}])
+    
+    def test_lru_cuenta_cada_actualizacion(self):
+        base = self.crear(2, "lru")
+        base.agregar_experiencia({"posicion": 1}, "avanzar", "éxito")
+        base.agregar_experiencia({"posicion": 2}, "avanzar", "éxito")
+        
+        # Actualizar dos veces la primera regla la deja como la más reciente
+        base.agregar_experiencia({"posicion": 1}, "avanzar", "éxito")
+        base.agregar_experiencia({"posicion": 1}, "avanzar", "éxito")
+        base.agregar_experiencia({"posicion": 3}, "avanzar", "éxito")
+        self.assertEqual([r.estado for r in base.reglas], [{"posicion": 1}, {"posicion": 3}])
+        
+        base.agregar_experiencia({"posicion": 4}, "avanzar", "éxito")
+        self.assertEqual([r.estado for r in base.reglas], [{"posicion": 3}, {"posicion": 4}])
+    
+    def test_confianza_desaloja_menor_evidencia(self):
+        base = self.crear(3, "confianza")
+        for posicion, resultado in ((1, "éxito"), (2, "fracaso")):
+            base.agregar_experiencia({"posicion": posicion}, "avanzar", resultado)
+            base.agregar_experiencia({"posicion": posicion}, "avanzar", resultado)
+        base.agregar_experiencia({"posicion": 3}, "avanzar", "éxito")
+        base.agregar_experiencia({"posicion": 4}, "avanzar", "fracaso")
+        
+        # La regla de fracaso con dos observaciones se conserva; sale la de menos evidencia
+        self.assertEqual([r.estado for r in base.reglas], [{"posicion": 1}, {"posicion": 2}, {"posicion": 4}])
+    
+    def test_base_llena_admite_estados_nuevos(self):
+        for politica in ("lfu", "confianza"):
+            base = self.crear(2, politica)
+            for posicion in (1, 2):
+                for _ in range(3):
+                    base.agregar_experiencia({"posicion": posicion}, "avanzar", "fracaso")
+            
+            base.agregar_experiencia({"posicion": 3}, "atacar", "fracaso")
+            self.assertEqual(len(base.buscar_reglas_coincidentes({"posicion": 3})), 1)
+            
+            # Vista otra vez, la regla nueva se actualiza en lugar de volver a entrar
+            base.agregar_experiencia({"posicion": 3}, "atacar", "fracaso")
+            self.assertEqual([r.contador for r in base.buscar_reglas_coincidentes({"posicion": 3})], [2])
+            self.assertEqual(len(base.reglas), 2)
+    
+    def test_mismas_busquedas_que_base_con_reglas_vigentes(self):
+        base = self.crear(300, "confianza")
+        rng = random.Random(7)
+        for _ in range(3000):
+            estado = {clave: valor for clave, valor in estado_aleatorio(rng).items() if rng.random() < 0.8}
+            base.agregar_experiencia(estado, rng.choice(["avanzar", "esconderse", "atacar"]),
+                                     rng.choice(["éxito", "fracaso"]))
+        
+        referencia = BaseConocimiento(os.path.join(self.directorio, "referencia.json"), usar_diario=False)
+        referencia.reglas = [r.copiar() for r in base.reglas]
+        
+        for _ in range(200):
+            estado = estado_aleatorio(rng)
+            esperadas = [r.to_dict() for r in referencia.buscar_reglas_coincidentes(estado)]
+            obtenidas = [r.to_dict() for r in base.buscar_reglas_coincidentes(estado)]
+            self.assertEqual(obtenidas, esperadas)
+    
+    def test_explicaciones_sin_reglas_desalojadas(self):
+        base = self.crear(2, "lfu")
+        for posicion in (1, 2):
+            base.agregar_experiencia({"posicion": posicion}, "avanzar", "éxito")
+            base.agregar_experiencia({"posicion": posicion}, "avanzar", "éxito")
+        base.explicar_estado({"posicion": 1})
+        
+        for posicion in (3, 4, 3):
+            base.agregar_experiencia({"posicion": posicion}, "avanzar", "éxito")
+            for consulta in range(1, 5):
+                estado = {"posicion": consulta}
+                exito, fracaso, misma_posicion = base.explicar_estado(estado)
+                vigentes = base.buscar_reglas_coincidentes(estado)
+                self.assertTrue(all(r in base.reglas for r in misma_posicion))
+                self.assertEqual(sorted(map(id, exito + fracaso)), sorted(map(id, vigentes)))
+    
+    def test_carga_desaloja_exceso(self):
+        completa = BaseConocimiento(self.archivo, usar_diario=False)
+        for posicion in range(1, 9):
+            for _ in range(posicion):
+                completa.agregar_experiencia({"posicion": posicion}, "avanzar", "éxito")
+        completa.guardar_conocimiento()
+        
+        base = self.crear(3, "lfu")
+        self.assertEqual([r.estado["posicion"] for r in base.reglas], [6, 7, 8])
+        
+        base.guardar_conocimiento()
+        base2 = self.crear(3, "lfu")
+        self.assertEqual([r.to_dict() for r in base2.reglas], [r.to_dict() for r in base.reglas])
+        self.assertEqual(base2.estadisticas["reglas_exito"], 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Pruebas unitarias para el almacenamiento columnar de conocimiento
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unittest
+import tempfile
+import random
+from knowledge_base import ReglaConocimiento, BaseConocimiento
+from almacen_columnar import BaseConocimientoColumnar
+
+DOMINIOS = {
+    "posicion": list(range(1, 9)),
+    "distancia": ["muy_cerca", "cerca", "media", "lejos"],
+    "accion_impala": ["ver_izquierda", "ver_derecha", "ver_frente", "beber", None],
+    "león_escondido": [False, True]
+}
+
+def generar_reglas(cantidad, semilla):
+    rng = random.Random(semilla)
+    reglas = []
+    for _ in range(cantidad):
+        estado = {clave: rng.choice(dominio) for clave, dominio in DOMINIOS.items()
+                  if rng.random() < 0.9}
+        if rng.random() < 0.3:
+            estado["posicion"] = rng.sample(DOMINIOS["posicion"], 3)
+        if rng.random() < 0.05:
+            estado["posicion"] = (2, 5)
+        regla = ReglaConocimiento(estado, rng.choice(["avanzar", "esconderse", "atacar"]),
+                                  rng.choice(["éxito", "fracaso"]), rng.randint(1, 10))
+        regla.tasa_exito = rng.random()
+        reglas.append(regla)
+    return reglas
+
+class TestBaseConocimientoColumnar(unittest.TestCase):
+    
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.archivo = os.path.join(self.directorio, "knowledge.json")
+        self.base = BaseConocimientoColumnar(self.archivo)
+    
+    def tearDown(self):
+        if os.path.exists(self.archivo):
+            os.unlink(self.archivo)
+        os.rmdir(self.directorio)
+    
+    def test_agregar_experiencia(self):
+        estado = {"posicion": 1, "distancia": "cerca"}
+        
+        self.base.agregar_experiencia(estado, "avanzar", "éxito")
+        self.base.agregar_experiencia(estado, "avanzar", "éxito")
+        self.base.agregar_experiencia(estado, "atacar", "fracaso")
+        
+        self.assertEqual(len(self.base.reglas), 2)
+        self.assertEqual(self.base.reglas[0].contador, 2)
+        self.assertEqual(self.base.reglas[1].resultado, "fracaso")
+        self.assertEqual(self.base.estadisticas["reglas_exito"], 1)
+    
+    def test_mismas_decisiones_que_base_en_memoria(self):
+        reglas = generar_reglas(400, 11)
+        
+        base_memoria = BaseConocimiento(self.archivo)
+        base_memoria.reglas = [r.copiar() for r in reglas]
+        self.base.reglas = reglas
+        
+        rng = random.Random(5)
+        for _ in range(200):
+            estado = {clave: rng.choice(dominio) for clave, dominio in DOMINIOS.items()}
+            
+            esperadas = [r.to_dict() for r in base_memoria.buscar_reglas_coincidentes(estado)]
+            obtenidas = [r.to_dict() for r in self.base.buscar_reglas_coincidentes(estado)]
+            self.assertEqual(obtenidas, esperadas)
+            
+            _, mejor_esperada, posibles_esperadas = base_memoria._calcular_analisis(estado)
+            _, mejor, posibles = self.base._calcular_analisis(estado)
+            self.assertEqual(posibles, posibles_esperadas)
+            if mejor_esperada is None:
+                self.assertIsNone(mejor)
+            else:
+                self.assertEqual(mejor.to_dict(), mejor_esperada.to_dict())
+    
+    def test_busquedas_entre_inserciones_con_estados_parciales(self):
+        base_memoria = BaseConocimiento(self.archivo)
+        rng = random.Random(8)
+        for _ in range(300):
+            estado = {clave: rng.choice(dominio) for clave, dominio in DOMINIOS.items() if rng.random() < 0.7}
+            accion, resultado = rng.choice(["avanzar", "atacar"]), rng.choice(["éxito", "fracaso"])
+            base_memoria.agregar_experiencia(estado, accion, resultado)
+            self.base.agregar_experiencia(estado, accion, resultado)
+            
+            consulta = {clave: rng.choice(dominio) for clave, dominio in DOMINIOS.items() if rng.random() < 0.8}
+            # Las dos bases marcan la hora de cada experiencia por separado
+            self.assertEqual([(r.estado, r.accion, r.resultado, r.contador)
+                              for r in self.base.buscar_reglas_coincidentes(consulta)],
+                             [(r.estado, r.accion, r.resultado, r.contador)
+                              for r in base_memoria.buscar_reglas_coincidentes(consulta)])
+    
+    def test_generalizar_y_guardar(self):
+        self.base.agregar_experiencia({"posicion": 1, "distancia": "cerca"}, "avanzar", "éxito")
+        self.base.agregar_experiencia({"posicion": 2, "distancia": "cerca"}, "avanzar", "éxito")
+        
+        self.assertEqual(self.base.generalizar_conocimiento(), 1)
+        self.assertEqual(self.base.reglas[0].estado["posicion"], [1, 2])
+        
+        accion, regla = self.base.obtener_mejor_accion({"posicion": 2, "distancia": "cerca"})
+        self.assertEqual(accion, "avanzar")
+        self.assertEqual(regla.contador, 2)
+        
+        self.base.guardar_conocimiento()
+        base2 = BaseConocimientoColumnar(self.archivo)
+        self.assertEqual([r.to_dict() for r in base2.reglas], [r.to_dict() for r in self.base.reglas])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+"""
+Pruebas unitarias para la base de conocimiento particionada por posición
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unittest
+import tempfile
+import shutil
+import random
+from knowledge_base import BaseConocimiento
+from almacen_particionado import BaseConocimientoParticionada, COMPARTIDA
+
+DOMINIOS = {
+    "posicion": list(range(1, 9)),
+    "distancia": ["muy_cerca", "cerca", "media", "lejos"],
+    "accion_impala": ["ver_izquierda", "ver_derecha", "ver_frente", "beber", None],
+    "león_escondido": [False, True]
+}
+
+def estado_aleatorio(rng):
+    return {clave: rng.choice(dominio) for clave, dominio in DOMINIOS.items()}
+
+class TestBaseConocimientoParticionada(unittest.TestCase):
+    
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.ruta = os.path.join(self.directorio, "particiones")
+        self.base = BaseConocimientoParticionada(self.ruta)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directorio)
+    
+    def test_reglas_en_su_particion(self):
+        self.base.agregar_experiencia({"posicion": 3, "distancia": "cerca"}, "avanzar", "éxito")
+        self.base.agregar_experiencia({"posicion": 3, "distancia": "cerca"}, "avanzar", "éxito")
+        self.base.agregar_experiencia({"posicion": 5}, "atacar", "fracaso")
+        self.base.agregar_experiencia({"distancia": "cerca"}, "esconderse", "éxito")
+        
+        self.assertEqual(len(self.base.particion(3).reglas), 1)
+        self.assertEqual(self.base.particion(3).reglas[0].contador, 2)
+        self.assertEqual(len(self.base.particion(5).reglas), 1)
+        self.assertEqual(len(self.base.particion(COMPARTIDA).reglas), 1)
+        self.assertEqual(self.base.estadisticas["total_reglas"], 3)
+        self.assertEqual(self.base.estadisticas["reglas_exito"], 2)
+    
+    def test_mismas_coincidencias_que_base_sin_particionar(self):
+        rng = random.Random(4)
+        referencia = BaseConocimiento(os.path.join(self.directorio, "referencia.json"), usar_diario=False)
+        for _ in range(1500):
+            estado = {clave: valor for clave, valor in estado_aleatorio(rng).items() if rng.random() < 0.8}
+            accion = rng.choice(["avanzar", "esconderse", "atacar"])
+            resultado = rng.choice(["éxito", "fracaso"])
+            self.base.agregar_experiencia(estado, accion, resultado)
+            referencia.agregar_experiencia(estado, accion, resultado)
+        
+        self.base.generalizar_conocimiento()
+        referencia.reglas = [r.copiar() for r in self.base.reglas]
+        self.assertTrue(any(isinstance(r.estado.get("posicion"), list)
+                            for r in self.base.particion(COMPARTIDA).reglas))
+        
+        for _ in range(200):
+            estado = estado_aleatorio(rng)
+            esperadas = sorted(str(r) for r in referencia.buscar_reglas_coincidentes(estado))
+            obtenidas = sorted(str(r) for r in self.base.buscar_reglas_coincidentes(estado))
+            self.assertEqual(obtenidas, esperadas)
+    
+    def test_guardar_y_cargar(self):
+        rng = random.Random(9)
+        for _ in range(300):
+            self.base.agregar_experiencia(estado_aleatorio(rng), "avanzar", rng.choice(["éxito", "fracaso"]))
+        self.base.guardar_conocimiento()
+        
+        base2 = BaseConocimientoParticionada(self.ruta)
+        self.assertEqual([r.to_dict() for r in base2.reglas], [r.to_dict() for r in self.base.reglas])
+        self.assertEqual(base2.estadisticas, self.base.estadisticas)
+    
+    def test_guardar_solo_reescribe_particiones_modificadas(self):
+        for posicion in range(1, 9):
+            self.base.agregar_experiencia({"posicion": posicion}, "avanzar", "éxito")
+        self.base.guardar_conocimiento()
+        
+        archivos = {p: self.base.particion(p).archivo_conocimiento for p in range(1, 9)}
+        for archivo in archivos.values():
+            os.utime(archivo, (0, 0))
+        
+        self.base.agregar_experiencia({"posicion": 3, "distancia": "cerca"}, "avanzar", "éxito")
+        self.base.guardar_conocimiento()
+        
+        reescritas = [p for p, archivo in archivos.items() if os.path.getmtime(archivo) != 0]
+        self.assertEqual(reescritas, [3])
+    
+    def test_reescribe_todas_solo_tras_un_guardado_fallido(self):
+        def fallar():
+            raise OSError("disco lleno")
+        
+        for posicion in range(1, 5):
+            self.base.agregar_experiencia({"posicion": posicion}, "avanzar", "éxito")
+        self.base.guardar_conocimiento()
+        self.base._guardado.iniciar(fallar)
+        
+        archivos = {p: self.base.particion(p).archivo_conocimiento for p in range(1, 5)}
+        reescritas = []
+        for _ in range(2):
+            for archivo in archivos.values():
+                os.utime(archivo, (0, 0))
+            self.base.agregar_experiencia({"posicion": 2, "distancia": "cerca"}, "avanzar", "éxito")
+            self.base.guardar_conocimiento()
+            reescritas.append([p for p, archivo in archivos.items() if os.path.getmtime(archivo) != 0])
+        
+        self.assertEqual(reescritas, [[1, 2, 3, 4], [2]])
+    
+    def test_cargar_particion(self):
+        self.base.agregar_experiencia({"posicion": 2}, "avanzar", "éxito")
+        self.base.agregar_experiencia({"posicion": 4}, "avanzar", "éxito")
+        self.base.guardar_conocimiento()
+        
+        otra = BaseConocimientoParticionada(self.ruta)
+        otra.agregar_experiencia({"posicion": 4, "distancia": "lejos"}, "atacar", "fracaso")
+        otra.guardar_conocimiento()
+        
+        self.base.cargar_particion(4)
+        self.assertEqual(len(self.base.particion(4).reglas), 2)
+        self.assertEqual(self.base.estadisticas["total_reglas"], 3)
+        self.assertEqual(self.base.estadisticas["reglas_fracaso"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
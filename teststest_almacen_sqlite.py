@@ -0,0 +1,91 @@
+"""
+Pruebas unitarias para el almacenamiento de conocimiento en SQLite
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unittest
+import tempfile
+from knowledge_base import ReglaConocimiento, BaseConocimiento
+from almacen_sqlite import BaseConocimientoSQLite
+
+class TestBaseConocimientoSQLite(unittest.TestCase):
+    
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.archivo = os.path.join(self.directorio, "knowledge.db")
+        self.base = BaseConocimientoSQLite(self.archivo)
+    
+    def tearDown(self):
+        self.base.cerrar()
+        for nombre in os.listdir(self.directorio):
+            os.unlink(os.path.join(self.directorio, nombre))
+        os.rmdir(self.directorio)
+    
+    def test_agregar_experiencia(self):
+        estado = {"posicion": 1, "distancia": "cerca", "accion_impala": None}
+        
+        self.base.agregar_experiencia(estado, "avanzar", "éxito")
+        self.base.agregar_experiencia(dict(estado), "avanzar", "éxito")
+        self.base.agregar_experiencia(estado, "atacar", "fracaso")
+        
+        self.assertEqual(len(self.base.reglas), 2)
+        self.assertEqual(self.base.reglas[0].contador, 2)
+        self.assertEqual(self.base.reglas[-1].accion, "atacar")
+        self.assertEqual(self.base.contar_reglas("fracaso"), 1)
+    
+    def test_buscar_igual_que_base_en_memoria(self):
+        reglas = [
+            ReglaConocimiento({"posicion": 1, "distancia": "cerca"}, "avanzar", "éxito"),
+            ReglaConocimiento({"posicion": [1, 2], "distancia": "cerca"}, "atacar", "éxito"),
+            ReglaConocimiento({"distancia": "cerca"}, "esconderse", "fracaso"),
+            ReglaConocimiento({"posicion": 1, "accion_impala": None}, "avanzar", "éxito"),
+            ReglaConocimiento({"posicion": 1, "león_escondido": True}, "atacar", "fracaso"),
+            ReglaConocimiento({"posicion": (1, 3)}, "avanzar", "éxito")
+        ]
+        memoria = BaseConocimiento(os.path.join(self.directorio, "knowledge.json"))
+        memoria.reglas = reglas
+        self.base.reglas = reglas
+        
+        for estado in ({"posicion": 1, "distancia": "cerca", "accion_impala": None, "león_escondido": True},
+                       {"posicion": 2, "distancia": "cerca", "accion_impala": "beber", "león_escondido": False},
+                       {"distancia": "cerca"}):
+            self.assertEqual([r.to_dict() for r in self.base.buscar_reglas_coincidentes(estado)],
+                             [r.to_dict() for r in memoria.buscar_reglas_coincidentes(estado)])
+    
+    def test_transaccion(self):
+        with self.base.transaccion():
+            self.base.agregar_experiencia({"posicion": 1}, "avanzar", "éxito")
+            self.base.agregar_experiencia({"posicion": 2}, "avanzar", "éxito")
+        
+        with self.assertRaises(KeyError):
+            with self.base.transaccion():
+                self.base.agregar_experiencia({"posicion": 3}, "avanzar", "éxito")
+                raise KeyError("incursión interrumpida")
+        
+        self.assertEqual(len(self.base.reglas), 2)
+        self.assertEqual(len(list(self.base.reglas)), 2)
+        self.assertEqual(self.base.contar_reglas("éxito"), 2)
+        self.base.verificar_estadisticas()
+    
+    def test_persistencia_y_generalizacion(self):
+        self.base.agregar_experiencia({"posicion": 1, "distancia": "cerca"}, "avanzar", "éxito")
+        self.base.agregar_experiencia({"posicion": 2, "distancia": "cerca"}, "avanzar", "éxito")
+        self.assertEqual(self.base.generalizar_conocimiento(), 1)
+        self.base.guardar_conocimiento()
+        self.base.cerrar()
+        
+        self.base = BaseConocimientoSQLite(self.archivo)
+        self.assertEqual(len(self.base.reglas), 1)
+        self.assertEqual(self.base.reglas[0].estado["posicion"], [1, 2])
+        # Las dos reglas unidas cuentan como una sola regla de éxito
+        self.assertEqual(self.base.estadisticas["reglas_exito"], 1)
+        self.assertEqual(self.base.contar_reglas(), 1)
+        
+        accion, regla = self.base.obtener_mejor_accion({"posicion": 2, "distancia": "cerca"})
+        self.assertEqual(accion, "avanzar")
+
+if __name__ == '__main__':
+    unittest.main()
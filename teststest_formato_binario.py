@@ -0,0 +1,138 @@
+"""
+Pruebas unitarias para el formato binario de la base de conocimiento
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unittest
+import tempfile
+import json
+from knowledge_base import ReglaConocimiento, BaseConocimiento, HistorialResultados
+from formato_binario import LectorBinario, codificar_instantanea, json_a_binario, binario_a_json
+from almacen_mapeado import BaseConocimientoMapeada
+
+class TestFormatoBinario(unittest.TestCase):
+    
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        
+        self.reglas = [
+            ReglaConocimiento({"posicion": 1, "distancia": "cerca"}, "avanzar", "éxito", 3),
+            ReglaConocimiento({"posicion": [2, 3], "distancia": "cerca"}, "atacar", "fracaso", 2),
+            ReglaConocimiento({"posicion": 1, "distancia": "cerca"}, "esconderse", "éxito"),
+            ReglaConocimiento({"accion_impala": None, "león_escondido": True}, "avanzar", "éxito")
+        ]
+        self.reglas[0].tasa_exito = 0.75
+        self.reglas[0].historial = HistorialResultados.desde_resultados([True, False, True])
+        self.reglas[3].ultima_actualizacion = "2024-01-15T10:30:00Z"
+    
+    def tearDown(self):
+        for nombre in os.listdir(self.directorio):
+            os.unlink(os.path.join(self.directorio, nombre))
+        os.rmdir(self.directorio)
+    
+    def ruta(self, nombre):
+        return os.path.join(self.directorio, nombre)
+    
+    def test_guardar_cargar_binario(self):
+        base = BaseConocimiento(self.ruta("knowledge.kbin"))
+        base.reglas = list(self.reglas)
+        base.estadisticas["consultas_totales"] = 7
+        base.guardar_conocimiento()
+        
+        base2 = BaseConocimiento(self.ruta("knowledge.kbin"))
+        self.assertEqual([r.to_dict() for r in base2.reglas], [r.to_dict() for r in self.reglas])
+        self.assertEqual(base2.estadisticas["consultas_totales"], 7)
+        self.assertIs(base2.reglas[0].estado, base2.reglas[2].estado)
+    
+    def test_conversion_con_json(self):
+        base = BaseConocimiento(self.ruta("knowledge.json"))
+        base.reglas = list(self.reglas)
+        base.guardar_conocimiento()
+        
+        self.assertEqual(json_a_binario(self.ruta("knowledge.json"), self.ruta("knowledge.kbin")), 4)
+        self.assertEqual(binario_a_json(self.ruta("knowledge.kbin"), self.ruta("copia.json")), 4)
+        
+        with open(self.ruta("knowledge.json"), 'r', encoding='utf-8') as f:
+            original = json.load(f)
+        with open(self.ruta("copia.json"), 'r', encoding='utf-8') as f:
+            copia = json.load(f)
+        
+        self.assertEqual(copia["reglas"], original["reglas"])
+        self.assertEqual(copia["estadisticas"], original["estadisticas"])
+        self.assertEqual(copia["generacion"], original["generacion"])
+        self.assertEqual(list(copia), list(original))
+        self.assertEqual(copia["reglas_por_resultado"], {"éxito": 3, "fracaso": 1})
+        
+        lector = LectorBinario.abrir(self.ruta("knowledge.kbin"))
+        self.assertEqual(lector.metadatos["reglas_por_resultado"], {"éxito": 3, "fracaso": 1})
+    
+    def test_lectura_por_registro(self):
+        lector = LectorBinario(codificar_instantanea(self.reglas, {"total_reglas": 4}))
+        
+        self.assertEqual(lector.num_reglas, 4)
+        self.assertEqual(lector.estadisticas, {"total_reglas": 4})
+        
+        estado, accion, resultado, contador, tasa_exito, _, historial = lector.regla(1)
+        self.assertEqual(estado, {"posicion": [2, 3], "distancia": "cerca"})
+        self.assertEqual((accion, resultado, contador, tasa_exito), ("atacar", "fracaso", 2, 0.0))
+        self.assertIsNone(historial)
+        self.assertEqual(lector.regla(0)[6], "101")
+        self.assertEqual(lector.regla(3)[5], "2024-01-15T10:30:00Z")
+        
+        with self.assertRaises(IndexError):
+            lector.regla(4)
+    
+    def test_archivo_no_binario(self):
+        with self.assertRaises(ValueError):
+            LectorBinario(b"{}" * 40)
+    
+    def test_base_mapeada_igual_que_base_cargada(self):
+        base = BaseConocimiento(self.ruta("knowledge.kbin"))
+        base.reglas = list(self.reglas)
+        base.guardar_conocimiento()
+        base = BaseConocimiento(self.ruta("knowledge.kbin"))
+        
+        mapeada = BaseConocimientoMapeada(self.ruta("knowledge.kbin"))
+        self.assertEqual(len(mapeada.reglas), 4)
+        self.assertEqual(mapeada.reglas[-1].to_dict(), self.reglas[3].to_dict())
+        
+        for estado in ({"posicion": 1, "distancia": "cerca"}, {"posicion": 3, "distancia": "cerca"},
+                       {"accion_impala": None, "león_escondido": True}, {"posicion": 5}):
+            self.assertEqual([r.to_dict() for r in mapeada.buscar_reglas_coincidentes(estado)],
+                             [r.to_dict() for r in base.buscar_reglas_coincidentes(estado)])
+        
+        accion, regla = mapeada.obtener_mejor_accion({"posicion": 1, "distancia": "cerca"})
+        self.assertEqual(accion, "avanzar")
+        self.assertEqual(regla.contador, 3)
+        
+        with self.assertRaises(RuntimeError):
+            mapeada.agregar_experiencia({"posicion": 1}, "avanzar", "éxito")
+        
+        # Las reglas decodificadas se reutilizan hasta volver a mapear el archivo
+        estado = {"posicion": 1, "distancia": "cerca"}
+        self.assertIs(mapeada.buscar_reglas_coincidentes(estado)[0], regla)
+        mapeada.cargar_conocimiento()
+        self.assertIsNot(mapeada.buscar_reglas_coincidentes(estado)[0], regla)
+        mapeada.cerrar()
+    
+    def test_base_mapeada_requiere_binario(self):
+        with self.assertRaises(ValueError):
+            BaseConocimientoMapeada(self.ruta("knowledge.json"))
+    
+    def test_base_mapeada_rechaza_diario_pendiente(self):
+        base = BaseConocimiento(self.ruta("knowledge.kbin"), usar_diario=True)
+        base.agregar_experiencia({"posicion": 1}, "avanzar", "éxito")
+        base.guardar_conocimiento()
+        BaseConocimientoMapeada(self.ruta("knowledge.kbin")).cerrar()
+        
+        base.agregar_experiencia({"posicion": 2}, "avanzar", "éxito")
+        base.guardar_conocimiento()
+        self.assertEqual(base.diario.registros, 2)
+        with self.assertRaises(ValueError):
+            BaseConocimientoMapeada(self.ruta("knowledge.kbin"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,7 +9,13 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import unittest
 import tempfile
 import json
-from knowledge_base import ReglaConocimiento, BaseConocimiento
+import random
+import threading
+from knowledge_base import ReglaConocimiento, BaseConocimiento, HistorialResultados, combinar_archivos
+from indices_conocimiento import IndiceCoincidencias, MotorBitset, MOTORES_COINCIDENCIAS
+from carga_perezosa import ConocimientoPerezoso
+from persistencia import GuardadoSegundoPlano, LectorConocimientoJSON
+from formato_binario import json_a_binario
 
 class TestReglaConocimiento(unittest.TestCase):
     
@@ -75,6 +81,14 @@ class TestReglaConocimiento(unittest.TestCase):
         self.assertIn("ver_izquierda", regla_unida.estado["accion_impala"])
         self.assertIn("ver_derecha", regla_unida.estado["accion_impala"])
     
+    def test_unir_reglas_generalizadas(self):
+        regla1 = ReglaConocimiento({"posicion": [1, 2], "distancia": "cerca"}, "avanzar", "éxito")
+        regla2 = ReglaConocimiento({"posicion": [2, 3], "distancia": "cerca"}, "avanzar", "éxito")
+        
+        regla_unida = regla1.unir_con(regla2)
+        
+        self.assertEqual(regla_unida.estado["posicion"], [1, 2, 3])
+    
     def test_serializacion(self):
         estado = {"posicion": 1, "distancia": "cerca"}
         regla = ReglaConocimiento(estado, "avanzar", "éxito", 5)
@@ -95,6 +109,68 @@ class TestReglaConocimiento(unittest.TestCase):
         self.assertEqual(regla2.resultado, regla.resultado)
         self.assertEqual(regla2.contador, regla.contador)
         self.assertEqual(regla2.tasa_exito, regla.tasa_exito)
+    
+    
+    def test_representacion_compacta(self):
+        regla1 = ReglaConocimiento({"posicion": 1, "distancia": "cerca"}, "avanzar", "éxito")
+        regla2 = ReglaConocimiento({"posicion": 1, "distancia": "cerca"}, "atacar", "fracaso")
+        
+        self.assertFalse(hasattr(regla1, "__dict__"))
+        self.assertIs(regla1.estado, regla2.estado)
+    
+    def test_fecha_actualizacion(self):
+        regla = ReglaConocimiento({"posicion": 1}, "avanzar", "éxito")
+        
+        regla.ultima_actualizacion = "2024-01-15T10:31:00"
+        self.assertEqual(regla.to_dict()["ultima_actualizacion"], "2024-01-15T10:31:00")
+        
+        regla.ultima_actualizacion = "2024-01-15T10:31:00Z"
+        self.assertEqual(regla.to_dict()["ultima_actualizacion"], "2024-01-15T10:31:00Z")
+        
+        regla.actualizar("éxito")
+        self.assertGreater(regla.ultima_actualizacion, "2024-01-15T10:31:00Z")
+
+
+class TestHistorialResultados(unittest.TestCase):
+    
+    def test_buffer_circular(self):
+        historial = HistorialResultados(capacidad=4)
+        for exito in [False, False, True, True, False, True]:
+            historial.agregar(exito)
+        
+        self.assertEqual(len(historial), 4)
+        self.assertEqual(list(historial), [True, True, False, True])
+        self.assertEqual(historial.codificar(), "1101")
+        self.assertAlmostEqual(historial.tasa_exito(), 0.75)
+        self.assertAlmostEqual(historial.tasa_exito(ventana=2), 0.5)
+        self.assertIsNone(HistorialResultados(capacidad=4).tasa_exito())
+        self.assertIsNone(HistorialResultados.desde_resultados([True], capacidad=0))
+    
+    def test_tasa_reciente_de_la_regla(self):
+        regla = ReglaConocimiento({"posicion": 1}, "avanzar", "éxito")
+        self.assertIsNone(regla.historial)
+        self.assertEqual(regla.tasa_reciente(), 1.0)
+        
+        for resultado in ["éxito", "fracaso", "fracaso", "fracaso"]:
+            regla.actualizar(resultado)
+        
+        self.assertEqual(regla.historial.codificar(), "11000")
+        self.assertAlmostEqual(regla.tasa_reciente(ventana=3), 0.0)
+        self.assertAlmostEqual(regla.tasa_reciente(), regla.tasa_exito)
+        
+        copia = ReglaConocimiento.from_dict(regla.to_dict())
+        self.assertEqual(copia.historial.codificar(), "11000")
+        copia.actualizar("éxito")
+        self.assertEqual(regla.historial.codificar(), "11000")
+    
+    def test_historial_de_la_semilla(self):
+        regla = ReglaConocimiento.from_dict({
+            "estado": {"posicion": 3}, "accion": "avanzar", "resultado": "éxito",
+            "contador": 3, "tasa_exito": 0.67, "ultima_actualizacion": "2024-01-15T10:31:00Z",
+            "historial": [{"fecha": "2024-01-15T10:31:00Z", "resultado": "éxito"},
+                          {"fecha": "2024-01-15T10:31:30Z", "resultado": "fracaso"}]
+        })
+        self.assertEqual(regla.historial.codificar(), "10")
 
 
 class TestBaseConocimiento(unittest.TestCase):
@@ -128,6 +204,36 @@ class TestBaseConocimiento(unittest.TestCase):
         self.assertEqual(len(self.base.reglas), 1)
         self.assertEqual(self.base.reglas[0].contador, 2)
     
+    def test_agregar_experiencia_sigue_cambio_de_resultado(self):
+        estado = {"posicion": 1, "distancia": "cerca"}
+        regla = ReglaConocimiento(estado, "avanzar", "fracaso", 5)
+        regla.tasa_exito = 1.0
+        with open(self.temp_file.name, 'w', encoding='utf-8') as f:
+            json.dump({"reglas": [regla.to_dict()]}, f)
+        
+        base = BaseConocimiento(self.temp_file.name)
+        base.agregar_experiencia(dict(estado), "avanzar", "fracaso")
+        self.assertEqual(base.reglas[0].resultado, "éxito")
+        
+        base.agregar_experiencia(dict(estado), "avanzar", "éxito")
+        self.assertEqual(len(base.reglas), 1)
+        self.assertEqual(base.reglas[0].contador, 7)
+        
+        base.agregar_experiencia(dict(estado), "avanzar", "fracaso")
+        self.assertEqual(len(base.reglas), 2)
+    
+    def test_agregar_experiencia_tras_generalizar(self):
+        self.base.agregar_experiencia({"posicion": 1, "distancia": "cerca"}, "avanzar", "éxito")
+        self.base.agregar_experiencia({"posicion": 2, "distancia": "cerca"}, "avanzar", "éxito")
+        self.base.generalizar_conocimiento()
+        
+        self.base.agregar_experiencia({"posicion": [1, 2], "distancia": "cerca"}, "avanzar", "éxito")
+        self.assertEqual(len(self.base.reglas), 1)
+        self.assertEqual(self.base.reglas[0].contador, 3)
+        
+        self.base.agregar_experiencia({"posicion": 1, "distancia": "cerca"}, "avanzar", "éxito")
+        self.assertEqual(len(self.base.reglas), 2)
+    
     def test_buscar_reglas_coincidentes(self):
         self.base.agregar_experiencia(
             {"posicion": 1, "distancia": "cerca", "accion_impala": "ver_izquierda"},
@@ -164,6 +270,31 @@ class TestBaseConocimiento(unittest.TestCase):
         self.assertIn(accion, ["avanzar", "esconderse", "atacar"])
         self.assertIsNone(regla)
     
+    def test_cache_decisiones(self):
+        estado = {"posicion": 1, "distancia": "cerca"}
+        self.base.agregar_experiencia(estado, "avanzar", "éxito")
+        
+        for _ in range(3):
+            accion, _ = self.base.obtener_mejor_accion(dict(estado), exploracion=0.0)
+            self.assertEqual(accion, "avanzar")
+        
+        self.assertEqual(self.base.cache_decisiones.fallos, 1)
+        self.assertEqual(self.base.cache_decisiones.aciertos, 2)
+        self.assertEqual(self.base.estadisticas["aciertos"], 3)
+    
+    def test_cache_decisiones_se_invalida_al_cambiar_reglas(self):
+        estado = {"posicion": 1, "distancia": "cerca"}
+        self.base.agregar_experiencia(estado, "avanzar", "éxito")
+        self.base.obtener_mejor_accion(estado, exploracion=0.0)
+        
+        for _ in range(3):
+            self.base.agregar_experiencia(estado, "atacar", "éxito")
+        
+        accion, regla = self.base.obtener_mejor_accion(estado, exploracion=0.0)
+        self.assertEqual(accion, "atacar")
+        self.assertEqual(regla.contador, 3)
+        self.assertEqual(self.base.cache_decisiones.fallos, 2)
+    
     def test_generalizar_conocimiento(self):
         self.base.agregar_experiencia(
             {"posicion": 1, "distancia": "cerca", "accion_impala": "ver_izquierda"},
@@ -185,6 +316,71 @@ class TestBaseConocimiento(unittest.TestCase):
         self.assertIn("ver_izquierda", regla_generalizada.estado["accion_impala"])
         self.assertIn("ver_derecha", regla_generalizada.estado["accion_impala"])
     
+    def test_generalizar_igual_que_comparacion_por_pares(self):
+        rng = random.Random(3)
+        dominios = {
+            "posicion": [1, 2, 3],
+            "distancia": ["cerca", "media"],
+            "accion_impala": ["beber", None],
+            "león_escondido": [False, True]
+        }
+        
+        reglas = []
+        for _ in range(300):
+            estado = {clave: rng.choice(dominio) for clave, dominio in dominios.items()
+                      if rng.random() < 0.9}
+            if rng.random() < 0.2:
+                estado["posicion"] = rng.sample(dominios["posicion"], 2)
+            regla = ReglaConocimiento(estado, rng.choice(["avanzar", "atacar"]),
+                                      rng.choice(["éxito", "fracaso"]), rng.randint(1, 4))
+            reglas.append(regla)
+        
+        esperadas = []
+        procesadas = set()
+        for i, regla1 in enumerate(reglas):
+            if i in procesadas:
+                continue
+            procesadas.add(i)
+            for j in range(i + 1, len(reglas)):
+                if j not in procesadas and regla1.puede_unirse_con(reglas[j]):
+                    procesadas.add(j)
+                    regla1 = regla1.unir_con(reglas[j])
+                    break
+            esperadas.append(regla1.to_dict())
+        cambios_esperados = len(reglas) - len(esperadas)
+        
+        self.base.reglas = reglas
+        cambios = self.base.generalizar_conocimiento()
+        
+        self.assertEqual(cambios, cambios_esperados)
+        depuradas = [d for d in esperadas
+                     if d["contador"] >= 2 or d["tasa_exito"] >= 0.2]
+        self.assertEqual([r.to_dict() for r in self.base.reglas], depuradas)
+        self.base.verificar_estadisticas()
+    
+    def test_generalizar_hasta_punto_fijo(self):
+        for posicion in [1, 2, 3, 4]:
+            self.base.agregar_experiencia({"posicion": posicion, "distancia": "cerca"}, "avanzar", "éxito")
+        
+        cambios = self.base.generalizar_conocimiento(hasta_punto_fijo=True)
+        
+        self.assertEqual(cambios, 3)
+        self.assertEqual(len(self.base.reglas), 1)
+        self.assertEqual(sorted(self.base.reglas[0].estado["posicion"]), [1, 2, 3, 4])
+        self.assertEqual(self.base.reglas[0].contador, 4)
+        
+        coincidentes = self.base.buscar_reglas_coincidentes({"posicion": 3, "distancia": "cerca"})
+        self.assertEqual(coincidentes, self.base.reglas)
+    
+    def test_generalizar_una_ronda(self):
+        for posicion in [1, 2, 3, 4]:
+            self.base.agregar_experiencia({"posicion": posicion, "distancia": "cerca"}, "avanzar", "éxito")
+        
+        cambios = self.base.generalizar_conocimiento(hasta_punto_fijo=False)
+        
+        self.assertEqual(cambios, 2)
+        self.assertEqual([r.estado["posicion"] for r in self.base.reglas], [[1, 2], [3, 4]])
+    
     def test_guardar_cargar_conocimiento(self):
         self.base.agregar_experiencia({"posicion": 1}, "avanzar", "éxito")
         self.base.agregar_experiencia({"posicion": 2}, "esconderse", "fracaso")
@@ -196,6 +392,21 @@ class TestBaseConocimiento(unittest.TestCase):
         self.assertEqual(len(base2.reglas), len(self.base.reglas))
         self.assertEqual(base2.estadisticas["total_reglas"], self.base.estadisticas["total_reglas"])
     
+    def test_cambio_de_resultado_conserva_orden_del_grupo(self):
+        estado = {"posicion": 1, "distancia": "cerca"}
+        primera = ReglaConocimiento.desde_campos(estado, "atacar", "fracaso", 2, 1.0, 0)
+        segunda = ReglaConocimiento.desde_campos(estado, "atacar", "éxito", 5, 0.6, 0)
+        tercera = ReglaConocimiento.desde_campos(estado, "atacar", "éxito", 5, 0.6, 0)
+        self.base.reglas = [primera, segunda, tercera]
+        nueva = self.base._insertar_regla(ReglaConocimiento.desde_campos(estado, "atacar", "éxito", 5, 0.6, 0))
+        
+        # La primera regla pasa a éxito y entra al grupo antes que las demás
+        self.base._actualizar_regla(primera, "éxito")
+        self.assertEqual(primera.resultado, "éxito")
+        self.assertEqual(self.base._indice_exacto[self.base._clave_exacta(estado, "atacar", "éxito")],
+                         [primera, segunda, tercera, nueva])
+        self.assertIs(self.base._buscar_regla_exacta(estado, "atacar", "éxito"), primera)
+    
     def test_exportar_a_texto(self):
         self.base.agregar_experiencia({"posicion": 1}, "avanzar", "éxito")
         
@@ -210,5 +421,817 @@ class TestBaseConocimiento(unittest.TestCase):
         
         os.unlink(temp_txt.name)
 
+class TestIndiceCoincidencias(unittest.TestCase):
+    
+    DOMINIOS = {
+        "posicion": list(range(1, 9)),
+        "distancia": ["muy_cerca", "cerca", "media", "lejos"],
+        "accion_impala": ["ver_izquierda", "ver_derecha", "ver_frente", "beber", None],
+        "león_escondido": [False, True]
+    }
+    
+    def generar_regla(self, rng):
+        estado = {}
+        for clave, dominio in self.DOMINIOS.items():
+            tipo = rng.random()
+            if tipo < 0.15:
+                continue
+            elif tipo < 0.6:
+                estado[clave] = rng.choice(dominio)
+            elif tipo < 0.9 or clave != "posicion":
+                estado[clave] = rng.sample(dominio, 2)
+            else:
+                inicio = rng.randint(1, 6)
+                estado[clave] = (inicio, inicio + 2)
+        return ReglaConocimiento(estado, rng.choice(["avanzar", "esconderse", "atacar"]), "éxito")
+    
+    def test_coincide_igual_que_recorrido_lineal(self):
+        for nombre, motor in MOTORES_COINCIDENCIAS.items():
+            with self.subTest(motor=nombre):
+                rng = random.Random(7)
+                reglas = [self.generar_regla(rng) for _ in range(500)]
+                indice = motor(reglas)
+                
+                for _ in range(200):
+                    estado = {clave: rng.choice(dominio) for clave, dominio in self.DOMINIOS.items()}
+                    if rng.random() < 0.2:
+                        del estado["distancia"]
+                    esperadas = [r for r in reglas if r.coincide_con_estado(estado)]
+                    self.assertEqual(indice.buscar(estado), esperadas)
+    
+    def test_regla_sin_condiciones_coincide_siempre(self):
+        regla = ReglaConocimiento({}, "avanzar", "éxito")
+        
+        self.assertEqual(IndiceCoincidencias([regla]).buscar({"posicion": 3}), [regla])
+        self.assertEqual(MotorBitset([regla]).buscar({"posicion": 3}), [regla])
+    
+    def test_valor_no_hashable_en_consulta(self):
+        regla = ReglaConocimiento({"posicion": 1}, "avanzar", "éxito")
+        
+        self.assertEqual(IndiceCoincidencias([regla]).buscar({"posicion": [1]}), [])
+        self.assertEqual(MotorBitset([regla]).buscar({"posicion": [1]}), [])
+    
+    def test_base_con_motor_bitset(self):
+        temp = tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False)
+        temp.close()
+        os.unlink(temp.name)
+        
+        base = BaseConocimiento(temp.name, motor_coincidencias="bitset")
+        base.agregar_experiencia({"posicion": 1, "distancia": "cerca"}, "avanzar", "éxito")
+        base.agregar_experiencia({"posicion": 2, "distancia": "cerca"}, "avanzar", "éxito")
+        base.generalizar_conocimiento()
+        
+        coincidentes = base.buscar_reglas_coincidentes({"posicion": 2, "distancia": "cerca"})
+        self.assertEqual(len(coincidentes), 1)
+        self.assertEqual(coincidentes[0].estado["posicion"], [1, 2])
+        
+        with self.assertRaises(ValueError):
+            BaseConocimiento(temp.name, motor_coincidencias="desconocido")
+
+
+
+class TestDiarioConocimiento(unittest.TestCase):
+    
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.archivo = os.path.join(self.directorio, "knowledge.json")
+    
+    def tearDown(self):
+        for nombre in os.listdir(self.directorio):
+            os.unlink(os.path.join(self.directorio, nombre))
+        os.rmdir(self.directorio)
+    
+    def test_guardar_agrega_solo_experiencias_nuevas(self):
+        base = BaseConocimiento(self.archivo, usar_diario=True)
+        base.agregar_experiencia({"posicion": 1}, "avanzar", "éxito")
+        base.guardar_conocimiento()
+        
+        base.agregar_experiencia({"posicion": 1}, "avanzar", "éxito")
+        base.agregar_experiencia({"posicion": 2}, "atacar", "fracaso")
+        base.obtener_mejor_accion({"posicion": 1})
+        base.guardar_conocimiento()
+        
+        with open(self.archivo, 'r', encoding='utf-8') as f:
+            self.assertEqual(json.load(f)["total_reglas"], 1)
+        self.assertEqual(base.diario.registros, 3)
+        
+        base2 = BaseConocimiento(self.archivo, usar_diario=True)
+        self.assertEqual([r.to_dict() for r in base2.reglas], [r.to_dict() for r in base.reglas])
+        self.assertEqual(base2.estadisticas, base.estadisticas)
+    
+    def test_compactar_tras_generalizar(self):
+        base = BaseConocimiento(self.archivo, usar_diario=True)
+        base.agregar_experiencia({"posicion": 1, "distancia": "cerca"}, "avanzar", "éxito")
+        base.guardar_conocimiento()
+        base.agregar_experiencia({"posicion": 2, "distancia": "cerca"}, "avanzar", "éxito")
+        base.guardar_conocimiento()
+        
+        base.generalizar_conocimiento()
+        base.guardar_conocimiento()
+        self.assertEqual(base.diario.registros, 0)
+        
+        base2 = BaseConocimiento(self.archivo, usar_diario=True)
+        self.assertEqual([r.to_dict() for r in base2.reglas], [r.to_dict() for r in base.reglas])
+    
+    def test_diario_interrumpido_o_de_otra_generacion(self):
+        base = BaseConocimiento(self.archivo, usar_diario=True)
+        base.agregar_experiencia({"posicion": 1}, "avanzar", "éxito")
+        base.guardar_conocimiento()
+        base.agregar_experiencia({"posicion": 2}, "avanzar", "éxito")
+        base.guardar_conocimiento()
+        
+        with open(base.diario.ruta, 'a', encoding='utf-8') as f:
+            f.write('{"estado": {"posic')
+        
+        base2 = BaseConocimiento(self.archivo, usar_diario=True)
+        self.assertEqual(len(base2.reglas), 2)
+        self.assertTrue(base2._compactar_diario)
+        
+        # Un diario de una instantánea anterior no se aplica
+        with open(base.diario.ruta, 'w', encoding='utf-8') as f:
+            f.write('{"generacion": 0}\n')
+            f.write(json.dumps({"estado": {"posicion": 3}, "accion": "atacar",
+                                "resultado": "éxito", "actualizacion": 0}) + "\n")
+        
+        base3 = BaseConocimiento(self.archivo, usar_diario=True)
+        self.assertEqual(len(base3.reglas), 1)
+
+
+
+class TestGuardadoSegundoPlano(unittest.TestCase):
+    
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.archivo = os.path.join(self.directorio, "knowledge.json")
+    
+    def tearDown(self):
+        for nombre in os.listdir(self.directorio):
+            os.unlink(os.path.join(self.directorio, nombre))
+        os.rmdir(self.directorio)
+    
+    def test_solicitudes_superpuestas_se_unen(self):
+        guardado = GuardadoSegundoPlano()
+        liberar = threading.Event()
+        escrituras = []
+        
+        self.assertTrue(guardado.iniciar(lambda: (liberar.wait(), escrituras.append(1))))
+        self.assertFalse(guardado.iniciar(lambda: escrituras.append(2)))
+        self.assertTrue(guardado.en_curso())
+        
+        liberar.set()
+        self.assertIsNone(guardado.esperar())
+        self.assertEqual(escrituras, [1])
+        self.assertEqual((guardado.completados, guardado.coalescidos), (1, 1))
+    
+    def test_error_se_informa_una_vez(self):
+        def fallar():
+            raise OSError("disco lleno")
+        
+        base = BaseConocimiento(self.archivo, usar_diario=True)
+        base.agregar_experiencia({"posicion": 1}, "avanzar", "éxito")
+        base.guardar_conocimiento()
+        base._guardado.iniciar(fallar)
+        self.assertIsInstance(base.esperar_guardado(), OSError)
+        self.assertIsNone(base._guardado.esperar())
+        
+        # Solo el guardado siguiente al error reescribe la instantánea completa
+        base.agregar_experiencia({"posicion": 2}, "avanzar", "éxito")
+        base.guardar_conocimiento()
+        self.assertEqual(base.diario.registros, 0)
+        for posicion in (3, 4):
+            base.agregar_experiencia({"posicion": posicion}, "avanzar", "éxito")
+            base.guardar_conocimiento()
+        self.assertEqual(base.diario.registros, 4)
+    
+    def test_guarda_el_estado_del_momento_de_la_solicitud(self):
+        base = BaseConocimiento(self.archivo)
+        base.agregar_experiencia({"posicion": 1}, "avanzar", "éxito")
+        esperado = [r.to_dict() for r in base.reglas]
+        
+        base.guardar_conocimiento(en_segundo_plano=True)
+        base.agregar_experiencia({"posicion": 1}, "avanzar", "éxito")
+        base.agregar_experiencia({"posicion": 2}, "atacar", "fracaso")
+        base.esperar_guardado()
+        
+        self.assertEqual([r.to_dict() for r in BaseConocimiento(self.archivo).reglas], esperado)
+        
+        # El guardado normal espera al que está en curso y escribe el estado actual
+        base.guardar_conocimiento(en_segundo_plano=True)
+        base.agregar_experiencia({"posicion": 3}, "atacar", "éxito")
+        base.guardar_conocimiento()
+        self.assertEqual([r.to_dict() for r in BaseConocimiento(self.archivo).reglas],
+                         [r.to_dict() for r in base.reglas])
+    
+    def test_con_diario(self):
+        base = BaseConocimiento(self.archivo, usar_diario=True)
+        base.guardar_conocimiento()
+        base.agregar_experiencia({"posicion": 1}, "avanzar", "éxito")
+        base.guardar_conocimiento(en_segundo_plano=True)
+        base.agregar_experiencia({"posicion": 2}, "atacar", "fracaso")
+        base.guardar_conocimiento(en_segundo_plano=True)
+        base.guardar_conocimiento()
+        
+        base2 = BaseConocimiento(self.archivo, usar_diario=True)
+        self.assertEqual([r.to_dict() for r in base2.reglas], [r.to_dict() for r in base.reglas])
+        self.assertEqual(base2.estadisticas, base.estadisticas)
+
+
+class TestValidacionConocimiento(unittest.TestCase):
+    
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.base = BaseConocimiento(os.path.join(self.directorio, "knowledge.json"))
+    
+    def tearDown(self):
+        for nombre in os.listdir(self.directorio):
+            os.unlink(os.path.join(self.directorio, nombre))
+        os.rmdir(self.directorio)
+    
+    def test_contradicciones_como_comparacion_por_pares(self):
+        rng = random.Random(3)
+        reglas = []
+        for _ in range(300):
+            estado = {"posicion": rng.choice([1, 2, [1, 2]]), "distancia": rng.choice(["cerca", "lejos"]),
+                      "accion_impala": "beber"}
+            reglas.append(ReglaConocimiento(estado, rng.choice(["avanzar", "atacar"]),
+                                            rng.choice(["éxito", "fracaso"])))
+        self.base.reglas = reglas
+        
+        esperado = 0
+        for i, r1 in enumerate(reglas):
+            for r2 in reglas[i + 1:]:
+                if r1.estado == r2.estado and (r1.accion != r2.accion or r1.resultado != r2.resultado):
+                    esperado += 1
+        
+        reporte = self.base.validar_conocimiento()
+        self.assertEqual(reporte["pares_contradictorios"], esperado)
+        self.assertEqual(reporte["estados_distintos"], 6)
+        self.assertEqual(sum(len(c["reglas"]) for c in reporte["contradicciones"]), 300)
+    
+    def test_reglas_mal_formadas(self):
+        completo = {"posicion": 1, "distancia": "cerca", "accion_impala": "beber"}
+        self.base.reglas = [
+            ReglaConocimiento(completo, "avanzar", "éxito"),
+            ReglaConocimiento({"posicion": 1}, "volar", "éxito"),
+            ReglaConocimiento(completo, "avanzar", "empate", 0),
+            ReglaConocimiento(completo, "avanzar", "éxito")
+        ]
+        
+        reporte = self.base.validar_conocimiento()
+        tipos = sorted((p["regla"], p["tipo"]) for p in reporte["problemas"])
+        self.assertEqual(tipos, [(2, "accion_invalida"), (2, "campos_faltantes"),
+                                 (3, "contador_invalido"), (3, "resultado_invalido")])
+        self.assertEqual(reporte["reglas_validas"], 2)
+        self.assertEqual(reporte["pares_contradictorios"], 2)
+        self.assertEqual(reporte["contradicciones"][0]["reglas"], [1, 3, 4])
+        
+        archivo = os.path.join(self.directorio, "validacion.json")
+        self.base.exportar_validacion(archivo, reporte)
+        with open(archivo, 'r', encoding='utf-8') as f:
+            exportado = json.load(f)
+        self.assertEqual(exportado["problemas"], reporte["problemas"])
+        self.assertEqual(exportado["pares_contradictorios"], 2)
+
+
+class TestConocimientoSemilla(unittest.TestCase):
+    
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.archivo = os.path.join(self.directorio, "knowledge.json")
+        self.semilla = os.path.join(self.directorio, "semilla.json")
+        self.datos_semilla = {
+            "sistema": {"version": "1.0", "descripcion": "Semilla de prueba"},
+            "conocimiento": {
+                "reglas": [
+                    {"id": "regla_001", "estado": {"posicion": 3, "distancia": "lejos"},
+                     "accion": "avanzar", "resultado": "éxito", "contador": 12, "tasa_exito": 0.9,
+                     "ultima_actualizacion": "2024-01-15T10:31:00Z",
+                     "historial": [{"fecha": "2024-01-15T10:31:00Z", "resultado": "éxito"}]},
+                    {"id": "regla_002", "estado": {"posicion": [3, 4], "distancia": "cerca"},
+                     "accion": "atacar", "resultado": "fracaso", "contador": 3, "tasa_exito": 0.0,
+                     "ultima_actualizacion": "2024-01-15T10:36:00Z", "nota": "Generalizada"}
+                ],
+                "estadisticas": {"total_reglas": 2, "consultas_totales": 20, "aciertos": 15},
+                "metadatos": {"fecha_guardado": "2024-01-15T10:40:00Z"}
+            },
+            "notas": {}
+        }
+        self._escribir(self.semilla, self.datos_semilla)
+    
+    def tearDown(self):
+        for nombre in os.listdir(self.directorio):
+            os.unlink(os.path.join(self.directorio, nombre))
+        os.rmdir(self.directorio)
+    
+    def _escribir(self, archivo, datos):
+        with open(archivo, 'w', encoding='utf-8') as f:
+            json.dump(datos, f, ensure_ascii=False)
+    
+    def test_cargar_semilla(self):
+        base = BaseConocimiento(self.semilla)
+        self.assertEqual(len(base.reglas), 2)
+        self.assertEqual(base.reglas[1].estado["posicion"], [3, 4])
+        self.assertEqual(base.estadisticas["consultas_totales"], 20)
+        
+        accion, _ = base.obtener_mejor_accion({"posicion": 3, "distancia": "lejos"})
+        self.assertEqual(accion, "avanzar")
+        
+        conocimiento = ConocimientoPerezoso(self.semilla)
+        self.assertEqual(conocimiento.total_reglas, 2)
+        self.assertEqual(conocimiento.contar_reglas("fracaso"), 1)
+    
+    def test_convertir_semilla_a_binario(self):
+        binario = os.path.join(self.directorio, "knowledge.kbin")
+        self.assertEqual(json_a_binario(self.semilla, binario), 2)
+        
+        base = BaseConocimiento(binario)
+        self.assertEqual([r.to_dict() for r in base.reglas],
+                         [r.to_dict() for r in BaseConocimiento(self.semilla).reglas])
+        self.assertEqual(base.estadisticas["consultas_totales"], 20)
+    
+    def test_version_no_soportada(self):
+        self.datos_semilla["sistema"]["version"] = "2.0"
+        self._escribir(self.semilla, self.datos_semilla)
+        
+        base = BaseConocimiento(self.semilla)
+        self.assertEqual(len(base.reglas), 0)
+    
+    def test_importar_acumula_reglas_existentes(self):
+        base = BaseConocimiento(self.archivo)
+        for _ in range(4):
+            base.agregar_experiencia({"posicion": 3, "distancia": "lejos"}, "avanzar", "éxito")
+        base.agregar_experiencia({"posicion": 1}, "esconderse", "éxito")
+        
+        self.assertEqual(base.importar_conocimiento(self.semilla), 1)
+        self.assertEqual(len(base.reglas), 3)
+        
+        regla = base.buscar_reglas_coincidentes({"posicion": 3, "distancia": "lejos"})[0]
+        self.assertEqual(regla.contador, 16)
+        self.assertAlmostEqual(regla.tasa_exito, (4 * 1.0 + 12 * 0.9) / 16)
+        self.assertEqual(len(base.buscar_reglas_coincidentes({"posicion": 4, "distancia": "cerca"})), 1)
+        
+        base.guardar_conocimiento()
+        base2 = BaseConocimiento(self.archivo)
+        self.assertEqual([r.to_dict() for r in base2.reglas], [r.to_dict() for r in base.reglas])
+
+
+class TestCombinarBases(unittest.TestCase):
+    
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        for nombre in os.listdir(self.directorio):
+            os.unlink(os.path.join(self.directorio, nombre))
+        os.rmdir(self.directorio)
+    
+    def _base(self, nombre):
+        return BaseConocimiento(os.path.join(self.directorio, nombre), usar_diario=False)
+    
+    def test_igual_que_entrenar_con_todas_las_experiencias(self):
+        rng = random.Random(8)
+        partes = []
+        for _ in range(3):
+            partes.append([({"posicion": rng.randint(1, 4), "distancia": rng.choice(["cerca", "lejos"])},
+                            rng.choice(["avanzar", "atacar"]), rng.choice(["éxito", "fracaso"]))
+                           for _ in range(200)])
+        
+        bases = []
+        referencia = self._base("referencia.json")
+        for i, experiencias in enumerate(partes):
+            base = self._base(f"parte_{i}.json")
+            for experiencia in experiencias:
+                base.agregar_experiencia(*experiencia)
+                referencia.agregar_experiencia(*experiencia)
+            base.estadisticas["consultas_totales"] = 10
+            base.estadisticas["aciertos"] = 4
+            bases.append(base)
+        
+        combinada = self._base("combinada.json")
+        combinada.combinar_bases(bases)
+        
+        clave = lambda r: (str(r.estado), r.accion, r.resultado, r.contador, round(r.tasa_exito, 9))
+        self.assertEqual(sorted(map(clave, combinada.reglas)), sorted(map(clave, referencia.reglas)))
+        self.assertEqual(combinada.estadisticas["total_reglas"], len(referencia.reglas))
+        self.assertEqual(combinada.estadisticas["reglas_exito"], referencia.estadisticas["reglas_exito"])
+        self.assertEqual(combinada.estadisticas["consultas_totales"], 30)
+        self.assertEqual(combinada.estadisticas["aciertos"], 12)
+        
+        # Las bases originales no cambian
+        self.assertEqual(sum(r.contador for r in bases[0].reglas), 200)
+    
+    def test_tasa_ponderada_y_resultado_derivado(self):
+        estado = {"posicion": 2, "distancia": "cerca"}
+        primera = self._base("primera.json")
+        primera.importar_reglas([ReglaConocimiento.desde_campos(estado, "atacar", "éxito", 2, 0.5, 0)])
+        segunda = self._base("segunda.json")
+        segunda.importar_reglas([ReglaConocimiento.desde_campos(estado, "atacar", "éxito", 6, 0.0, 0)])
+        
+        combinada = self._base("combinada.json")
+        self.assertEqual(combinada.combinar_bases([primera, segunda]), 1)
+        
+        regla = combinada.reglas[0]
+        self.assertEqual(regla.contador, 8)
+        self.assertAlmostEqual(regla.tasa_exito, 1 / 8)
+        self.assertEqual(regla.resultado, "fracaso")
+        self.assertEqual(combinada.estadisticas["reglas_fracaso"], 1)
+        self.assertIs(combinada._buscar_regla_exacta(estado, "atacar", "fracaso"), regla)
+        self.assertEqual(primera.reglas[0].resultado, "éxito")
+    
+    def test_combinar_archivos(self):
+        archivos = []
+        for i in range(3):
+            base = self._base(f"parte_{i}.json")
+            base.agregar_experiencia({"posicion": 1}, "avanzar", "éxito")
+            base.agregar_experiencia({"posicion": i + 2}, "esconderse", "fracaso")
+            base.guardar_conocimiento()
+            archivos.append(base.archivo_conocimiento)
+        
+        destino = os.path.join(self.directorio, "combinada.json")
+        combinar_archivos(archivos, destino)
+        
+        base = self._base("combinada.json")
+        self.assertEqual(len(base.reglas), 4)
+        self.assertEqual(base.reglas[0].contador, 3)
+
+
+class TestInstantaneaConocimiento(unittest.TestCase):
+    
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        for nombre in os.listdir(self.directorio):
+            os.unlink(os.path.join(self.directorio, nombre))
+        os.rmdir(self.directorio)
+    
+    def _entrenar(self, base, semilla, cantidad):
+        rng = random.Random(semilla)
+        for _ in range(cantidad):
+            estado = {"posicion": rng.randint(1, 4), "distancia": rng.choice(["cerca", "lejos"]),
+                      "accion_impala": rng.choice(["beber", "ver_frente"])}
+            base.agregar_experiencia(estado, rng.choice(["avanzar", "atacar"]), rng.choice(["éxito", "fracaso"]))
+    
+    def test_no_ve_cambios_posteriores(self):
+        for motor in MOTORES_COINCIDENCIAS:
+            base = BaseConocimiento(os.path.join(self.directorio, f"{motor}.json"), motor, usar_diario=False)
+            self._entrenar(base, 1, 300)
+            
+            instantanea = base.instantanea()
+            esperadas = {}
+            estados = [{"posicion": p, "distancia": d, "accion_impala": "beber"}
+                       for p in range(1, 6) for d in ["cerca", "lejos"]]
+            for estado in estados:
+                esperadas[str(estado)] = [r.to_dict() for r in base.buscar_reglas_coincidentes(estado)]
+            
+            self._entrenar(base, 2, 300)
+            base.agregar_experiencia({"posicion": 5, "distancia": "cerca"}, "avanzar", "éxito")
+            base.generalizar_conocimiento()
+            
+            for estado in estados:
+                obtenidas = [r.to_dict() for r in instantanea.buscar_reglas_coincidentes(estado)]
+                self.assertEqual(obtenidas, esperadas[str(estado)], motor)
+    
+    def test_no_modifica_estadisticas_de_la_base(self):
+        base = BaseConocimiento(os.path.join(self.directorio, "knowledge.json"), usar_diario=False)
+        base.agregar_experiencia({"posicion": 1}, "avanzar", "éxito")
+        estadisticas = dict(base.estadisticas)
+        
+        instantanea = base.instantanea()
+        accion, regla = instantanea.obtener_mejor_accion({"posicion": 1})
+        self.assertEqual(accion, "avanzar")
+        self.assertEqual(regla.contador, 1)
+        self.assertEqual(instantanea.estadisticas, {"consultas_totales": 1, "aciertos": 1})
+        self.assertEqual(base.estadisticas, estadisticas)
+    
+    def test_comparte_reglas_hasta_modificarlas(self):
+        base = BaseConocimiento(os.path.join(self.directorio, "knowledge.json"), usar_diario=False)
+        base.agregar_experiencia({"posicion": 1}, "avanzar", "éxito")
+        base.agregar_experiencia({"posicion": 2}, "avanzar", "éxito")
+        
+        instantanea = base.instantanea()
+        self.assertIs(instantanea.buscar_reglas_coincidentes({"posicion": 2})[0], base.reglas[1])
+        
+        base.agregar_experiencia({"posicion": 1}, "avanzar", "éxito")
+        anterior = instantanea.buscar_reglas_coincidentes({"posicion": 1})[0]
+        self.assertIsNot(anterior, base.reglas[0])
+        self.assertEqual(anterior.contador, 1)
+        self.assertEqual(base.reglas[0].contador, 2)
+        self.assertEqual(len(instantanea._anteriores), 1)
+
+
+class TestExplicaciones(unittest.TestCase):
+    
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        for nombre in os.listdir(self.directorio):
+            os.unlink(os.path.join(self.directorio, nombre))
+        os.rmdir(self.directorio)
+    
+    def _confianza(self, regla):
+        tasa = regla.tasa_exito if regla.resultado == "éxito" else 1 - regla.tasa_exito
+        return tasa * regla.contador
+    
+    def _esperada(self, base, estado):
+        """Explicación recorriendo todas las reglas"""
+        confianza = self._confianza
+        coincidentes = [r for r in base.reglas if r.coincide_con_estado(estado)]
+        posicion = [r for r in base.reglas if "posicion" in r.estado and
+                    (r.estado["posicion"] == estado["posicion"] or
+                     (isinstance(r.estado["posicion"], list) and estado["posicion"] in r.estado["posicion"]))]
+        return tuple(sorted(reglas, key=confianza, reverse=True) for reglas in (
+            [r for r in coincidentes if r.resultado == "éxito"],
+            [r for r in coincidentes if r.resultado == "fracaso"],
+            posicion))
+    
+    def _comparar(self, base, estados):
+        for estado in estados:
+            obtenida = base.explicar_estado(estado)
+            esperada = self._esperada(base, estado)
+            for reglas_obtenidas, reglas_esperadas in zip(obtenida, esperada):
+                # Mismas reglas y mismo orden de confianza (los empates pueden quedar en otro orden)
+                self.assertEqual(sorted(map(id, reglas_obtenidas)), sorted(map(id, reglas_esperadas)))
+                self.assertEqual(list(map(self._confianza, reglas_obtenidas)),
+                                 list(map(self._confianza, reglas_esperadas)))
+    
+    def test_se_mantiene_al_agregar_experiencias(self):
+        rng = random.Random(12)
+        estados = [{"posicion": p, "distancia": d, "accion_impala": "beber"}
+                   for p in range(1, 5) for d in ["cerca", "lejos"]]
+        for motor in MOTORES_COINCIDENCIAS:
+            base = BaseConocimiento(os.path.join(self.directorio, f"{motor}.json"), motor, usar_diario=False)
+            for paso in range(600):
+                estado = {"posicion": rng.randint(1, 4), "distancia": rng.choice(["cerca", "lejos"])}
+                if rng.random() < 0.3:
+                    del estado["distancia"]
+                base.agregar_experiencia(estado, rng.choice(["avanzar", "atacar"]), rng.choice(["éxito", "fracaso"]))
+                if paso % 50 == 0:
+                    self._comparar(base, estados)
+            
+            # Las experiencias siguientes no reconstruyen el índice
+            indice = base._explicaciones
+            base.agregar_experiencia({"posicion": 2}, "avanzar", "éxito")
+            self.assertIs(base._explicaciones, indice)
+            self._comparar(base, estados)
+    
+    def test_se_reconstruye_tras_generalizar(self):
+        base = BaseConocimiento(os.path.join(self.directorio, "knowledge.json"), usar_diario=False)
+        for posicion in range(1, 5):
+            base.agregar_experiencia({"posicion": posicion, "distancia": "cerca"}, "avanzar", "éxito")
+        estados = [{"posicion": p, "distancia": "cerca"} for p in range(1, 6)]
+        self._comparar(base, estados)
+        
+        base.generalizar_conocimiento()
+        self.assertTrue(any(isinstance(r.estado["posicion"], list) for r in base.reglas))
+        self._comparar(base, estados)
+
+
+class TestDeltaConocimiento(unittest.TestCase):
+    
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.anterior = os.path.join(self.directorio, "anterior.json")
+    
+    def tearDown(self):
+        for nombre in os.listdir(self.directorio):
+            os.unlink(os.path.join(self.directorio, nombre))
+        os.rmdir(self.directorio)
+    
+    def _entrenar(self, base, semilla, cantidad):
+        rng = random.Random(semilla)
+        for _ in range(cantidad):
+            estado = {"posicion": rng.randint(1, 4), "distancia": rng.choice(["cerca", "lejos", "media"]),
+                      "accion_impala": rng.choice(["beber", "ver_frente"])}
+            base.agregar_experiencia(estado, rng.choice(["avanzar", "atacar"]), rng.choice(["éxito", "fracaso"]))
+    
+    def _checkpoints(self, cambiar):
+        """Guarda un checkpoint anterior y devuelve la base cambiada y la que parte del checkpoint"""
+        base = BaseConocimiento(self.anterior, usar_diario=False)
+        self._entrenar(base, 1, 400)
+        base.guardar_conocimiento()
+        cambiar(base)
+        return base, BaseConocimiento(self.anterior, usar_diario=False)
+    
+    def _assert_iguales(self, base, otra):
+        self.assertEqual([r.to_dict() for r in otra.reglas], [r.to_dict() for r in base.reglas])
+        self.assertEqual(otra.estadisticas, base.estadisticas)
+    
+    def test_reproduce_checkpoint_nuevo(self):
+        nueva, anterior = self._checkpoints(lambda base: self._entrenar(base, 2, 300))
+        
+        archivo_delta = os.path.join(self.directorio, "delta.json")
+        delta = nueva.exportar_delta(self.anterior, archivo_delta)
+        self.assertTrue(delta["actualizadas"])
+        
+        anterior.importar_delta(archivo_delta)
+        self._assert_iguales(nueva, anterior)
+        
+        # Las búsquedas usan los índices reconstruidos
+        estado = {"posicion": 2, "distancia": "cerca", "accion_impala": "beber"}
+        self.assertEqual([r.to_dict() for r in anterior.buscar_reglas_coincidentes(estado)],
+                         [r.to_dict() for r in nueva.buscar_reglas_coincidentes(estado)])
+    
+    def test_reproduce_generalizacion(self):
+        nueva, anterior = self._checkpoints(lambda base: base.generalizar_conocimiento())
+        
+        delta = nueva.calcular_delta(anterior)
+        self.assertTrue(delta["eliminadas"])
+        anterior.aplicar_delta(json.loads(json.dumps(delta)))
+        self._assert_iguales(nueva, anterior)
+    
+    def test_tamano_sigue_a_los_cambios(self):
+        def cambiar(base):
+            base.agregar_experiencia({"posicion": 9}, "avanzar", "éxito")
+            base.agregar_experiencia(base.reglas[0].estado, base.reglas[0].accion, base.reglas[0].resultado)
+        nueva, anterior = self._checkpoints(cambiar)
+        
+        delta = nueva.calcular_delta(anterior)
+        self.assertEqual(len(delta["agregadas"]), 1)
+        self.assertEqual(delta["eliminadas"], [])
+        self.assertEqual([posicion for posicion, _ in delta["actualizadas"]], [0])
+        self.assertNotIn("orden", delta)
+    
+    def test_rechaza_otra_base(self):
+        nueva, anterior = self._checkpoints(lambda base: self._entrenar(base, 2, 50))
+        delta = nueva.calcular_delta(anterior)
+        
+        self._entrenar(anterior, 3, 10)
+        with self.assertRaises(ValueError):
+            anterior.aplicar_delta(delta)
+
+
+class TestEstadisticasConocimiento(unittest.TestCase):
+    
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.archivo = os.path.join(self.directorio, "conocimiento.json")
+        self.base = BaseConocimiento(self.archivo, usar_diario=False)
+    
+    def tearDown(self):
+        for nombre in os.listdir(self.directorio):
+            os.unlink(os.path.join(self.directorio, nombre))
+        os.rmdir(self.directorio)
+    
+    def _entrenar(self, base, semilla, cantidad):
+        rng = random.Random(semilla)
+        for _ in range(cantidad):
+            estado = {"posicion": rng.randint(1, 4), "distancia": rng.choice(["cerca", "lejos", "media"])}
+            base.agregar_experiencia(estado, rng.choice(["avanzar", "atacar"]), rng.choice(["éxito", "fracaso"]))
+    
+    def test_conteos_exactos_en_cada_cambio(self):
+        self._entrenar(self.base, 1, 300)
+        self.base.verificar_estadisticas()
+        
+        self.base.generalizar_conocimiento()
+        self.base.verificar_estadisticas()
+        
+        self.base.depurar_conocimiento(umbral_contador=3, umbral_tasa=0.5)
+        self.base.verificar_estadisticas()
+        
+        otra = BaseConocimiento(os.path.join(self.directorio, "otra.json"), usar_diario=False)
+        self._entrenar(otra, 2, 200)
+        self.base.combinar_bases([otra])
+        self.base.verificar_estadisticas()
+        
+        self.base.guardar_conocimiento()
+        cargada = BaseConocimiento(self.archivo, usar_diario=False)
+        self.assertEqual(cargada.estadisticas, self.base.estadisticas)
+        self.assertEqual(cargada.contar_reglas("éxito") + cargada.contar_reglas("fracaso"),
+                         cargada.contar_reglas())
+    
+    def test_cambio_de_resultado_mueve_el_conteo(self):
+        # Regla importada sin derivar su resultado: la próxima observación lo corrige
+        regla = ReglaConocimiento({"posicion": 1}, "avanzar", "fracaso")
+        regla.contador, regla.tasa_exito = 9, 0.8
+        self.base.importar_reglas([regla])
+        self.assertEqual(self.base.contar_reglas("fracaso"), 1)
+        
+        self.base.agregar_experiencia({"posicion": 1}, "avanzar", "fracaso")
+        self.assertEqual(self.base.reglas[0].resultado, "éxito")
+        self.assertEqual(self.base.contar_reglas("éxito"), 1)
+        self.assertEqual(self.base.contar_reglas("fracaso"), 0)
+        self.base.verificar_estadisticas()
+    
+    def test_asignar_reglas_rehace_indices_y_conteos(self):
+        otra = BaseConocimiento(os.path.join(self.directorio, "otra.json"), usar_diario=False)
+        self._entrenar(otra, 4, 100)
+        
+        self.base.reglas = [r.copiar() for r in otra.reglas]
+        self.assertEqual(self.base.estadisticas["total_reglas"], len(otra.reglas))
+        self.base.verificar_estadisticas()
+        
+        estado = otra.reglas[0].estado
+        self.assertEqual([r.to_dict() for r in self.base.buscar_reglas_coincidentes(estado)],
+                         [r.to_dict() for r in otra.buscar_reglas_coincidentes(estado)])
+    
+    def test_detecta_conteos_desincronizados(self):
+        self._entrenar(self.base, 3, 20)
+        self.base.estadisticas["reglas_exito"] += 1
+        with self.assertRaises(RuntimeError):
+            self.base.verificar_estadisticas()
+
+
+class TestConocimientoPerezoso(unittest.TestCase):
+    
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.archivo = os.path.join(self.directorio, "knowledge.json")
+        
+        self.base = BaseConocimiento(self.archivo)
+        for posicion in range(1, 8):
+            self.base.agregar_experiencia({"posicion": posicion}, "avanzar",
+                                          "éxito" if posicion % 3 else "fracaso")
+        self.base.guardar_conocimiento()
+    
+    def tearDown(self):
+        for nombre in os.listdir(self.directorio):
+            os.unlink(os.path.join(self.directorio, nombre))
+        os.rmdir(self.directorio)
+    
+    def test_cabecera_y_conteos(self):
+        conocimiento = ConocimientoPerezoso(self.archivo)
+        
+        self.assertEqual(conocimiento.total_reglas, 7)
+        self.assertEqual(conocimiento.contar_reglas("éxito"), 5)
+        self.assertEqual(conocimiento.contar_reglas("fracaso"), 2)
+        self.assertEqual(conocimiento.estadisticas, self.base.estadisticas)
+    
+    def test_paginas(self):
+        conocimiento = ConocimientoPerezoso(self.archivo)
+        
+        pagina = conocimiento.pagina(1, tamaño=3)
+        self.assertEqual([n for n, _ in pagina], [4, 5, 6])
+        self.assertEqual(pagina[0][1].to_dict(), self.base.reglas[3].to_dict())
+        
+        fracasos = conocimiento.pagina(0, tamaño=3, filtro="fracaso")
+        self.assertEqual([n for n, _ in fracasos], [3, 6])
+    
+    def test_paginador_siguiente_y_anterior(self):
+        paginador = ConocimientoPerezoso(self.archivo).paginar(tamaño=3)
+        
+        self.assertFalse(paginador.hay_anterior())
+        self.assertEqual([n for n, _ in paginador.siguiente()], [4, 5, 6])
+        self.assertEqual([n for n, _ in paginador.siguiente()], [7])
+        self.assertFalse(paginador.hay_siguiente())
+        self.assertEqual([n for n, _ in paginador.siguiente()], [7])
+        self.assertEqual([n for n, _ in paginador.anterior()], [4, 5, 6])
+    
+    def test_filtros_y_orden(self):
+        self.base.agregar_experiencia({"posicion": 2}, "avanzar", "éxito")
+        self.base.agregar_experiencia({"posicion": 2}, "avanzar", "éxito")
+        self.base.agregar_experiencia({"posicion": [1, 2]}, "atacar", "éxito")
+        
+        por_posicion = self.base.iterar_reglas(posicion=2)
+        self.assertEqual([n for n, _ in por_posicion], [2, 8])
+        por_accion = self.base.iterar_reglas("exito", accion="atacar")
+        self.assertEqual([n for n, _ in por_accion], [8])
+        por_contador = self.base.paginar(ordenar="contador", tamaño=2).pagina(0)
+        self.assertEqual([(n, r.contador) for n, r in por_contador], [(2, 3), (1, 1)])
+        
+        # Una regla de fracaso confiable va primero, igual que en las explicaciones
+        for _ in range(3):
+            self.base.agregar_experiencia({"posicion": 3}, "avanzar", "fracaso")
+        por_confianza = self.base.paginar(ordenar="confianza", tamaño=2).pagina(0)
+        self.assertEqual([(n, r.resultado) for n, r in por_confianza], [(3, "fracaso"), (2, "éxito")])
+        with self.assertRaises(ValueError):
+            self.base.iterar_reglas(ordenar="fecha")
+    
+    def test_exportar_a_texto_sin_cargar(self):
+        archivo_texto = os.path.join(self.directorio, "conocimiento.txt")
+        ConocimientoPerezoso(self.archivo).exportar_a_texto(archivo_texto, filtro="fracaso")
+        
+        with open(archivo_texto, 'r', encoding='utf-8') as f:
+            texto = f.read()
+        regla = self.base.reglas[2]
+        self.assertIn(f"\nRegla #3:\n  Condiciones:\n    - posicion: 3\n  Acción: avanzar\n"
+                      f"  Resultado: fracaso\n  Confianza: 0.00% (n=1)\n"
+                      f"  Última actualización: {regla.ultima_actualizacion}\n", texto)
+        self.assertEqual(texto.count("Regla #"), 2)
+    
+    def test_archivo_con_reglas_primero(self):
+        with open(self.archivo, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        anterior = {"reglas": data.pop("reglas")}
+        anterior.update(data)
+        with open(self.archivo, 'w', encoding='utf-8') as f:
+            json.dump(anterior, f, indent=2, ensure_ascii=False)
+        
+        lector = LectorConocimientoJSON(self.archivo, tamaño_bloque=16)
+        self.assertEqual(lector.cabecera["total_reglas"], 7)
+        self.assertEqual(list(lector), anterior["reglas"])
+    
+    def test_experiencias_en_diario(self):
+        base = BaseConocimiento(self.archivo, usar_diario=True)
+        base.guardar_conocimiento()
+        base.agregar_experiencia({"posicion": 8}, "atacar", "fracaso")
+        base.guardar_conocimiento()
+        
+        conocimiento = ConocimientoPerezoso(self.archivo)
+        self.assertEqual(conocimiento.total_reglas, 8)
+        self.assertEqual(conocimiento.contar_reglas("fracaso"), 3)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -64,19 +64,20 @@ class Entrenador:
         if resultado is None:
             resultado = "fracaso"
         
-        for experiencia in experiencias:
-            if experiencia["resultado"] == "continuar" and resultado == "éxito":
-                self.base.agregar_experiencia(
-                    experiencia["estado"],
-                    experiencia["accion"],
-                    resultado
-                )
-            elif experiencia["resultado"] != "continuar":
-                self.base.agregar_experiencia(
-                    experiencia["estado"],
-                    experiencia["accion"],
-                    resultado
-                )
+        with self.base.transaccion():
+            for experiencia in experiencias:
+                if experiencia["resultado"] == "continuar" and resultado == "éxito":
+                    self.base.agregar_experiencia(
+                        experiencia["estado"],
+                        experiencia["accion"],
+                        resultado
+                    )
+                elif experiencia["resultado"] != "continuar":
+                    self.base.agregar_experiencia(
+                        experiencia["estado"],
+                        experiencia["accion"],
+                        resultado
+                    )
         
         incursion_info = {
             "fecha": datetime.now().isoformat(),
@@ -105,8 +106,13 @@ class Entrenador:
     
     def ciclo_entrenamiento(self, num_incursiones, posiciones_iniciales, 
                            modo_impala="aleatorio", secuencia_impala=None,
-                           guardar_cada=None, generalizar_cada=None):
-        """Ejecuta un ciclo completo de entrenamiento"""
+                           guardar_cada=None, generalizar_cada=None, guardar_en_segundo_plano=None):
+        """
+        Ejecuta un ciclo completo de entrenamiento. Con guardar_en_segundo_plano
+        los guardados periódicos no detienen el entrenamiento
+        """
+        if guardar_en_segundo_plano is None:
+            guardar_en_segundo_plano = GUARDAR_EN_SEGUNDO_PLANO
         
         print(f"\n=== INICIANDO CICLO DE ENTRENAMIENTO ===")
         print(f"Incursiones: {num_incursiones}")
@@ -135,7 +141,7 @@ class Entrenador:
             )
             
             if guardar_cada and (i + 1) % guardar_cada == 0:
-                self.base.guardar_conocimiento()
+                self.base.guardar_conocimiento(en_segundo_plano=guardar_en_segundo_plano)
                 ultimo_guardado = i + 1
             
             if generalizar_cada and (i + 1) % generalizar_cada == 0:
@@ -153,6 +159,7 @@ class Entrenador:
         print(f"Reglas en base: {len(self.base.reglas)}")
         print(f"Tiempo promedio por incursión: {self.estadisticas_entrenamiento['tiempo_promedio']:.1f} pasos")
         
+        # Espera al guardado en curso y guarda el estado final
         self.base.guardar_conocimiento()
         
         cambios = self.base.generalizar_conocimiento()
@@ -187,11 +194,15 @@ class Entrenador:
         print(f"Resultados exportados a {archivo_salida}")
 
 
-def entrenar_especializacion_posicion(posicion, num_incursiones=2000):
-    """Entrena al león específicamente para una posición"""
+def entrenar_especializacion_posicion(posicion, num_incursiones=2000, base_conocimiento=None):
+    """
+    Entrena al león específicamente para una posición
+    base_conocimiento: base a entrenar (por defecto la del archivo de conocimiento);
+    con una base particionada, guardar solo reescribe las particiones modificadas
+    """
     print(f"\n=== ENTRENAMIENTO ESPECIALIZADO PARA POSICIÓN {posicion} ===")
     
-    base = BaseConocimiento()
+    base = base_conocimiento or BaseConocimiento()
     entrenador = Entrenador(base)
     
     estadisticas = entrenador.ciclo_entrenamiento(
@@ -206,6 +217,9 @@ def entrenar_especializacion_posicion(posicion, num_incursiones=2000):
     exitos = 0
     pruebas = 100
     
+    # Las pruebas consultan una instantánea: no cuentan en las estadísticas de entrenamiento
+    evaluacion = base.instantanea()
+    
     for _ in range(pruebas):
         mundo = Mundo(posicion)
         resultado = None
@@ -214,7 +228,7 @@ def entrenar_especializacion_posicion(posicion, num_incursiones=2000):
         while resultado is None and pasos < 30:
             estado = mundo.obtener_estado_para_conocimiento()
             accion_impala = random.choice(ACCIONES_IMPALA[:-1])
-            accion_león, _ = base.obtener_mejor_accion(estado, exploracion=0.0)
+            accion_león, _ = evaluacion.obtener_mejor_accion(estado, exploracion=0.0)
             
             _, resultado = mundo.paso_tiempo(accion_impala, accion_león)
             pasos += 1
@@ -227,14 +241,14 @@ def entrenar_especializacion_posicion(posicion, num_incursiones=2000):
     return base, entrenador
 
 
-def entrenar_excluyendo_posicion(posicion_excluida, num_incursiones=20000):
+def entrenar_excluyendo_posicion(posicion_excluida, num_incursiones=20000, base_conocimiento=None):
     """Entrena al león excluyendo una posición específica"""
     print(f"\n=== ENTRENAMIENTO EXCLUYENDO POSICIÓN {posicion_excluida} ===")
     
     todas_posiciones = list(POSICIONES_LEON.keys())
     posiciones_entrenamiento = [p for p in todas_posiciones if p != posicion_excluida]
     
-    base = BaseConocimiento()
+    base = base_conocimiento or BaseConocimiento()
     entrenador = Entrenador(base)
     
     estadisticas = entrenador.ciclo_entrenamiento(
@@ -248,6 +262,7 @@ def entrenar_excluyendo_posicion(posicion_excluida, num_incursiones=20000):
     print(f"\n=== PRUEBA EN POSICIÓN EXCLUIDA {posicion_excluida} ===")
     exitos = 0
     pruebas = 100
+    evaluacion = base.instantanea()
     
     for _ in range(pruebas):
         mundo = Mundo(posicion_excluida)
@@ -257,7 +272,7 @@ def entrenar_excluyendo_posicion(posicion_excluida, num_incursiones=20000):
         while resultado is None and pasos < 30:
             estado = mundo.obtener_estado_para_conocimiento()
             accion_impala = random.choice(ACCIONES_IMPALA[:-1])
-            accion_león, _ = base.obtener_mejor_accion(estado, exploracion=0.0)
+            accion_león, _ = evaluacion.obtener_mejor_accion(estado, exploracion=0.0)
             
             _, resultado = mundo.paso_tiempo(accion_impala, accion_león)
             pasos += 1
@@ -65,6 +65,36 @@ def cargar_json(archivo):
             return json.load(f)
     return None
 
+def clave_canonica(valor):
+    """
+    Convierte un valor (o estado) en una forma hashable equivalente.
+    Dos valores producen la misma clave si y solo si son iguales con ==
+    """
+    if isinstance(valor, (str, int, float)) or valor is None:
+        return valor
+    if isinstance(valor, dict):
+        return frozenset((clave, clave_canonica(v)) for clave, v in valor.items())
+    if isinstance(valor, list):
+        return ("lista", tuple(clave_canonica(v) for v in valor))
+    if isinstance(valor, tuple):
+        return ("rango", tuple(clave_canonica(v) for v in valor))
+    return valor
+
+def claves_de_estados():
+    """
+    Devuelve una función que da la clave canónica de un estado. Las reglas con
+    el mismo estado comparten el diccionario: la clave se calcula una vez por
+    estado y se memoriza por identidad mientras se recorren las reglas
+    """
+    claves = {}
+    
+    def clave_estado(estado):
+        clave = claves.get(id(estado))
+        if clave is None:
+            clave = claves[id(estado)] = clave_canonica(estado)
+        return clave
+    return clave_estado
+
 def seleccionar_accion_aleatoria(acciones, pesos=None):
     """Selecciona una acción aleatoria con pesos opcionales"""
     if pesos and len(pesos) == len(acciones):